@@ -1,2 +1,4 @@
 # -*- coding: utf-8 -*-
 __version__ = '0.4.0a21'
+
+default_app_config = 'aldryn_accounts.apps.AccountsConfig'
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+from django.apps import AppConfig, apps
+
+
+class AccountsConfig(AppConfig):
+    name = 'aldryn_accounts'
+
+    def ready(self):
+        from .monkeypatches import patch_user_unicode
+        patch_user_unicode()
+        from .signals import connect_user_receivers
+        for model in apps.get_models():
+            connect_user_receivers(model)
+        # connects the outbox receivers
+        from . import outbox  # NOQA
@@ -1,11 +1,13 @@
 # -*- coding: utf-8 -*-
 from django.contrib.auth.backends import ModelBackend
 
+from . import instrumentation
 from .models import EmailAddress
 from .utils import get_most_qualified_user_for_email_and_password
 
 
 class EmailBackend(ModelBackend):
+    @instrumentation.timed('auth.authenticate')
     def authenticate(self, username=None, password=None):
         """
         tries verified email addresses, the email field on user objects and unconfirmed email addresses.
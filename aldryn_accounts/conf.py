@@ -55,6 +55,11 @@ class AccountsAppConf(AppConf):
     RESTORE_PASSWORD_RAISE_VALIDATION_ERROR = True
     USER_DISPLAY_FALLBACK_TO_USERNAME = False
     USER_DISPLAY_FALLBACK_TO_PK = False
+    # keeps UserSettings.display_name (indexed, for sorting and searching
+    # users by their display name) current when users are saved
+    STORE_DISPLAY_NAME = False
+    # most addresses per request of the staff only email lookup view
+    EMAIL_LOOKUP_MAX_EMAILS = 5000
 
     SOCIAL_BACKEND_ORDERING = []
     # if set to True - will add SOCIAL_CONTEXT_PROCESSORS to context processors
@@ -69,13 +74,109 @@ class AccountsAppConf(AppConf):
     # if enabled GEOIP_PATH and GEOIP_CITY (this one defaults to
     # GeoLiteCity.dat) should be configured
     USE_GEOIP = False
+    # whether GeoIP decides the time zone of visitors that have none yet
+    # (see aldryn_accounts/inc/browser_timezone.html for a better source)
+    USE_GEOIP_TIMEZONE = True
     LOGIN_REDIRECT_URL = '/'
     NO_REMEMBER_ME_COOKIE_AGE = 3600  # for login with 'remember me' unticked
 
+    # index built with the build_places_index command, used to derive
+    # location names from coordinates (None: disabled)
+    PLACES_INDEX = None
+    REVERSE_GEOCODING_MAX_DISTANCE = 50  # km
+
+    # database aliases to read the account and auth models from, see
+    # aldryn_accounts.routers. Reads stick to the primary for
+    # REPLICA_PIN_SECONDS after a write of the same visitor.
+    DATABASE_REPLICAS = []
+    PRIMARY_DATABASE = 'default'
+    REPLICA_PIN_SECONDS = 15
+    REPLICA_PIN_COOKIE_NAME = 'aldryn_accounts_primary'
+
+    # write the account lifecycle signals to an outbox table, delivered to
+    # OUTBOX_CONSUMERS (dotted paths to callables taking a list of events)
+    # by the deliver_outbox_events command, see aldryn_accounts.outbox
+    USE_OUTBOX = False
+    OUTBOX_CONSUMERS = []
+    OUTBOX_MAX_ATTEMPTS = 10
+
+    # keep the compiled email templates per template and language, see
+    # aldryn_accounts.email_templates (disable to edit templates without
+    # restarting the server)
+    CACHE_EMAIL_TEMPLATES = True
+    # seconds the protocol and domain of a site are cached for emails, a
+    # change of the site only clears the cache of the saving process
+    SITE_URL_PREFIX_TIMEOUT = 300
+
+    # resends of the confirmations of an email address within this many
+    # seconds are coalesced into the first one (0 disables), see
+    # EmailConfirmationManager.resend
+    CONFIRMATION_RESEND_WINDOW = 300
+    CONFIRMATION_RESEND_CACHE = 'default'  # cache alias
+
+    # serve the login and signup pages of anonymous visitors from a page
+    # cache per language, see AnonymousPageCacheMixin
+    CACHE_ANONYMOUS_PAGES = False
+    ANONYMOUS_PAGE_CACHE = 'default'  # cache alias
+    ANONYMOUS_PAGE_CACHE_TIMEOUT = 300
+
+    # requests skipped by GeoIPMiddleware and TimezoneMiddleware: path
+    # prefixes, path regexes, user agent regexes or classes ('bot', 'monitor',
+    # 'tool', see aldryn_accounts.exclusions) and HTTP methods
+    MIDDLEWARE_EXCLUDE_PATHS = []
+    MIDDLEWARE_EXCLUDE_STATIC = True  # also skip STATIC_URL and MEDIA_URL
+    MIDDLEWARE_EXCLUDE_REGEXES = []
+    MIDDLEWARE_EXCLUDE_USER_AGENTS = []
+    MIDDLEWARE_EXCLUDE_METHODS = []
+
+    # where the time zone and location of visitors are kept: 'session' or
+    # 'cookie' (a signed cookie, anonymous visitors need no session)
+    LOCALE_STATE_STORAGE = 'session'
+    LOCALE_STATE_COOKIE_NAME = 'aldryn_accounts_locale'
+    LOCALE_STATE_COOKIE_MAX_AGE = 60 * 60 * 24 * 30  # seconds
+
     PROFILE_IMAGE_UPLOAD_TO = 'profile-data'
+    # name profile images by the hash of their content and store each image once
+    PROFILE_IMAGE_CONTENT_ADDRESSED = False
 
     USE_PROFILE_APPHOOKS = False
 
+    # max. concurrent password verifications per process (None: unlimited)
+    PASSWORD_HASHING_CONCURRENCY = None
+    PASSWORD_HASHING_QUEUE_TIMEOUT = 0.5  # seconds to wait for a free hashing slot
+    PASSWORD_HASHING_REJECT_STATUS = 503  # response status if no slot is available
+
+    # outgoing HTTP requests (e.g. social auth pipelines)
+    HTTP_CONNECT_TIMEOUT = 3.05  # seconds
+    HTTP_READ_TIMEOUT = 5  # seconds between two bytes received
+    HTTP_DOWNLOAD_TIMEOUT = 15  # seconds for a whole streamed download
+    HTTP_POOL_CONNECTIONS = 4  # number of hosts with pooled connections
+    HTTP_POOL_SIZE = 10  # connections kept per host
+    HTTP_MAX_DOWNLOAD_SIZE = 5 * 1024 * 1024  # bytes, e.g. for profile images
+
+    # dotted path to a callable running background jobs: runner(func, *args, **kwargs)
+    TASK_RUNNER = 'aldryn_accounts.tasks.run_in_thread'
+    # send confirmation, invitation and password change emails through the
+    # task runner instead of blocking the request on SMTP
+    SEND_EMAILS_IN_BACKGROUND = False
+    # thumbnails generated when a profile image is stored (easy_thumbnails options)
+    PROFILE_IMAGE_THUMBNAILS = {
+        'profile': {'size': (200, 200), 'crop': True, 'upscale': True},
+    }
+    # missing thumbnails (e.g. of images stored before an upgrade) are
+    # enqueued on render, at most once per this many seconds and image
+    PROFILE_IMAGE_THUMBNAIL_RETRY = 300
+    PROFILE_IMAGE_THUMBNAIL_CACHE = 'default'  # cache alias
+
+    # dotted path to an instrumentation sink class, e.g.
+    # 'aldryn_accounts.instrumentation.StatsdSink' (None: disabled)
+    INSTRUMENTATION_SINK = None
+    INSTRUMENTATION_STATSD_HOST = 'localhost'
+    INSTRUMENTATION_STATSD_PORT = 8125
+    INSTRUMENTATION_STATSD_PREFIX = 'aldryn_accounts'
+    # also time every call of the aldryn_accounts signal receivers
+    INSTRUMENTATION_RECEIVERS = False
+
     def enable_authentication_backend(self, name):
         s = self._meta.holder
         if not name in s.AUTHENTICATION_BACKENDS:
@@ -102,15 +203,32 @@ class AccountsAppConf(AppConf):
             return self.configured_data
         # do auto configuration
         s = self._meta.holder
-        # insert our middlewares after the session middleware
-        pos = s.MIDDLEWARE_CLASSES.index('django.contrib.sessions.middleware.SessionMiddleware') + 1
+        # insert our middlewares after the session middleware, into
+        # MIDDLEWARE if the project uses new-style middleware (Django 1.10+)
+        setting = 'MIDDLEWARE' if getattr(s, 'MIDDLEWARE', None) is not None else 'MIDDLEWARE_CLASSES'
+        middlewares = list(getattr(s, setting))
+        pos = middlewares.index('django.contrib.sessions.middleware.SessionMiddleware') + 1
         for app in ADD_TO_INSTALLED_APPS:
             if app not in s.INSTALLED_APPS:
                 s.INSTALLED_APPS.append(app)
         for middleware in ADD_TO_MIDDLEWARE_CLASSES:
-            if not middleware in s.MIDDLEWARE_CLASSES:
-                s.MIDDLEWARE_CLASSES.insert(pos, middleware)
+            if not middleware in middlewares:
+                middlewares.insert(pos, middleware)
                 pos += 1
+        if self.configured_data['PASSWORD_HASHING_CONCURRENCY']:
+            middleware = 'aldryn_accounts.middleware.PasswordHashingGateMiddleware'
+            if middleware not in middlewares:
+                middlewares.insert(pos, middleware)
+        if self.configured_data['DATABASE_REPLICAS']:
+            # pins reads before the session and auth middlewares run
+            middleware = 'aldryn_accounts.middleware.ReplicaPinningMiddleware'
+            if middleware not in middlewares:
+                session_pos = middlewares.index('django.contrib.sessions.middleware.SessionMiddleware')
+                middlewares.insert(session_pos, middleware)
+            routers = list(getattr(s, 'DATABASE_ROUTERS', []))
+            if 'aldryn_accounts.routers.ReplicaRouter' not in routers:
+                s.DATABASE_ROUTERS = ['aldryn_accounts.routers.ReplicaRouter'] + routers
+        setattr(s, setting, middlewares)
         # add social context processors if needed.
         if self.configured_data['USE_SOCIAL_CONTEXT_PROCESSORS']:
             if hasattr(s, 'TEMPLATES'):
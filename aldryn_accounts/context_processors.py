@@ -3,25 +3,29 @@ from collections import OrderedDict
 
 from django.conf import settings
 from django.contrib.auth import get_backends
+from django.utils.functional import SimpleLazyObject
 
-from social_django.models import UserSocialAuth
-
+from .instrumentation import timed
 from .utils import user_display, get_signup_view, get_login_view
 from .notifications import check_notifications
 
 
+@timed('context_processors.account_info')
 def account_info(request):
     return {
         'username': user_display(request.user),
     }
 
 
+@timed('context_processors.social_auth_info')
 def social_auth_info(request):
     """
     similar to the social_auth.context_processors.social_auth_by_name_backends,
     but uses a OrderedDict and an easier format to use in templates.
     """
     # TODO: cache (LazyDict does not work well with key value iteration in templates
+    from social_django.models import UserSocialAuth
+
     backends = get_backends()
     all_keys = set(backends.keys())
     keys = []
@@ -42,13 +46,17 @@ def social_auth_info(request):
     return {'social_auth': accounts}
 
 
+@timed('context_processors.empty_login_and_signup_forms')
 def empty_login_and_signup_forms(request):
+    # the forms are only built if a template uses them, pages that include
+    # the cached fragments of {% form_fragment %} never do
     return {
-        'empty_login_form': get_login_view().form_class(),
-        'empty_signup_form': get_signup_view().form_class(),
+        'empty_login_form': SimpleLazyObject(lambda: get_login_view().form_class()),
+        'empty_signup_form': SimpleLazyObject(lambda: get_signup_view().form_class()),
     }
 
 
+@timed('context_processors.notifications')
 def notifications(request):
     if request.user.is_anonymous():
         return {}
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+Reproducible generation of large accounts datasets for benchmarks and
+migration tests. See the ``generate_accounts_dataset`` management command.
+"""
+from __future__ import unicode_literals
+
+import datetime
+import hashlib
+import multiprocessing
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+import pytz
+
+from .conf import settings
+from .geo import get_geohash
+from .models import (
+    EmailAddress, EmailConfirmation, SignupCode, SignupCodeResult,
+    UserSettings)
+
+
+DEFAULT_PASSWORD = 'password'
+
+# a few well known places, so that generated locations make sense.
+PLACES = (
+    ('Zurich, Switzerland', 47.3769, 8.5417),
+    ('Berlin, Germany', 52.5200, 13.4050),
+    ('London, United Kingdom', 51.5074, -0.1278),
+    ('New York, United States', 40.7128, -74.0060),
+    ('Los Angeles, United States', 34.0522, -118.2437),
+    ('Sao Paulo, Brazil', -23.5505, -46.6333),
+    ('Tokyo, Japan', 35.6762, 139.6503),
+    ('Sydney, Australia', -33.8688, 151.2093),
+    ('Cape Town, South Africa', -33.9249, 18.4241),
+    ('Mumbai, India', 19.0760, 72.8777),
+)
+
+
+def _chunk_random(seed, start):
+    # one generator per chunk keeps the output independent of the number of
+    # processes used to generate it.
+    return random.Random('{0}-{1}'.format(seed, start))
+
+
+def _key(seed, *bits):
+    data = '-'.join(str(bit) for bit in (seed,) + bits)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def _close_connections():
+    if hasattr(connections, 'close_all'):
+        connections.close_all()
+    else:  # Django < 1.8
+        for conn in connections.all():
+            conn.close()
+
+
+def generate_signup_codes(count, seed, now, start_id):
+    rnd = _chunk_random(seed, 'signup-codes')
+    codes = []
+    for i in range(count):
+        pk = start_id + i
+        codes.append(SignupCode(
+            pk=pk,
+            code=_key(seed, 'code', pk)[:64],
+            max_uses=rnd.choice((0, 1, 10, 100)),
+            expires_at=now + datetime.timedelta(days=rnd.randint(-30, 30)),
+            email=('invite{0}@{1}'.format(pk, 'example.com')
+                   if rnd.random() < 0.5 else ''),
+            sent_at=now - datetime.timedelta(days=rnd.randint(0, 60)),
+            created_at=now - datetime.timedelta(days=rnd.randint(60, 90)),
+        ))
+    SignupCode.objects.bulk_create(codes)
+    return [code.pk for code in codes]
+
+
+def generate_users_chunk(options):
+    """
+    Creates the users ``start`` to ``stop`` (offsets from ``first_user_id``)
+    with their email addresses, pending confirmations, signup code usages and
+    settings.
+    """
+    seed = options['seed']
+    start, stop = options['start'], options['stop']
+    now = options['now']
+    rnd = _chunk_random(seed, start)
+    domain = options['domain']
+    expire_days = settings.ALDRYN_ACCOUNTS_EMAIL_CONFIRMATION_EXPIRE_DAYS
+    timezones = pytz.common_timezones
+    signup_code_ids = options['signup_code_ids']
+
+    users, emails, confirmations, results, user_settings = [], [], [], [], []
+    for offset in range(start, stop):
+        pk = options['first_user_id'] + offset
+        joined = now - datetime.timedelta(seconds=rnd.randint(0, 3 * 365 * 86400))
+        email = 'user{0}@{1}'.format(pk, domain)
+        users.append(User(
+            pk=pk,
+            username='user{0}'.format(pk),
+            email=email,
+            first_name='First{0}'.format(pk) if rnd.random() < 0.7 else '',
+            last_name='Last{0}'.format(pk) if rnd.random() < 0.7 else '',
+            password=options['password'],
+            date_joined=joined,
+        ))
+        for number in range(rnd.randint(1, options['max_emails'])):
+            if number:
+                email = 'user{0}.{1}@{2}'.format(pk, number, domain)
+            emails.append(EmailAddress(
+                user_id=pk,
+                email=email,
+                verified_at=joined,
+                verification_method='email',
+                is_primary=not number,
+            ))
+        if rnd.random() < options['pending_ratio']:
+            # spread sent_at so that some of the confirmations are expired
+            age = rnd.uniform(0, expire_days * 2)
+            confirmations.append(EmailConfirmation(
+                user_id=pk,
+                email='pending{0}@{1}'.format(pk, domain),
+                is_primary=False,
+                created_at=now - datetime.timedelta(days=age),
+                sent_at=now - datetime.timedelta(days=age),
+                key=_key(seed, 'confirmation', pk),
+            ))
+        if signup_code_ids and rnd.random() < options['signup_code_ratio']:
+            results.append(SignupCodeResult(
+                signup_code_id=rnd.choice(signup_code_ids),
+                user_id=pk,
+                timestamp=joined,
+            ))
+        place, latitude, longitude = rnd.choice(PLACES)
+        latitude += rnd.uniform(-0.5, 0.5)
+        longitude += rnd.uniform(-0.5, 0.5)
+        user_settings.append(UserSettings(
+            user_id=pk,
+            timezone=rnd.choice(timezones),
+            location_name=place,
+            location_latitude=latitude,
+            location_longitude=longitude,
+            # bulk_create does not call save()
+            location_geohash=get_geohash(latitude, longitude),
+        ))
+
+    with transaction.atomic():
+        User.objects.bulk_create(users)
+        EmailAddress.objects.bulk_create(emails)
+        EmailConfirmation.objects.bulk_create(confirmations)
+        # SignupCodeResult.save() recalculates the use count per row, the
+        # counts are updated once for all codes at the end instead.
+        SignupCodeResult.objects.bulk_create(results)
+        UserSettings.objects.bulk_create(user_settings)
+    return stop - start
+
+
+def _generate_users_chunk_in_process(options):
+    # every process needs its own database connection
+    _close_connections()
+    try:
+        return generate_users_chunk(options)
+    finally:
+        _close_connections()
+
+
+def update_signup_code_use_counts():
+    code_table = connection.ops.quote_name(SignupCode._meta.db_table)
+    result_table = connection.ops.quote_name(SignupCodeResult._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'UPDATE {code} SET use_count = (SELECT COUNT(*) FROM {result} '
+            'WHERE {result}.signup_code_id = {code}.id)'.format(
+                code=code_table, result=result_table))
+
+
+def reset_sequences():
+    # rows were inserted with explicit primary keys
+    statements = connection.ops.sequence_reset_sql(
+        no_style(), [User, SignupCode])
+    if statements:
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+
+def generate_dataset(users, seed=0, batch_size=5000, processes=1,
+                     max_emails=3, pending_ratio=0.2, signup_codes=None,
+                     signup_code_ratio=0.1, domain='example.com',
+                     password=DEFAULT_PASSWORD, progress=None):
+    """
+    Generates ``users`` users and their accounts data. The same arguments
+    (except ``processes``) always generate the same data on an empty database.
+
+    With ``processes`` > 1 the chunks of ``batch_size`` users are inserted in
+    parallel, which needs a database that supports concurrent writers
+    (e.g. Postgres, not SQLite).
+    """
+    now = timezone.now().replace(microsecond=0)
+    first_user_id = (User.objects.aggregate(pk=Max('pk'))['pk'] or 0) + 1
+    if signup_codes is None:
+        signup_codes = users // 100
+    first_code_id = (SignupCode.objects.aggregate(pk=Max('pk'))['pk'] or 0) + 1
+    signup_code_ids = generate_signup_codes(
+        signup_codes, seed, now, first_code_id)
+
+    # hashing is slow on purpose, all users share the hash
+    password = make_password(password)
+    chunks = [{
+        'seed': seed,
+        'start': start,
+        'stop': min(start + batch_size, users),
+        'now': now,
+        'first_user_id': first_user_id,
+        'password': password,
+        'domain': domain,
+        'max_emails': max_emails,
+        'pending_ratio': pending_ratio,
+        'signup_code_ids': signup_code_ids,
+        'signup_code_ratio': signup_code_ratio,
+    } for start in range(0, users, batch_size)]
+
+    created = 0
+    if processes > 1 and len(chunks) > 1:
+        _close_connections()
+        pool = multiprocessing.Pool(processes)
+        try:
+            for count in pool.imap_unordered(_generate_users_chunk_in_process, chunks):
+                created += count
+                if progress:
+                    progress(created, users)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for chunk in chunks:
+            created += generate_users_chunk(chunk)
+            if progress:
+                progress(created, users)
+
+    update_signup_code_use_counts()
+    reset_sequences()
+    return created
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Rendering of the account emails with compiled templates.
+
+The subject, text and html templates of an email (the ``.subject.txt``,
+``.body.txt`` and ``.body.html`` templates of emailit) are looked up once
+per process and language instead of for every email, and many contexts
+can be rendered with them, e.g. to send a batch of invites. The url prefix
+(protocol and domain) of every site is cached as well, for
+``ALDRYN_ACCOUNTS_SITE_URL_PREFIX_TIMEOUT`` seconds since other processes
+don't see the changes of a site.
+"""
+import time
+
+from django.contrib.sites.models import Site
+from django.core.mail import EmailMultiAlternatives
+from django.db.models.signals import post_save, pre_delete
+from django.template import Context, Template, TemplateDoesNotExist, loader
+from django.utils.encoding import force_text
+from django.utils.translation import get_language, override
+
+from .conf import settings
+
+try:
+    from django.core.signals import setting_changed
+except ImportError:  # Django < 1.8
+    from django.test.signals import setting_changed
+
+
+def get_template_names(language, template_base, part, suffix):
+    """
+    The names emailit tries: the language's template, the template without
+    a language and the templates of the other languages.
+    """
+    languages = [language, None] + [code for code, name in settings.LANGUAGES if code != language]
+    return ['.'.join(filter(None, (template_base, part, code, suffix))) for code in languages]
+
+
+def _select_template(names):
+    try:
+        return loader.select_template(names)
+    except TemplateDoesNotExist:
+        return None
+
+
+def _render_template(template, context):
+    if isinstance(template, Template):
+        # Django < 1.8 returns the template itself instead of the backend's
+        return template.render(Context(context))
+    return template.render(context)
+
+
+class EmailTemplate(object):
+    """
+    The compiled templates of an email in one language.
+    """
+
+    def __init__(self, template_base, language):
+        self.template_base = template_base
+        self.language = language
+        self.subject = _select_template(get_template_names(language, template_base, 'subject', 'txt'))
+        self.body = _select_template(get_template_names(language, template_base, 'body', 'txt'))
+        self.html = _select_template(get_template_names(language, template_base, 'body', 'html'))
+        if self.subject is None or not (self.body or self.html):
+            raise TemplateDoesNotExist(template_base)
+
+    def render(self, recipients, context, site=None, from_email=None, **kwargs):
+        """
+        Returns the email for ``context`` (with the same context variables
+        as ``emailit.api.construct_mail``).
+        """
+        return next(self.render_many([(recipients, context)], site, from_email, **kwargs))
+
+    def render_many(self, messages, site=None, from_email=None, **kwargs):
+        """
+        Yields the emails for an iterable of (recipients, context) pairs.
+        """
+        site = site or Site.objects.get_current()
+        base_url = get_site_url_prefix(site)
+        from_email = from_email or settings.DEFAULT_FROM_EMAIL
+        for recipients, context in messages:
+            # not around the loop, the language would stay active while the
+            # caller works with a yielded email
+            with override(self.language):
+                mail = self._render(recipients, dict(context), site, base_url, from_email, kwargs)
+            yield mail
+
+    def _render(self, recipients, context, site, base_url, from_email, kwargs):
+        context.update(site=site, site_name=site.name)
+        subject = _render_template(self.subject, context)
+        context['subject'] = subject.replace('\n', '').replace('\r', '').strip()
+        body = _render_template(self.body, context) if self.body else ''
+        mail = EmailMultiAlternatives(context['subject'], body, from_email, list(recipients), **kwargs)
+        if self.html:
+            # premailer pulls in lxml and cssutils, only import it when an
+            # email is actually rendered
+            import premailer
+
+            html = premailer.transform(_render_template(self.html, context), base_url=base_url)
+            mail.attach_alternative(html, 'text/html')
+        return mail
+
+
+_templates = {}
+
+
+def get_email_template(template_base, language=None):
+    """
+    Returns the cached ``EmailTemplate`` of ``template_base`` for
+    ``language`` (the active language by default).
+    """
+    language = language or get_language()
+    key = (template_base, language)
+    template = _templates.get(key)
+    if template is None:
+        template = EmailTemplate(template_base, language)
+        if settings.ALDRYN_ACCOUNTS_CACHE_EMAIL_TEMPLATES:
+            _templates[key] = template
+    return template
+
+
+_url_prefixes = {}
+
+
+def get_site_url_prefix(site=None, protocol=None):
+    """
+    The protocol and domain of ``site`` (the current site by default), e.g.
+    ``https://example.com``.
+    """
+    protocol = protocol or getattr(settings, 'DEFAULT_HTTP_PROTOCOL', 'http')
+    if site is not None and getattr(site, 'pk', None) is None:
+        # e.g. a RequestSite
+        return '{0}://{1}'.format(protocol, force_text(site.domain))
+    key = (protocol, site.pk if site is not None else settings.SITE_ID)
+    prefix, expires = _url_prefixes.get(key, (None, 0))
+    now = time.time()
+    if prefix is None or expires <= now:
+        site = site or Site.objects.get_current()
+        prefix = '{0}://{1}'.format(protocol, force_text(site.domain))
+        _url_prefixes[key] = (prefix, now + settings.ALDRYN_ACCOUNTS_SITE_URL_PREFIX_TIMEOUT)
+    return prefix
+
+
+def clear_url_prefixes(**kwargs):
+    _url_prefixes.clear()
+
+post_save.connect(clear_url_prefixes, sender=Site, dispatch_uid='aldryn_accounts:clear_url_prefixes')
+pre_delete.connect(clear_url_prefixes, sender=Site, dispatch_uid='aldryn_accounts:clear_url_prefixes')
+
+
+def clear_cache(**kwargs):
+    setting = kwargs.get('setting')
+    if setting is None or setting in ('TEMPLATES', 'LANGUAGES', 'SITE_ID', 'DEFAULT_HTTP_PROTOCOL'):
+        _templates.clear()
+        _url_prefixes.clear()
+
+setting_changed.connect(clear_cache, dispatch_uid='aldryn_accounts:clear_email_templates')
@@ -3,18 +3,17 @@ from __future__ import unicode_literals
 
 from django.contrib.sites.models import Site
 from django.contrib.sites.shortcuts import get_current_site
-from django.core.mail import EmailMultiAlternatives
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.core.urlresolvers import reverse
 from django.utils import timezone
-from django.utils.encoding import force_text
 from django.utils.http import urlencode
 from django.utils.module_loading import import_string
 from django.utils.translation import get_language, override
 from django.template import loader
 
-import emailit.api
-
 from .conf import settings
+from .email_templates import get_email_template, get_site_url_prefix
+from .instrumentation import timer
 from .utils import user_display
 
 
@@ -25,14 +24,26 @@ class DefaultEmailSender(object):
 
     @classmethod
     def get_absolute_url(cls, path='', site=None):
-        if not site:
-            site = Site.objects.get_current()
+        return get_site_url_prefix(site, cls.get_protocol()) + path
+
+    @classmethod
+    def send_mail(cls, recipients, context, template_base, metric_name):
+        site = context.get('site') or context.get('current_site')
+        with timer('email.{}.render'.format(metric_name)):
+            message = get_email_template(template_base).render(recipients, context, site)
+        with timer('email.{}.send'.format(metric_name)):
+            message.send()
 
-        return '{}://{}{}'.format(
-            cls.get_protocol(),
-            force_text(site.domain),
-            path,
-        )
+    @classmethod
+    def send_mails(cls, messages, template_base, metric_name, site=None):
+        """
+        Renders an email for each (recipients, context) pair of ``messages``
+        with the same templates and sends them over one connection.
+        """
+        with timer('email.{}.render'.format(metric_name)):
+            mails = list(get_email_template(template_base).render_many(messages, site))
+        with timer('email.{}.send'.format(metric_name)):
+            return get_connection().send_messages(mails)
 
     @classmethod
     def send_email_verification(cls, **kwargs):
@@ -57,10 +68,11 @@ class DefaultEmailSender(object):
                 key=verification.key,
             )
 
-            emailit.api.send_mail(
+            cls.send_mail(
                 (verification.email,),
                 context,
                 'aldryn_accounts/email/email_confirmation',
+                metric_name='email_verification',
             )
 
         verification.sent_at = timezone.now()
@@ -90,10 +102,11 @@ class DefaultEmailSender(object):
                 signup_url=signup_url,
             )
 
-            emailit.api.send_mail(
+            cls.send_mail(
                 (signup_code.email,),
                 context,
                 'aldryn_accounts/email/invite_user',
+                metric_name='signup_code',
             )
 
             signup_code.sent_at = timezone.now()
@@ -102,30 +115,32 @@ class DefaultEmailSender(object):
     @classmethod
     def send_password_recovery_reset(cls, **kwargs):
         context = kwargs['context']
-        # originally from django.contrib.auth.forms.PasswordResetForm#send_mail
-        subject = loader.render_to_string(kwargs['subject_template_name'], context)
-        # Email subject *must not* contain newlines
-        subject = ''.join(subject.splitlines())
-        body = loader.render_to_string(kwargs['email_template_name'], context)
-
-        email_message = EmailMultiAlternatives(
-            subject,
-            body,
-            kwargs['from_email'],
-            [kwargs['to_email']],
-        )
-        html_email_template_name = kwargs.get('html_email_template_name')
-        if html_email_template_name:
-            html_email = loader.render_to_string(html_email_template_name, context)
-            email_message.attach_alternative(html_email, 'text/html')
-
-        email_message.send()
+        with timer('email.password_recovery_reset.render'):
+            # originally from django.contrib.auth.forms.PasswordResetForm#send_mail
+            subject = loader.render_to_string(kwargs['subject_template_name'], context)
+            # Email subject *must not* contain newlines
+            subject = ''.join(subject.splitlines())
+            body = loader.render_to_string(kwargs['email_template_name'], context)
+
+            email_message = EmailMultiAlternatives(
+                subject,
+                body,
+                kwargs['from_email'],
+                [kwargs['to_email']],
+            )
+            html_email_template_name = kwargs.get('html_email_template_name')
+            if html_email_template_name:
+                html_email = loader.render_to_string(html_email_template_name, context)
+                email_message.attach_alternative(html_email, 'text/html')
+
+        with timer('email.password_recovery_reset.send'):
+            email_message.send()
 
     @classmethod
     def send_password_changed(cls, **kwargs):
         user = kwargs.get('user')
         language = user.settings.preferred_language or get_language()
-        site = get_current_site(kwargs.get('request'))
+        site = kwargs.get('site') or get_current_site(kwargs.get('request'))
 
         with override(language):
             site_url = cls.get_absolute_url(site=site)
@@ -137,18 +152,24 @@ class DefaultEmailSender(object):
                 support_email=settings.ALDRYN_ACCOUNTS_SUPPORT_EMAIL,
             )
 
-            emailit.api.send_mail(
+            cls.send_mail(
                 (user.email,),
                 context,
                 kwargs.get('template'),
+                metric_name='password_changed',
             )
 
 
 def get_email_sender_class():
+    """
+    The configured email sender class, resolved when an email is sent so
+    that importing this module does not import the sender's module.
+    """
     path = getattr(settings, 'ALDRYN_ACCOUNTS_EMAIL_SENDER', None)
     if path:
         return import_string(path)
     return DefaultEmailSender
 
 
-EmailSender = get_email_sender_class()
+# the base class of custom senders
+EmailSender = DefaultEmailSender
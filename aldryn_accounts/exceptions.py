@@ -6,4 +6,12 @@ class EmailAlreadyVerified(Exception):
 
 
 class VerificationKeyExpired(Exception):
-    pass
\ No newline at end of file
+    pass
+
+
+class PasswordHashingUnavailable(Exception):
+    pass
+
+
+class ResponseTooLarge(Exception):
+    pass
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Requests the accounts middlewares (GeoIP, time zone) skip, e.g. health
+checks, static files, APIs and bots. The rules are compiled once per
+process from the ``ALDRYN_ACCOUNTS_MIDDLEWARE_EXCLUDE_*`` settings.
+"""
+import re
+
+from .conf import settings
+
+try:
+    from django.core.signals import setting_changed
+except ImportError:  # Django < 1.8
+    from django.test.signals import setting_changed
+
+
+# user agent classes that can be used in MIDDLEWARE_EXCLUDE_USER_AGENTS
+USER_AGENT_CLASSES = {
+    'bot': r'bot\b|crawl|spider|slurp|archiver|facebookexternalhit|embedly|preview',
+    'monitor': r'pingdom|uptimerobot|statuscake|site24x7|newrelicpinger|nagios|'
+               r'elb-healthchecker|kube-probe|googlehc',
+    'tool': r'^curl/|^wget/|python-requests|python-urllib|go-http-client|okhttp|^java/',
+}
+
+
+class ExclusionRules(object):
+
+    def __init__(self, prefixes=(), regexes=(), user_agents=(), methods=()):
+        self.prefixes = tuple(prefixes)
+        self.regex = self._combine(regexes)
+        self.user_agent_regex = self._combine(
+            USER_AGENT_CLASSES.get(user_agent, user_agent) for user_agent in user_agents)
+        self.methods = frozenset(method.upper() for method in methods)
+        self.enabled = bool(self.prefixes or self.regex or self.user_agent_regex or self.methods)
+
+    @staticmethod
+    def _combine(patterns):
+        patterns = ['(?:{0})'.format(pattern) for pattern in patterns]
+        if not patterns:
+            return None
+        return re.compile('|'.join(patterns), re.IGNORECASE)
+
+    def match(self, request):
+        if not self.enabled:
+            return False
+        path = request.path_info
+        if self.prefixes and path.startswith(self.prefixes):
+            return True
+        if self.methods and request.method in self.methods:
+            return True
+        if self.regex is not None and self.regex.search(path):
+            return True
+        if self.user_agent_regex is not None:
+            return bool(self.user_agent_regex.search(request.META.get('HTTP_USER_AGENT', '')))
+        return False
+
+
+def build_rules():
+    prefixes = list(settings.ALDRYN_ACCOUNTS_MIDDLEWARE_EXCLUDE_PATHS)
+    if settings.ALDRYN_ACCOUNTS_MIDDLEWARE_EXCLUDE_STATIC:
+        for url in (getattr(settings, 'STATIC_URL', None), getattr(settings, 'MEDIA_URL', None)):
+            # only urls served by this site
+            if url and url.startswith('/') and url != '/':
+                prefixes.append(url)
+    return ExclusionRules(
+        prefixes=prefixes,
+        regexes=settings.ALDRYN_ACCOUNTS_MIDDLEWARE_EXCLUDE_REGEXES,
+        user_agents=settings.ALDRYN_ACCOUNTS_MIDDLEWARE_EXCLUDE_USER_AGENTS,
+        methods=settings.ALDRYN_ACCOUNTS_MIDDLEWARE_EXCLUDE_METHODS,
+    )
+
+
+_rules = None
+
+
+def get_rules():
+    global _rules
+    if _rules is None:
+        _rules = build_rules()
+    return _rules
+
+
+def reset_rules(**kwargs):
+    global _rules
+    setting = kwargs.get('setting')
+    if setting is None or setting.startswith('ALDRYN_ACCOUNTS_MIDDLEWARE_EXCLUDE') or setting in (
+            'STATIC_URL', 'MEDIA_URL'):
+        _rules = None
+
+setting_changed.connect(reset_rules, dispatch_uid='aldryn_accounts:reset_exclusion_rules')
+
+
+def is_excluded(request):
+    """
+    Whether the accounts middlewares should skip ``request``. The result
+    is kept on the request, so that all middlewares share one check.
+    """
+    try:
+        return request._aldryn_accounts_excluded
+    except AttributeError:
+        excluded = request._aldryn_accounts_excluded = get_rules().match(request)
+        return excluded
@@ -10,8 +10,12 @@ from django.conf import settings
 
 from six.moves.urllib.parse import urlencode
 
+from . import tasks
+from .hashing import check_password
 from .models import EmailAddress, EmailConfirmation, UserSettings
-from .emails import EmailSender
+from .emails import get_email_sender_class
+from .geocoding import reverse_geocode
+from .widgets import CachedSelect
 
 
 def get_user_email(user, form_email):
@@ -77,7 +81,7 @@ class ChangePasswordForm(forms.Form):
         super(ChangePasswordForm, self).__init__(*args, **kwargs)
 
     def clean_password_current(self):
-        if not self.user.check_password(self.cleaned_data.get("password_current")):
+        if not check_password(self.user, self.cleaned_data.get("password_current")):
             raise forms.ValidationError(_("Please type your current password."))
         return self.cleaned_data["password_current"]
 
@@ -181,7 +185,7 @@ class PasswordRecoveryResetForm(DjangoPasswordResetForm):
 
     def send_mail(self, subject_template_name, email_template_name,
                   context, from_email, to_email, html_email_template_name=None):
-        return EmailSender.send_password_recovery_reset(
+        return get_email_sender_class().send_password_recovery_reset(
             subject_template_name=subject_template_name,
             email_template_name=email_template_name,
             context=context,
@@ -202,6 +206,7 @@ class UserSettingsForm(forms.ModelForm):
         widgets = {
             'location_latitude': forms.HiddenInput(),
             'location_longitude': forms.HiddenInput(),
+            'timezone': CachedSelect(cache_key='aldryn_accounts:timezone'),
         }
 
     def __init__(self, *args, **kwargs):
@@ -210,6 +215,22 @@ class UserSettingsForm(forms.ModelForm):
         self.fields['first_name'].initial = user.first_name
         self.fields['last_name'].initial = user.last_name
 
+    def clean(self):
+        cleaned_data = super(UserSettingsForm, self).clean()
+        latitude = cleaned_data.get('location_latitude')
+        longitude = cleaned_data.get('location_longitude')
+        coordinates_changed = (
+            'location_latitude' in self.changed_data or
+            'location_longitude' in self.changed_data)
+        name_outdated = (
+            not cleaned_data.get('location_name') or
+            'location_name' not in self.changed_data)
+        if coordinates_changed and name_outdated:
+            place = reverse_geocode(latitude, longitude)
+            if place:
+                cleaned_data['location_name'] = place
+        return cleaned_data
+
     def save(self):
         first_name = self.cleaned_data['first_name']
         last_name = self.cleaned_data['last_name']
@@ -217,4 +238,7 @@ class UserSettingsForm(forms.ModelForm):
         user.first_name = first_name
         user.last_name = last_name
         user.save()
-        return super(UserSettingsForm, self).save()
+        instance = super(UserSettingsForm, self).save()
+        if 'profile_image' in self.changed_data and instance.profile_image:
+            tasks.enqueue(tasks.generate_profile_image_thumbnails, instance.pk)
+        return instance
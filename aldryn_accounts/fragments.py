@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Pre-rendered empty login and signup forms, e.g. for a login box in the
+header of every page. A fragment is rendered once per process, language
+and url configuration with placeholders for the CSRF token and the query
+string of the form action, every render only fills in the visitor's token
+and the redirect target (the ``next`` parameter of the request or else
+the current page).
+"""
+from django.core.urlresolvers import get_urlconf
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+from .utils import get_login_view, get_signup_view
+from .view_mixins import CSRF_TOKEN_PLACEHOLDER
+
+try:
+    from django.core.signals import setting_changed
+except ImportError:  # Django < 1.8
+    from django.test.signals import setting_changed
+
+
+# name: (function returning the view, template, name of the form in the template)
+FRAGMENTS = {
+    'login': (get_login_view, 'aldryn_accounts/inc/login_form.html', 'login_form'),
+    'signup': (get_signup_view, 'aldryn_accounts/inc/signup_form.html', 'signup_form'),
+}
+
+# stands in for the query string of the login form action, which the
+# template renders from ``request.GET``
+QUERY_PLACEHOLDER = 'aldryn-accounts-query-placeholder'
+
+_cache = {}
+
+
+def render_fragment(name):
+    """
+    Renders the empty form fragment ``name`` with the CSRF token and query
+    string placeholders.
+    """
+    get_view, template_name, form_name = FRAGMENTS[name]
+    return render_to_string(template_name, {
+        form_name: get_view().form_class(),
+        'csrf_token': CSRF_TOKEN_PLACEHOLDER,
+        'request': {'GET': {'urlencode': QUERY_PLACEHOLDER}},
+    })
+
+
+def get_redirect_query(name, request):
+    """
+    The query string of the form action for ``request``, keeps its
+    parameters and redirects back to the current page unless it has a
+    redirect target.
+    """
+    query = request.GET.copy()
+    redirect_field_name = getattr(FRAGMENTS[name][0](), 'redirect_field_name', 'next')
+    if redirect_field_name not in query:
+        query[redirect_field_name] = request.get_full_path()
+    return query.urlencode()
+
+
+def get_fragment(name, request=None):
+    """
+    Returns the empty form fragment ``name`` with the CSRF token and the
+    redirect target of ``request`` (an empty token and no redirect
+    without a request).
+    """
+    key = (name, get_language(), get_urlconf())
+    fragment = _cache.get(key)
+    if fragment is None:
+        fragment = _cache[key] = render_fragment(name)
+    token = get_token(request) if request is not None else ''
+    fragment = fragment.replace(CSRF_TOKEN_PLACEHOLDER, token)
+    if QUERY_PLACEHOLDER in fragment:
+        query = get_redirect_query(name, request) if request is not None else ''
+        fragment = fragment.replace(QUERY_PLACEHOLDER, escape(query))
+    return mark_safe(fragment)
+
+
+def clear_cache(**kwargs):
+    _cache.clear()
+
+setting_changed.connect(clear_cache, dispatch_uid='aldryn_accounts:clear_form_fragments')
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+
+import math
+
+
+EARTH_RADIUS = 6371.0088  # mean earth radius in km
+
+
+def haversine(latitude1, longitude1, latitude2, longitude2):
+    """
+    Great circle distance between two points in km.
+    """
+    latitude1, longitude1, latitude2, longitude2 = map(
+        math.radians, (latitude1, longitude1, latitude2, longitude2))
+    a = (math.sin((latitude2 - latitude1) / 2) ** 2 +
+         math.cos(latitude1) * math.cos(latitude2) *
+         math.sin((longitude2 - longitude1) / 2) ** 2)
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 12
+
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """
+    Geohash of a coordinate. Geohashes sharing a prefix lie in the same
+    cell, and the alphabet is in ascii order, so a cell is a string range.
+    """
+    latitude_range = [-90.0, 90.0]
+    longitude_range = [-180.0, 180.0]
+    geohash = []
+    bits, bit_count, even = 0, 0, True
+    while len(geohash) < precision:
+        if even:
+            value, value_range = longitude, longitude_range
+        else:
+            value, value_range = latitude, latitude_range
+        middle = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            value_range[0] = middle
+        else:
+            value_range[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return ''.join(geohash)
+
+
+def get_geohash(latitude, longitude):
+    """
+    Geohash of an optional location, empty if it is not set.
+    """
+    if latitude is None or longitude is None:
+        return ''
+    return geohash_encode(latitude, longitude)
+
+
+def geohash_cell_size(precision):
+    """
+    Returns (height, width) of a geohash cell in degrees.
+    """
+    bits = 5 * precision
+    longitude_bits = (bits + 1) // 2
+    latitude_bits = bits // 2
+    return 180.0 / 2 ** latitude_bits, 360.0 / 2 ** longitude_bits
+
+
+def bounding_box(latitude, longitude, radius):
+    """
+    Returns (south, west, north, east) of the area within ``radius`` km.
+    West is greater than east if the box crosses the antimeridian.
+    """
+    delta_latitude = math.degrees(radius / EARTH_RADIUS)
+    south = latitude - delta_latitude
+    north = latitude + delta_latitude
+    if south <= -90 or north >= 90:
+        # contains a pole, all longitudes
+        return max(south, -90.0), -180.0, min(north, 90.0), 180.0
+    delta_longitude = math.degrees(
+        math.asin(min(1.0, math.sin(radius / EARTH_RADIUS) / math.cos(math.radians(latitude)))))
+    west = longitude - delta_longitude
+    east = longitude + delta_longitude
+    if east - west >= 360:
+        return south, -180.0, north, 180.0
+    if west < -180:
+        west += 360
+    if east > 180:
+        east -= 360
+    return south, west, north, east
+
+
+def _geohash_cells(south, west, north, east, precision):
+    height, width = geohash_cell_size(precision)
+    prefixes = set()
+    latitude = (math.floor((south + 90) / height) + 0.5) * height - 90
+    while latitude < north + height / 2 and latitude < 90:
+        longitude = (math.floor((west + 180) / width) + 0.5) * width - 180
+        while longitude < east + width / 2 and longitude < 180:
+            prefixes.add(geohash_encode(latitude, longitude, precision))
+            longitude += width
+        latitude += height
+    return prefixes
+
+
+def geohash_prefixes(south, west, north, east, max_cells=32):
+    """
+    Geohash prefixes of the cells covering the bounding box, using the most
+    precise cells that need no more than ``max_cells`` prefixes.
+    """
+    if west > east:  # crosses the antimeridian
+        boxes = [(south, west, north, 180.0), (south, -180.0, north, east)]
+    else:
+        boxes = [(south, west, north, east)]
+    prefixes = set([''])
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        height, width = geohash_cell_size(precision)
+        count = sum(
+            (int((n - s) / height) + 2) * (int((e - w) / width) + 2)
+            for s, w, n, e in boxes)
+        if count > max_cells:
+            break
+        prefixes = set()
+        for box in boxes:
+            prefixes |= _geohash_cells(*(box + (precision,)))
+    return sorted(prefixes)
+
+
+def _next_prefix(prefix):
+    # the first string after all strings starting with prefix
+    while prefix and prefix[-1] == GEOHASH_ALPHABET[-1]:
+        prefix = prefix[:-1]
+    if not prefix:
+        return None
+    return prefix[:-1] + GEOHASH_ALPHABET[GEOHASH_ALPHABET.index(prefix[-1]) + 1]
+
+
+def geohash_ranges(prefixes):
+    """
+    Merges sorted prefixes into (start, stop) string ranges, stop is
+    exclusive and None for an open end.
+    """
+    ranges = []
+    for prefix in prefixes:
+        stop = _next_prefix(prefix)
+        if ranges and ranges[-1][1] == prefix:
+            ranges[-1] = (ranges[-1][0], stop)
+        else:
+            ranges.append((prefix, stop))
+    return ranges
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+Offline reverse geocoding: finds the nearest known place for a coordinate.
+
+The places are stored in a binary index file (see the
+``build_places_index`` management command) which is memory mapped, so
+that worker processes share it and lookups need no parsing. The index
+buckets the places in a grid of 0.5x0.5 degree cells; a lookup scans the
+cell of the coordinate and rings of neighbouring cells until no closer
+place can exist. Places are compared by an equirectangular approximation,
+which only matters for the far away places of sparse areas.
+"""
+from __future__ import division, unicode_literals
+
+import io
+import math
+import mmap
+import struct
+import threading
+
+from .conf import settings
+from .geo import haversine
+
+
+MAGIC = b'AAPLACE1'
+# magic, cells, places, offset of the coordinates, offset of the name index,
+# offset of the names
+HEADER = struct.Struct('<8sIIIII')
+COORDINATES = struct.Struct('<ff')  # latitude, longitude
+NAME = struct.Struct('<II')  # start, length
+CELLS_PER_DEGREE = 2
+ROWS, COLUMNS = 180 * CELLS_PER_DEGREE, 360 * CELLS_PER_DEGREE
+CELLS = ROWS * COLUMNS
+KM_PER_DEGREE = 111.19
+
+
+def _cell(latitude, longitude):
+    row = int(math.floor((latitude + 90) * CELLS_PER_DEGREE))
+    column = int(math.floor((longitude + 180) * CELLS_PER_DEGREE)) % COLUMNS
+    return min(max(row, 0), ROWS - 1), column
+
+
+def build_index(places, path):
+    """
+    Writes the index for ``places``, an iterable of (name, latitude,
+    longitude) tuples, to ``path``. Returns the number of places.
+    """
+    cells = [[] for _ in range(CELLS)]
+    count = 0
+    for name, latitude, longitude in places:
+        row, column = _cell(latitude, longitude)
+        cells[row * COLUMNS + column].append((latitude, longitude, name))
+        count += 1
+
+    coordinates = io.BytesIO()
+    name_index = io.BytesIO()
+    names = io.BytesIO()
+    offsets = [0]
+    for cell in cells:
+        for latitude, longitude, name in cell:
+            encoded = name.encode('utf-8')
+            coordinates.write(COORDINATES.pack(latitude, longitude))
+            name_index.write(NAME.pack(names.tell(), len(encoded)))
+            names.write(encoded)
+        offsets.append(offsets[-1] + len(cell))
+
+    coordinates_offset = HEADER.size + 4 * len(offsets)
+    name_index_offset = coordinates_offset + COORDINATES.size * count
+    names_offset = name_index_offset + NAME.size * count
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, CELLS, count, coordinates_offset,
+                            name_index_offset, names_offset))
+        f.write(struct.pack('<{0}I'.format(len(offsets)), *offsets))
+        f.write(coordinates.getvalue())
+        f.write(name_index.getvalue())
+        f.write(names.getvalue())
+    return count
+
+
+def read_places(path, countries_path=None, min_population=0):
+    """
+    Reads places from a GeoNames dump (e.g. cities1000.txt, the country
+    names are taken from countryInfo.txt if given) or from a tab separated
+    file with name, latitude and longitude columns.
+    """
+    countries = {}
+    if countries_path:
+        with io.open(countries_path, encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('#'):
+                    continue
+                columns = line.rstrip('\n').split('\t')
+                if len(columns) > 4:
+                    countries[columns[0]] = columns[4]
+
+    with io.open(path, encoding='utf-8') as f:
+        for line in f:
+            columns = line.rstrip('\n').split('\t')
+            if len(columns) >= 15:
+                # GeoNames: name, latitude, longitude, country code, population
+                population = int(columns[14] or 0)
+                if population < min_population:
+                    continue
+                country = countries.get(columns[8], columns[8])
+                name = '{0}, {1}'.format(columns[1], country) if country else columns[1]
+                yield name, float(columns[4]), float(columns[5])
+            elif len(columns) >= 3 and not line.startswith('#'):
+                yield columns[0], float(columns[1]), float(columns[2])
+
+
+class ReverseGeocoder(object):
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, cells, self.count, self._coordinates_offset,
+         self._name_index_offset, self._names_offset) = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC or cells != CELLS:
+            raise ValueError('{0} is not a places index'.format(path))
+
+    def _scan_cell(self, row, column, latitude, longitude, scale, best):
+        # ranks by an equirectangular approximation (squared degrees), which
+        # is accurate enough for neighbouring places and much cheaper than
+        # the great circle distance
+        start, stop = struct.unpack_from(
+            '<II', self._data, HEADER.size + 4 * (row * COLUMNS + column))
+        if start == stop:
+            return best
+        coordinates = struct.unpack_from(
+            '<{0}f'.format(2 * (stop - start)), self._data,
+            self._coordinates_offset + COORDINATES.size * start)
+        for index in range(stop - start):
+            delta_longitude = abs(longitude - coordinates[2 * index + 1])
+            if delta_longitude > 180:
+                delta_longitude = 360 - delta_longitude
+            delta_longitude *= scale
+            delta_latitude = latitude - coordinates[2 * index]
+            distance = delta_latitude * delta_latitude + delta_longitude * delta_longitude
+            if best is None or distance < best[0]:
+                best = (distance, start + index)
+        return best
+
+    def _ring(self, row, column, ring):
+        if ring == 0:
+            yield row, column
+            return
+        for r in range(max(row - ring, 0), min(row + ring, ROWS - 1) + 1):
+            if abs(r - row) == ring:
+                columns = range(column - ring, column + ring + 1)
+            else:
+                columns = (column - ring, column + ring)
+            for c in columns:
+                yield r, c % COLUMNS
+
+    def _ring_bound(self, row, column, ring, latitude, longitude, scale):
+        """
+        Lower bound of the (approximated) distance of places in ``ring``:
+        the distance to the edge of the cells scanned before it.
+        """
+        size = 1.0 / CELLS_PER_DEGREE
+        south = (row - ring + 1) * size - 90
+        north = (row + ring) * size - 90
+        west = (column - ring + 1) * size - 180
+        east = (column + ring) * size - 180
+        bound = min(latitude - south, north - latitude,
+                    (longitude - west) * scale, (east - longitude) * scale)
+        return bound * bound
+
+    def nearest(self, latitude, longitude, max_distance=None):
+        """
+        Returns (name, distance in km) of the nearest place or None if there
+        is no place within ``max_distance`` km.
+        """
+        row, column = _cell(latitude, longitude)
+        scale = max(math.cos(math.radians(latitude)), 0.01)
+        if max_distance is not None:
+            limit = (max_distance / KM_PER_DEGREE) ** 2
+        best = None
+        for ring in range(COLUMNS // 2 + 1):
+            if ring:
+                bound = self._ring_bound(row, column, ring, latitude, longitude, scale)
+                if best is not None and bound > best[0]:
+                    break
+                if max_distance is not None and bound > limit:
+                    break
+            seen = set()
+            for cell in self._ring(row, column, ring):
+                if cell not in seen:
+                    seen.add(cell)
+                    best = self._scan_cell(cell[0], cell[1], latitude, longitude, scale, best)
+        if best is None:
+            return None
+        place_latitude, place_longitude = COORDINATES.unpack_from(
+            self._data, self._coordinates_offset + COORDINATES.size * best[1])
+        distance = haversine(latitude, longitude, place_latitude, place_longitude)
+        if max_distance is not None and distance > max_distance:
+            return None
+        name_start, name_length = NAME.unpack_from(
+            self._data, self._name_index_offset + NAME.size * best[1])
+        start = self._names_offset + name_start
+        return self._data[start:start + name_length].decode('utf-8'), distance
+
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+
+def get_reverse_geocoder():
+    """
+    Returns the process wide geocoder or None if no index is configured.
+    """
+    global _geocoder
+    path = settings.ALDRYN_ACCOUNTS_PLACES_INDEX
+    if not path:
+        return None
+    geocoder = _geocoder
+    if geocoder is None or geocoder.path != path:
+        with _geocoder_lock:
+            if _geocoder is None or _geocoder.path != path:
+                _geocoder = ReverseGeocoder(path)
+            geocoder = _geocoder
+    return geocoder
+
+
+def reverse_geocode(latitude, longitude):
+    """
+    Name of the nearest place within
+    ``ALDRYN_ACCOUNTS_REVERSE_GEOCODING_MAX_DISTANCE`` km or None.
+    """
+    geocoder = get_reverse_geocoder()
+    if geocoder is None or latitude is None or longitude is None:
+        return None
+    result = geocoder.nearest(
+        latitude, longitude,
+        max_distance=settings.ALDRYN_ACCOUNTS_REVERSE_GEOCODING_MAX_DISTANCE)
+    return result[0] if result else None
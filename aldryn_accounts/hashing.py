@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import time
+
+from . import instrumentation
+from .conf import settings
+from .exceptions import PasswordHashingUnavailable
+
+
+logger = logging.getLogger('aldryn_accounts')
+
+
+class PasswordHashingGate(object):
+    """
+    Limits the number of concurrent password verifications in this process.
+
+    Callers that can not get a slot within ``timeout`` seconds get a
+    ``PasswordHashingUnavailable`` exception instead of queueing up behind
+    the running hash computations.
+    """
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self.active = 0
+        self._condition = threading.Condition(threading.Lock())
+        self._stats = {
+            'acquired': 0,
+            'rejected': 0,
+            'wait_time': 0.0,
+            'max_wait_time': 0.0,
+        }
+
+    def acquire(self):
+        start = time.time()
+        deadline = start + self.timeout
+        with self._condition:
+            while self.active >= self.size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self._stats['rejected'] += 1
+                    instrumentation.incr('hashing.rejected')
+                    logger.warning(
+                        "Rejected password verification, %s hashing slots "
+                        "busy for %.3fs" % (self.size, time.time() - start))
+                    raise PasswordHashingUnavailable()
+                self._condition.wait(remaining)
+            self.active += 1
+            waited = time.time() - start
+            self._stats['acquired'] += 1
+            self._stats['wait_time'] += waited
+            self._stats['max_wait_time'] = max(self._stats['max_wait_time'], waited)
+        instrumentation.get_sink().timing('hashing.wait', waited * 1000)
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    def get_stats(self):
+        with self._condition:
+            stats = dict(self._stats)
+            stats['active'] = self.active
+        return stats
+
+
+_gate = None
+_gate_lock = threading.Lock()
+
+
+def get_hashing_gate():
+    """
+    Returns the process wide gate or None if concurrency is not limited.
+    """
+    global _gate
+    size = settings.ALDRYN_ACCOUNTS_PASSWORD_HASHING_CONCURRENCY
+    if not size:
+        return None
+    timeout = settings.ALDRYN_ACCOUNTS_PASSWORD_HASHING_QUEUE_TIMEOUT
+    gate = _gate
+    if gate is None or (gate.size, gate.timeout) != (size, timeout):
+        with _gate_lock:
+            if _gate is None or (_gate.size, _gate.timeout) != (size, timeout):
+                _gate = PasswordHashingGate(size, timeout)
+            gate = _gate
+    return gate
+
+
+def check_password(user, raw_password):
+    """
+    ``user.check_password`` guarded by the hashing gate.
+    """
+    gate = get_hashing_gate()
+    if gate is None:
+        return user.check_password(raw_password)
+    with gate:
+        return user.check_password(raw_password)
+
+
+def get_hashing_stats():
+    gate = _gate
+    if gate is None:
+        return {}
+    return gate.get_stats()
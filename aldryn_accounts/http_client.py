@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Process wide HTTP client for calls to external services (e.g. from the
+social auth pipelines), with connection pooling and strict timeouts.
+"""
+import socket
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .conf import settings
+from .exceptions import ResponseTooLarge
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=settings.ALDRYN_ACCOUNTS_HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=settings.ALDRYN_ACCOUNTS_HTTP_POOL_SIZE,
+                    max_retries=0,
+                )
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+def get_timeout():
+    return (
+        settings.ALDRYN_ACCOUNTS_HTTP_CONNECT_TIMEOUT,
+        settings.ALDRYN_ACCOUNTS_HTTP_READ_TIMEOUT,
+    )
+
+
+def get(url, **kwargs):
+    kwargs.setdefault('timeout', get_timeout())
+    return get_session().get(url, **kwargs)
+
+
+def _abort(response, aborted):
+    # a server sending a byte now and then never triggers the read timeout,
+    # shutting the socket down ends the read that is in progress
+    aborted.set()
+    sock = getattr(getattr(response.raw, 'connection', None), 'sock', None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except (OSError, socket.error):
+            pass
+
+
+def download(url, max_size=None, chunk_size=8 * 1024):
+    """
+    Streams the body of ``url`` and returns it as bytes.
+
+    Raises ``ResponseTooLarge`` as soon as more than ``max_size`` bytes are
+    announced or received, ``requests.Timeout`` if the download takes longer
+    than ``ALDRYN_ACCOUNTS_HTTP_DOWNLOAD_TIMEOUT`` (also while a read is in
+    progress) and ``requests.HTTPError`` for error responses.
+    """
+    if max_size is None:
+        max_size = settings.ALDRYN_ACCOUNTS_HTTP_MAX_DOWNLOAD_SIZE
+    timeout = settings.ALDRYN_ACCOUNTS_HTTP_DOWNLOAD_TIMEOUT
+    deadline = time.time() + timeout
+    response = get(url, stream=True)
+    aborted = threading.Event()
+    watchdog = threading.Timer(max(deadline - time.time(), 0), _abort, (response, aborted))
+    watchdog.daemon = True
+    watchdog.start()
+    try:
+        response.raise_for_status()
+        content_length = response.headers.get('Content-Length')
+        if content_length and content_length.isdigit() and int(content_length) > max_size:
+            raise ResponseTooLarge(
+                '{0} announced {1} bytes'.format(url, content_length))
+        chunks = []
+        size = 0
+        try:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if aborted.is_set() or time.time() > deadline:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise ResponseTooLarge(
+                        '{0} sent more than {1} bytes'.format(url, max_size))
+                chunks.append(chunk)
+        except requests.RequestException:
+            if not aborted.is_set():
+                raise
+        # the body is cut short when the watchdog ends the read
+        if aborted.is_set() or time.time() > deadline:
+            raise requests.Timeout('Download of {0} took longer than {1} seconds'.format(url, timeout))
+        return b''.join(chunks)
+    finally:
+        watchdog.cancel()
+        response.close()
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Lightweight timing and counting hooks for the hot paths of aldryn_accounts.
+
+Events are passed to the sink configured in
+``ALDRYN_ACCOUNTS_INSTRUMENTATION_SINK`` (a dotted path to a class). Without
+a sink everything is a no-op.
+"""
+import logging
+import socket
+import time
+from functools import wraps
+
+from django.utils.module_loading import import_string
+
+from .conf import settings
+
+try:
+    from django.core.signals import setting_changed
+except ImportError:  # Django < 1.8
+    from django.test.signals import setting_changed
+
+
+logger = logging.getLogger('aldryn_accounts.instrumentation')
+
+
+class NullSink(object):
+    enabled = False
+
+    def timing(self, name, milliseconds):
+        pass
+
+    def incr(self, name, count=1):
+        pass
+
+
+class LoggingSink(NullSink):
+    enabled = True
+
+    def timing(self, name, milliseconds):
+        logger.info('%s: %.3fms', name, milliseconds)
+
+    def incr(self, name, count=1):
+        logger.info('%s: +%s', name, count)
+
+
+class AggregatingSink(NullSink):
+    """
+    Keeps the count and total milliseconds of every timing in memory, e.g.
+    to see the cost of the signal receivers during a bulk save.
+    """
+    enabled = True
+
+    def __init__(self):
+        self.timings = {}
+        self.counters = {}
+
+    def timing(self, name, milliseconds):
+        count, total = self.timings.get(name, (0, 0.0))
+        self.timings[name] = (count + 1, total + milliseconds)
+
+    def incr(self, name, count=1):
+        self.counters[name] = self.counters.get(name, 0) + count
+
+
+class StatsdSink(NullSink):
+    """
+    Sends timings and counters as statsd packets over UDP.
+    """
+    enabled = True
+
+    def __init__(self, host=None, port=None, prefix=None):
+        self.address = (
+            host or settings.ALDRYN_ACCOUNTS_INSTRUMENTATION_STATSD_HOST,
+            port or settings.ALDRYN_ACCOUNTS_INSTRUMENTATION_STATSD_PORT,
+        )
+        self.prefix = prefix or settings.ALDRYN_ACCOUNTS_INSTRUMENTATION_STATSD_PREFIX
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send(self, name, value, metric_type):
+        data = '{0}.{1}:{2}|{3}'.format(self.prefix, name, value, metric_type)
+        try:
+            self.socket.sendto(data.encode('utf-8'), self.address)
+        except socket.error:
+            # metrics must never break a request
+            logger.debug('Could not send %s to statsd', data, exc_info=True)
+
+    def timing(self, name, milliseconds):
+        self.send(name, '{0:.3f}'.format(milliseconds), 'ms')
+
+    def incr(self, name, count=1):
+        self.send(name, count, 'c')
+
+
+_sink = None
+
+
+def get_sink():
+    global _sink
+    if _sink is None:
+        path = settings.ALDRYN_ACCOUNTS_INSTRUMENTATION_SINK
+        _sink = import_string(path)() if path else NullSink()
+    return _sink
+
+
+def reset_sink(**kwargs):
+    global _sink
+    setting = kwargs.get('setting')
+    if setting is None or setting.startswith('ALDRYN_ACCOUNTS_INSTRUMENTATION'):
+        _sink = None
+
+setting_changed.connect(reset_sink, dispatch_uid='aldryn_accounts:reset_instrumentation_sink')
+
+
+class Timer(object):
+    def __init__(self, sink, name):
+        self.sink = sink
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.sink.timing(self.name, (time.time() - self.start) * 1000)
+
+
+class NullTimer(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+NULL_TIMER = NullTimer()
+
+
+def timer(name):
+    """
+    Context manager reporting the time spent in its block as ``name``.
+    """
+    sink = get_sink()
+    if not sink.enabled:
+        return NULL_TIMER
+    return Timer(sink, name)
+
+
+def incr(name, count=1):
+    sink = get_sink()
+    if sink.enabled:
+        sink.incr(name, count)
+
+
+def timed(name):
+    """
+    Decorator reporting the time spent in the decorated function as ``name``.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            sink = get_sink()
+            if not sink.enabled:
+                return func(*args, **kwargs)
+            with Timer(sink, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timed_receiver(func=None, name=None):
+    """
+    Decorator for signal receivers, reporting the time spent in every call
+    as ``receiver.<name>`` if ``ALDRYN_ACCOUNTS_INSTRUMENTATION_RECEIVERS``
+    is set.
+    """
+    if func is None:
+        return lambda func: timed_receiver(func, name)
+    metric = 'receiver.{0}'.format(name or func.__name__)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not settings.ALDRYN_ACCOUNTS_INSTRUMENTATION_RECEIVERS:
+            return func(*args, **kwargs)
+        with timer(metric):
+            return func(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Per visitor locale state (time zone and location), stored in the session
+or, with ``ALDRYN_ACCOUNTS_LOCALE_STATE_STORAGE = 'cookie'``, in a signed
+cookie so that anonymous visitors never need a session.
+"""
+from django.core import signing
+
+from .conf import settings
+
+
+SALT = 'aldryn_accounts.locale_state'
+
+
+class SessionLocaleState(object):
+
+    def __init__(self, request):
+        # request.session is looked up on use, it may be replaced later on
+        self.request = request
+
+    def get(self, key, default=None):
+        return self.request.session.get(key, default)
+
+    def set(self, key, value):
+        # only changes mark the session as modified (and save it)
+        session = self.request.session
+        current = session.get(key)
+        if current == value or (isinstance(value, tuple) and current == list(value)):
+            return
+        session[key] = value
+
+    def save(self, response):
+        pass
+
+
+class CookieLocaleState(object):
+    """
+    Keeps the time zone and location in a compact signed cookie. Other
+    values (e.g. the raw GeoIP data) only live for the current request.
+    """
+    KEYS = {
+        'django_timezone': 'tz',
+        'django_location': 'loc',
+        'django_location_name': 'name',
+    }
+
+    def __init__(self, request):
+        self.data = {}
+        self.values = {}
+        self.modified = False
+        cookie = request.COOKIES.get(settings.ALDRYN_ACCOUNTS_LOCALE_STATE_COOKIE_NAME)
+        if cookie:
+            try:
+                data = signing.loads(
+                    cookie, salt=SALT,
+                    max_age=settings.ALDRYN_ACCOUNTS_LOCALE_STATE_COOKIE_MAX_AGE)
+            except signing.BadSignature:
+                data = None
+            if isinstance(data, dict):
+                self.data = data
+
+    def get(self, key, default=None):
+        if key in self.KEYS:
+            return self.data.get(self.KEYS[key], default)
+        return self.values.get(key, default)
+
+    def set(self, key, value):
+        if key not in self.KEYS:
+            self.values[key] = value
+            return
+        if isinstance(value, tuple):
+            # the cookie is json encoded
+            value = list(value)
+        if self.data.get(self.KEYS[key]) != value:
+            self.data[self.KEYS[key]] = value
+            self.modified = True
+
+    def save(self, response):
+        if not self.modified:
+            return
+        response.set_cookie(
+            settings.ALDRYN_ACCOUNTS_LOCALE_STATE_COOKIE_NAME,
+            signing.dumps(self.data, salt=SALT, compress=True),
+            max_age=settings.ALDRYN_ACCOUNTS_LOCALE_STATE_COOKIE_MAX_AGE,
+            domain=settings.SESSION_COOKIE_DOMAIN,
+            path=settings.SESSION_COOKIE_PATH,
+            secure=settings.SESSION_COOKIE_SECURE or None,
+            httponly=True,
+        )
+        self.modified = False
+
+
+def get_locale_state(request):
+    state = getattr(request, '_aldryn_accounts_locale_state', None)
+    if state is None:
+        if settings.ALDRYN_ACCOUNTS_LOCALE_STATE_STORAGE == 'cookie':
+            state = CookieLocaleState(request)
+        else:
+            state = SessionLocaleState(request)
+        request._aldryn_accounts_locale_state = state
+    return state
+
+
+def save_locale_state(request, response):
+    state = getattr(request, '_aldryn_accounts_locale_state', None)
+    if state is not None:
+        state.save(response)
+    return response
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from optparse import make_option
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+
+from aldryn_accounts.geocoding import build_index, read_places
+
+
+OPTIONS = (
+    (('--countries',), dict(
+        default=None, dest='countries',
+        help='GeoNames countryInfo.txt, to name places "City, Country".')),
+    (('--min-population',), dict(
+        type=int, default=0, dest='min_population',
+        help='Skip GeoNames places with a smaller population.')),
+)
+
+
+class Command(BaseCommand):
+    help = ("Builds the places index used for offline reverse geocoding "
+            "(ALDRYN_ACCOUNTS_PLACES_INDEX) from a GeoNames dump or a tab "
+            "separated file with name, latitude and longitude columns.")
+    args = '<places file> <index file>'
+
+    if django.VERSION < (1, 8):
+        option_list = BaseCommand.option_list + tuple(
+            make_option(*args, **kwargs) for args, kwargs in OPTIONS)
+
+    def add_arguments(self, parser):
+        parser.add_argument('source')
+        parser.add_argument('index')
+        for args, kwargs in OPTIONS:
+            parser.add_argument(*args, **kwargs)
+
+    def handle(self, *args, **options):
+        if args:  # Django < 1.8
+            if len(args) != 2:
+                raise CommandError('Usage: build_places_index {0}'.format(self.args))
+            options['source'], options['index'] = args
+        places = read_places(
+            options['source'],
+            countries_path=options['countries'],
+            min_population=options['min_population'],
+        )
+        count = build_index(places, options['index'])
+        self.stdout.write("Wrote {0} places to {1}.".format(count, options['index']))
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from collections import defaultdict
+from optparse import make_option
+
+import django
+from django.core.management.base import BaseCommand
+
+from aldryn_accounts.models import UserSettings
+from aldryn_accounts.thumbnails import generate_thumbnails
+from aldryn_accounts.utils import get_content_addressed_name
+
+
+BATCH_SIZE = 500
+
+OPTIONS = (
+    (('--dry-run',), dict(
+        action='store_true', default=False, dest='dry_run',
+        help='Only report what would be changed.')),
+    (('--delete',), dict(
+        action='store_true', default=False, dest='delete',
+        help='Delete the old files once no user settings refer to them.')),
+    (('--no-thumbnails',), dict(
+        action='store_false', default=True, dest='thumbnails',
+        help='Do not generate thumbnails for the renamed images.')),
+)
+
+
+class Command(BaseCommand):
+    help = ("Renames existing profile images to content addressed names, "
+            "storing every distinct image once, and updates the user settings "
+            "in bulk.")
+
+    if django.VERSION < (1, 8):
+        option_list = BaseCommand.option_list + tuple(
+            make_option(*args, **kwargs) for args, kwargs in OPTIONS)
+
+    def add_arguments(self, parser):
+        for args, kwargs in OPTIONS:
+            parser.add_argument(*args, **kwargs)
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        storage = UserSettings._meta.get_field('profile_image').storage
+
+        pks_by_name = defaultdict(list)
+        rows = (UserSettings.objects.exclude(profile_image='')
+                .values_list('pk', 'profile_image'))
+        for pk, name in rows.iterator():
+            pks_by_name[name].append(pk)
+        self.stdout.write("Found {0} profile images used by {1} user settings.".format(
+            len(pks_by_name), sum(len(pks) for pks in pks_by_name.values())))
+
+        new_names = {}
+        for name in sorted(pks_by_name):
+            if not storage.exists(name):
+                self.stderr.write("Missing file {0}, skipped.".format(name))
+                continue
+            content = storage.open(name)
+            try:
+                new_name = get_content_addressed_name(content, name)
+                if new_name != name and not dry_run and not storage.exists(new_name):
+                    new_name = storage.save(new_name, content)
+            finally:
+                content.close()
+            if new_name != name:
+                new_names[name] = new_name
+
+        pks_by_new_name = defaultdict(list)
+        for name, new_name in new_names.items():
+            pks_by_new_name[new_name].extend(pks_by_name[name])
+        self.stdout.write("{0} images map to {1} distinct files.".format(
+            len(new_names), len(pks_by_new_name)))
+        if dry_run:
+            return
+
+        for new_name, pks in pks_by_new_name.items():
+            # keeps the number of query parameters within database limits
+            for start in range(0, len(pks), BATCH_SIZE):
+                UserSettings.objects.filter(
+                    pk__in=pks[start:start + BATCH_SIZE]
+                ).update(profile_image=new_name)
+            if options['thumbnails']:
+                generate_thumbnails(UserSettings.objects.get(pk=pks[0]).profile_image)
+
+        if options['delete']:
+            for name in new_names:
+                storage.delete(name)
+        self.stdout.write("Updated {0} user settings.".format(
+            sum(len(pks) for pks in pks_by_new_name.values())))
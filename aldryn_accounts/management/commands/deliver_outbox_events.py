@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import time
+from optparse import make_option
+
+import django
+from django.core.management.base import BaseCommand
+
+from aldryn_accounts import outbox
+
+
+OPTIONS = (
+    (('--batch-size',), dict(
+        type=int, default=100, dest='batch_size',
+        help='Number of events handed to the consumers per batch.')),
+    (('--loop',), dict(
+        action='store_true', default=False, dest='loop',
+        help='Keep polling for new events instead of exiting once the outbox is empty.')),
+    (('--interval',), dict(
+        type=float, default=1.0, dest='interval',
+        help='Seconds to wait between polls of an empty outbox (with --loop).')),
+    (('--purge-days',), dict(
+        type=int, default=None, dest='purge_days',
+        help='Delete events delivered more than this many days ago.')),
+)
+
+
+class Command(BaseCommand):
+    help = ("Delivers the pending account events of the outbox to the "
+            "consumers in ALDRYN_ACCOUNTS_OUTBOX_CONSUMERS. Run one worker "
+            "at a time, the events of a user are delivered in order.")
+
+    if django.VERSION < (1, 8):
+        option_list = BaseCommand.option_list + tuple(
+            make_option(*args, **kwargs) for args, kwargs in OPTIONS)
+
+    def add_arguments(self, parser):
+        for args, kwargs in OPTIONS:
+            parser.add_argument(*args, **kwargs)
+
+    def handle(self, *args, **options):
+        if options['purge_days'] is not None:
+            self.stdout.write("Purged {0} delivered events.".format(
+                outbox.purge(options['purge_days'])))
+        consumers = outbox.get_consumers()
+        total_delivered = total_failed = 0
+        while True:
+            delivered, failed = outbox.deliver(options['batch_size'], consumers)
+            total_delivered += delivered
+            total_failed += failed
+            if delivered or failed:
+                continue
+            # failed events are retried once their delay passed
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write("Delivered {0} events, {1} failed deliveries.".format(
+            total_delivered, total_failed))
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import time
+from optparse import make_option
+
+import django
+from django.core.management.base import BaseCommand
+
+from aldryn_accounts.dataset import DEFAULT_PASSWORD, generate_dataset
+
+
+OPTIONS = (
+    (('--users',), dict(
+        type=int, default=1000, dest='users',
+        help='Number of users to generate.')),
+    (('--seed',), dict(
+        type=int, default=0, dest='seed',
+        help='Random seed, the same seed generates the same dataset.')),
+    (('--batch-size',), dict(
+        type=int, default=5000, dest='batch_size',
+        help='Number of users inserted per bulk insert / transaction.')),
+    (('--processes',), dict(
+        type=int, default=1, dest='processes',
+        help='Number of parallel processes (requires a database with '
+             'concurrent writers, e.g. Postgres).')),
+    (('--max-emails',), dict(
+        type=int, default=3, dest='max_emails',
+        help='Maximum number of verified email addresses per user.')),
+    (('--pending-ratio',), dict(
+        type=float, default=0.2, dest='pending_ratio',
+        help='Share of users with a pending email confirmation.')),
+    (('--signup-codes',), dict(
+        type=int, default=None, dest='signup_codes',
+        help='Number of signup codes (default: 1 per 100 users).')),
+    (('--password',), dict(
+        default=DEFAULT_PASSWORD, dest='password',
+        help='Password of all generated users.')),
+)
+
+
+class Command(BaseCommand):
+    help = ("Generates a reproducible accounts dataset (users, email addresses, "
+            "email confirmations, signup codes and user settings) for "
+            "benchmarks and tests.")
+
+    if django.VERSION < (1, 8):
+        option_list = BaseCommand.option_list + tuple(
+            make_option(*args, **kwargs) for args, kwargs in OPTIONS)
+
+    def add_arguments(self, parser):
+        for args, kwargs in OPTIONS:
+            parser.add_argument(*args, **kwargs)
+
+    def handle(self, *args, **options):
+        start = time.time()
+
+        def progress(created, total):
+            self.stdout.write("{0}/{1} users ({2:.1f}s)".format(
+                created, total, time.time() - start))
+
+        created = generate_dataset(
+            users=options['users'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            processes=options['processes'],
+            max_emails=options['max_emails'],
+            pending_ratio=options['pending_ratio'],
+            signup_codes=options['signup_codes'],
+            password=options['password'],
+            progress=progress,
+        )
+        self.stdout.write("Generated {0} users in {1:.1f}s.".format(
+            created, time.time() - start))
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from aldryn_accounts.models import UserSettings
+from aldryn_accounts.utils import user_display
+
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = ("Stores the display names of all users in UserSettings.display_name, "
+            "e.g. after enabling ALDRYN_ACCOUNTS_STORE_DISPLAY_NAME.")
+
+    def handle(self, *args, **options):
+        users = User.objects.only('pk', 'email', 'first_name', 'last_name', 'username').order_by('pk')
+        last_pk, updated, created = 0, 0, 0
+        while True:
+            batch = list(users.filter(pk__gt=last_pk)[:BATCH_SIZE])
+            if not batch:
+                break
+            stored = dict(UserSettings.objects.filter(user__in=batch).values_list('user_id', 'display_name'))
+            missing = []
+            for user in batch:
+                display_name = user_display(user)[:255]
+                if user.pk not in stored:
+                    missing.append(UserSettings(user=user, display_name=display_name))
+                elif stored[user.pk] != display_name:
+                    UserSettings.objects.filter(user_id=user.pk).update(display_name=display_name)
+                    updated += 1
+            UserSettings.objects.bulk_create(missing)
+            created += len(missing)
+            last_pk = batch[-1].pk
+        self.stdout.write('Updated {0} and created {1} user settings.'.format(updated, created))
@@ -1,40 +1,102 @@
 # -*- coding: utf-8 -*-
+from django.http import HttpResponse
 from django.utils import timezone
 from django.conf import settings
 
-from pytz import UnknownTimeZoneError
+try:
+    from django.utils.deprecation import MiddlewareMixin
+except ImportError:  # Django < 1.10
+    MiddlewareMixin = object
 
+from . import instrumentation, routers
+from .exceptions import PasswordHashingUnavailable
+from .exclusions import is_excluded
+from .locale_state import get_locale_state, save_locale_state
+from .timezones import get_timezone
 from .utils import geoip
 
 
-class TimezoneMiddleware(object):
+class TimezoneMiddleware(MiddlewareMixin):
     def process_request(self, request):
-        tz = request.session.get('django_timezone')
-        if tz:
-            try:
-                timezone.activate(tz)
-            except UnknownTimeZoneError:
-                tz = settings.TIME_ZONE
-                request.session['django_timezone'] = tz
-                timezone.activate(tz)
+        if is_excluded(request):
+            timezone.deactivate()
+            return
+        state = get_locale_state(request)
+        name = state.get('django_timezone')
+        if not name:
+            # the previous request of this thread may have activated one
+            timezone.deactivate()
+            return
+        tz = get_timezone(name)
+        if tz is None:
+            state.set('django_timezone', settings.TIME_ZONE)
+            tz = get_timezone(settings.TIME_ZONE)
+        timezone.activate(tz)
 
+    def process_response(self, request, response):
+        return save_locale_state(request, response)
 
-class GeoIPMiddleware(object):
+
+class GeoIPMiddleware(MiddlewareMixin):
     """
     Still experimental
     """
     def process_request(self, request):
+        if is_excluded(request):
+            return
         ip = request.META.get('HTTP_X_REAL_IP') or request.META.get('REMOTE_ADDR') or None
         # ip = '67.2.2.25'
         # ip = '99.27.181.216'  # LA
         # ip = '92.104.226.167'  # Switzerland (Stefan Home)
         # ip = '213.189.154.40'  # Switzerland (Divio)
-        data = geoip(ip)
+        with instrumentation.timer('geoip.lookup'):
+            data = geoip(ip)
         if data is not None:
-            request.session['geoip'] = data
-            if not request.session.get('django_timezone') and data.get('time_zone'):
-                request.session['django_timezone'] = data.get('time_zone')
-            if (not (request.session.get('django_location') or request.session.get('django_location_name'))
+            state = get_locale_state(request)
+            state.set('geoip', data)
+            if (settings.ALDRYN_ACCOUNTS_USE_GEOIP_TIMEZONE and
+                    not state.get('django_timezone') and data.get('time_zone')):
+                state.set('django_timezone', data.get('time_zone'))
+            if (not (state.get('django_location') or state.get('django_location_name'))
                     and data.get('pretty_name') and data.get('latitude') and data.get('longitude') or True):
-                request.session['django_location'] = (data.get('latitude'), data.get('longitude'),)
-                request.session['django_location_name'] = data.get('pretty_name')
+                state.set('django_location', (data.get('latitude'), data.get('longitude'),))
+                state.set('django_location_name', data.get('pretty_name'))
+
+    def process_response(self, request, response):
+        return save_locale_state(request, response)
+
+
+class PasswordHashingGateMiddleware(MiddlewareMixin):
+    """
+    Turns rejected password verifications into a fast 503 (or the configured
+    status) response instead of an internal server error.
+    """
+    def process_exception(self, request, exception):
+        if isinstance(exception, PasswordHashingUnavailable):
+            response = HttpResponse(
+                'Too many concurrent logins, please try again.',
+                content_type='text/plain',
+                status=settings.ALDRYN_ACCOUNTS_PASSWORD_HASHING_REJECT_STATUS,
+            )
+            response['Retry-After'] = '1'
+            return response
+
+
+class ReplicaPinningMiddleware(MiddlewareMixin):
+    """
+    Pins the reads of ``ReplicaRouter`` to the primary database for requests
+    with unsafe methods and for visitors that wrote to the account models
+    within the last ``ALDRYN_ACCOUNTS_REPLICA_PIN_SECONDS``.
+    """
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    def process_request(self, request):
+        routers.reset(pinned=(
+            request.method not in self.SAFE_METHODS or
+            routers.get_pin_cookie(request) is not None))
+
+    def process_response(self, request, response):
+        if routers.was_written():
+            routers.set_pin_cookie(response)
+        routers.reset()
+        return response
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+from aldryn_accounts.geo import get_geohash
+
+
+def backfill_location_geohash(apps, schema_editor):
+    UserSettings = apps.get_model('aldryn_accounts', 'UserSettings')
+    manager = UserSettings.objects.using(schema_editor.connection.alias)
+    located = (manager.exclude(location_latitude=None).exclude(location_longitude=None)
+               .order_by('pk'))
+    last_pk = 0
+    while True:
+        # batches by primary key, so that rows are not read while updated
+        rows = list(located.filter(pk__gt=last_pk).values_list(
+            'pk', 'location_latitude', 'location_longitude')[:1000])
+        if not rows:
+            break
+        for pk, latitude, longitude in rows:
+            manager.filter(pk=pk).update(location_geohash=get_geohash(latitude, longitude))
+        last_pk = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aldryn_accounts', '0002_auto_20161122_0800'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersettings',
+            name='location_geohash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.RunPython(backfill_location_geohash, migrations.RunPython.noop),
+    ]
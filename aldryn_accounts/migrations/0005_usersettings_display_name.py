@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aldryn_accounts', '0004_outboxevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersettings',
+            name='display_name',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aldryn_accounts', '0005_usersettings_display_name'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='emailconfirmation',
+            name='email',
+            field=models.EmailField(db_index=True, max_length=254),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+# case-insensitive lookups of EmailAddressManager.lookup() filter on
+# LOWER(email), only these databases support indexes on expressions
+LOWER_INDEX_VENDORS = ('postgresql', 'sqlite')
+
+LOWER_INDEXES = (
+    ('aldryn_accounts_emailaddress', 'aldryn_accounts_emailaddress_email_lower'),
+    ('aldryn_accounts_emailconfirmation', 'aldryn_accounts_emailconfirmation_email_lower'),
+)
+
+
+def create_lower_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor not in LOWER_INDEX_VENDORS:
+        return
+    quote_name = schema_editor.quote_name
+    for table, index in LOWER_INDEXES:
+        schema_editor.execute('CREATE INDEX {0} ON {1} (LOWER({2}))'.format(
+            quote_name(index), quote_name(table), quote_name('email')))
+
+
+def drop_lower_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor not in LOWER_INDEX_VENDORS:
+        return
+    for table, index in LOWER_INDEXES:
+        schema_editor.execute('DROP INDEX {0}'.format(schema_editor.quote_name(index)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aldryn_accounts', '0006_emailconfirmation_email_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_lower_indexes, drop_lower_indexes),
+    ]
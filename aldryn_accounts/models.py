@@ -2,6 +2,8 @@
 from __future__ import unicode_literals
 
 import datetime
+import hashlib
+import json
 import operator
 
 try:
@@ -9,11 +11,14 @@ try:
 except ImportError:
     from urllib import urlencode  # Python 2
 
+import django
 from django.contrib.auth.models import User
+from django.contrib.sites.shortcuts import get_current_site
+from django.core.cache import caches
 from django.db import models
 from django.utils import timezone
-from django.utils.translation import ugettext_lazy as _
-from django.utils.encoding import python_2_unicode_compatible
+from django.utils.translation import get_language, ugettext_lazy as _
+from django.utils.encoding import force_bytes, python_2_unicode_compatible
 
 import timezone_field
 from annoying.fields import AutoOneToOneField
@@ -21,12 +26,20 @@ from six.moves import reduce
 
 from .conf import settings
 from .exceptions import EmailAlreadyVerified, VerificationKeyExpired
+from .geo import bounding_box, geohash_prefixes, geohash_ranges, get_geohash, haversine
 from .signals import signup_code_used, signup_code_sent, email_confirmed, email_confirmation_sent
-from .utils import profile_image_upload_to, random_token
+from .utils import profile_image_upload_to, random_token, store_content_addressed, user_display
 from .monkeypatches import patch_user_unicode
-from .emails import EmailSender
+from .emails import get_email_sender_class
 
-patch_user_unicode()
+try:
+    from django.db.models.functions import Lower
+except ImportError:  # Django < 1.8
+    Lower = None
+
+if django.VERSION < (1, 7):
+    # AccountsConfig.ready() takes care of this on newer versions
+    patch_user_unicode()
 
 
 @python_2_unicode_compatible
@@ -108,7 +121,14 @@ class SignupCode(models.Model):
         signup_code_used.send(sender=result.__class__, signup_code_result=result)
 
     def send(self, **kwargs):
-        EmailSender.send_signup_code(**kwargs)
+        if kwargs.pop('background', settings.ALDRYN_ACCOUNTS_SEND_EMAILS_IN_BACKGROUND):
+            from .tasks import enqueue, send_signup_code
+            site = kwargs.get('site') or get_current_site(kwargs.get('request'))
+            enqueue(send_signup_code, self.pk, site_id=getattr(site, 'pk', None),
+                    language=get_language())
+            return
+        kwargs.setdefault('signup_code', self)
+        get_email_sender_class().send_signup_code(**kwargs)
         signup_code_sent.send(
             sender=self.__class__,
             signup_code=self,
@@ -126,6 +146,11 @@ class SignupCodeResult(models.Model):
         self.signup_code.calculate_use_count()
 
 
+# addresses per query of EmailAddressManager.lookup(), keeps the number of
+# query parameters within database limits
+EMAIL_LOOKUP_BATCH_SIZE = 500
+
+
 class EmailAddressManager(models.Manager):
 
     def add_email(self, user, email, make_primary=False, **kwargs):
@@ -157,6 +182,69 @@ class EmailAddressManager(models.Manager):
     def has_verified_email(self, user):
         return self.filter(user=user).exists()
 
+    def lookup(self, emails):
+        """
+        Finds the users of many email addresses at once with the priorities
+        of ``get_most_qualified_user_for_email``: verified addresses, the
+        email field of users and pending confirmations.
+
+        Returns a dict of ``{'user_id', 'status', 'is_primary'}`` by
+        lowercased email address (the status is ``verified``,
+        ``unverified`` or ``pending``), unknown addresses are left out. The
+        addresses are matched case-insensitively with up to four queries
+        per ``EMAIL_LOOKUP_BATCH_SIZE`` addresses. Verified addresses and
+        confirmations are matched on ``LOWER(email)``, which is indexed on
+        PostgreSQL and SQLite. The email field of users is matched exactly
+        first, so that an index of the project is used, and only the
+        addresses it doesn't find are matched on ``LOWER(email)``.
+        """
+        variants = {}
+        for email in emails:
+            email = email.strip()
+            if email:
+                variants.setdefault(email.lower(), set()).update((email, email.lower()))
+        normalized = sorted(variants)
+        found = {}
+        for start in range(0, len(normalized), EMAIL_LOOKUP_BATCH_SIZE):
+            batch = normalized[start:start + EMAIL_LOOKUP_BATCH_SIZE]
+            # (status, queryset, fields, whether to match exactly first)
+            lookups = (
+                ('verified', self.all(), ('email', 'user_id', 'is_primary'), False),
+                ('unverified', User.objects.all(), ('email', 'pk'), True),
+                ('pending', EmailConfirmation.objects.all(), ('email', 'user_id'), False),
+            )
+            for priority, (status, queryset, fields, exact_first) in enumerate(lookups):
+                missing = batch
+                rows = []
+                if exact_first:
+                    exact = sorted(set().union(*(variants[email] for email in batch)))
+                    rows = list(queryset.filter(email__in=exact).values_list(*fields).order_by('pk'))
+                    matched = set(row[0].lower() for row in rows)
+                    # e.g. 'John@Example.com' stored and looked up in lowercase
+                    missing = [
+                        email for email in batch
+                        if email not in matched and not (email in found and found[email][0] < priority)]
+                if missing:
+                    rows.extend(_filter_email_lower(queryset, missing).values_list(*fields).order_by('pk'))
+                for row in rows:
+                    email = row[0].lower()
+                    if email in found and found[email][0] <= priority:
+                        continue
+                    # the email field of the user is its primary address
+                    is_primary = row[2] if status == 'verified' else status == 'unverified'
+                    found[email] = (priority, {'user_id': row[1], 'status': status, 'is_primary': is_primary})
+        return dict((email, result) for email, (priority, result) in found.items())
+
+
+def _filter_email_lower(queryset, emails):
+    """
+    Filters ``queryset`` by ``LOWER(email)`` in the lowercased ``emails``,
+    the expression of the indexes of migration 0007.
+    """
+    if Lower is not None:
+        return queryset.annotate(email_lower=Lower('email')).filter(email_lower__in=emails)
+    return queryset.extra(where=['LOWER(email) IN ({0})'.format(', '.join(['%s'] * len(emails)))], params=emails)
+
 
 @python_2_unicode_compatible
 class EmailAddress(models.Model):
@@ -208,7 +296,67 @@ class EmailAddress(models.Model):
         return result
 
 
+def _get_resend_cache_key(email):
+    return 'aldryn_accounts:confirmation_resend:{0}'.format(
+        hashlib.md5(force_bytes(email.strip().lower())).hexdigest())
+
+
+def claim_confirmation_resend(email):
+    """
+    Returns whether the confirmations of ``email`` may be sent again, which
+    is once per ``ALDRYN_ACCOUNTS_CONFIRMATION_RESEND_WINDOW``. Only asks
+    the cache.
+    """
+    window = settings.ALDRYN_ACCOUNTS_CONFIRMATION_RESEND_WINDOW
+    if not window:
+        return True
+    cache = caches[settings.ALDRYN_ACCOUNTS_CONFIRMATION_RESEND_CACHE]
+    return cache.add(_get_resend_cache_key(email), 1, window)
+
+
+def confirmation_resent_recently(email):
+    """
+    Whether a resend of ``email`` would be coalesced, without claiming it.
+    """
+    if not settings.ALDRYN_ACCOUNTS_CONFIRMATION_RESEND_WINDOW:
+        return False
+    cache = caches[settings.ALDRYN_ACCOUNTS_CONFIRMATION_RESEND_CACHE]
+    return cache.get(_get_resend_cache_key(email)) is not None
+
+
+def release_confirmation_resend(email):
+    """
+    Gives up the claim of ``claim_confirmation_resend``, e.g. when sending
+    failed, so that the confirmations can be resent right away.
+    """
+    if settings.ALDRYN_ACCOUNTS_CONFIRMATION_RESEND_WINDOW:
+        caches[settings.ALDRYN_ACCOUNTS_CONFIRMATION_RESEND_CACHE].delete(_get_resend_cache_key(email))
+
+
 class EmailConfirmationManager(models.Manager):
+    def resend(self, email, **kwargs):
+        """
+        Sends the pending confirmations of ``email`` again and returns
+        their number. Returns None without sending anything (or querying
+        the database) if they were resent recently, the earlier send
+        (possibly still queued) is reused. Only claims the resend if there
+        are pending confirmations.
+        """
+        if confirmation_resent_recently(email):
+            return None
+        confirmations = list(self.filter(email=email))
+        if not confirmations:
+            return 0
+        if not claim_confirmation_resend(email):
+            return None
+        try:
+            for confirmation in confirmations:
+                confirmation.send(**kwargs)
+        except Exception:
+            release_confirmation_resend(email)
+            raise
+        return len(confirmations)
+
     def delete_expired_confirmations(self):
         for confirmation in self.all().exclude(sent_at__isnull=True):
             if confirmation.key_expired():
@@ -228,7 +376,7 @@ class EmailConfirmationManager(models.Manager):
 @python_2_unicode_compatible
 class EmailConfirmation(models.Model):
     user = models.ForeignKey(User, related_name="email_verifications")
-    email = models.EmailField()
+    email = models.EmailField(db_index=True)
     is_primary = models.BooleanField(default=True)
     # TODO: rename this to EmailVerification
     created_at = models.DateTimeField(default=timezone.now)
@@ -273,15 +421,92 @@ class EmailConfirmation(models.Model):
                     key=self.key, email=self.email)
             raise VerificationKeyExpired(msg)
 
+    def resend(self, **kwargs):
+        """
+        Sends the confirmation again unless the confirmations of its email
+        were resent recently, see ``EmailConfirmationManager.resend``.
+        """
+        if not claim_confirmation_resend(self.email):
+            return False
+        try:
+            self.send(**kwargs)
+        except Exception:
+            release_confirmation_resend(self.email)
+            raise
+        return True
+
     def send(self, **kwargs):
+        if kwargs.pop('background', settings.ALDRYN_ACCOUNTS_SEND_EMAILS_IN_BACKGROUND):
+            # tasks imports this module
+            from .tasks import enqueue, send_email_verification
+            site = kwargs.get('site')
+            enqueue(send_email_verification, self.pk, site_id=getattr(site, 'pk', None),
+                    language=get_language())
+            return
         kwargs['verification'] = self
-        EmailSender.send_email_verification(**kwargs)
+        get_email_sender_class().send_email_verification(**kwargs)
         email_confirmation_sent.send(
             sender=self.__class__,
             confirmation=self,
         )
 
 
+class UserSettingsManager(models.Manager):
+
+    def within_bbox(self, south, west, north, east):
+        """
+        User settings with a location inside the bounding box. West is
+        greater than east for boxes crossing the antimeridian.
+        """
+        # the geohash ranges can use the index, the coordinates make it exact
+        ranges = models.Q()
+        for start, stop in geohash_ranges(geohash_prefixes(south, west, north, east)):
+            if stop is None:
+                ranges |= models.Q(location_geohash__gte=start)
+            else:
+                ranges |= models.Q(location_geohash__gte=start, location_geohash__lt=stop)
+        longitude = models.Q(location_longitude__gte=west, location_longitude__lte=east)
+        if west > east:
+            longitude = models.Q(location_longitude__gte=west) | models.Q(location_longitude__lte=east)
+        return self.filter(
+            ranges, longitude,
+            location_latitude__gte=south, location_latitude__lte=north,
+        ).exclude(location_geohash='')
+
+    def near(self, latitude, longitude, radius, queryset=None):
+        """
+        Returns the user settings within ``radius`` km ordered by distance,
+        each with a ``distance`` attribute (in km).
+        """
+        candidates = self.within_bbox(*bounding_box(latitude, longitude, radius))
+        if queryset is not None:
+            candidates = candidates & queryset
+        distances = {}
+        rows = candidates.values_list('pk', 'location_latitude', 'location_longitude')
+        for pk, place_latitude, place_longitude in rows.iterator():
+            distance = haversine(latitude, longitude, place_latitude, place_longitude)
+            if distance <= radius:
+                distances[pk] = distance
+        results = []
+        pks = list(distances)
+        # keeps the number of query parameters within database limits
+        for start in range(0, len(pks), 500):
+            results.extend(self.filter(pk__in=pks[start:start + 500]).select_related('user'))
+        for user_settings in results:
+            user_settings.distance = distances[user_settings.pk]
+        results.sort(key=lambda user_settings: user_settings.distance)
+        return results
+
+    def update_display_name(self, user):
+        """
+        Stores the current display name of ``user``, creating the settings
+        if necessary.
+        """
+        display_name = user_display(user)[:255]
+        if not self.filter(user_id=user.pk).update(display_name=display_name):
+            self.create(user=user, display_name=display_name)
+
+
 @python_2_unicode_compatible
 class UserSettings(models.Model):
     user = AutoOneToOneField(User, related_name='settings', unique=True, db_index=True)
@@ -291,11 +516,17 @@ class UserSettings(models.Model):
     location_name = models.CharField(_('location'), blank=True, default='', max_length=255)
     location_latitude = models.FloatField(null=True, blank=True, default=None)
     location_longitude = models.FloatField(null=True, blank=True, default=None)
+    # maintained on save, used to narrow down location queries
+    location_geohash = models.CharField(max_length=12, blank=True, default='', db_index=True, editable=False)
+    # maintained on user save if ALDRYN_ACCOUNTS_STORE_DISPLAY_NAME is set
+    display_name = models.CharField(max_length=255, blank=True, default='', db_index=True, editable=False)
 
     profile_image = models.ImageField(verbose_name=_('profile image'), blank=True, default='', max_length=255,
                                       upload_to=profile_image_upload_to)
     preferred_language = models.CharField(_('language'), blank=True, default='', choices=settings.LANGUAGES, max_length=32)
 
+    objects = UserSettingsManager()
+
     class Meta:
         verbose_name = _('user settings')
         verbose_name_plural = _('user settings')
@@ -303,6 +534,47 @@ class UserSettings(models.Model):
     def __str__(self):
         return '{0} ({1})'.format(self.user.username, self.user.pk)
 
+    def save(self, *args, **kwargs):
+        if settings.ALDRYN_ACCOUNTS_PROFILE_IMAGE_CONTENT_ADDRESSED:
+            store_content_addressed(self.profile_image)
+        self.location_geohash = get_geohash(self.location_latitude, self.location_longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and (
+                'location_latitude' in update_fields or 'location_longitude' in update_fields):
+            kwargs['update_fields'] = list(update_fields) + ['location_geohash']
+        super(UserSettings, self).save(*args, **kwargs)
+
+
+@python_2_unicode_compatible
+class OutboxEvent(models.Model):
+    """
+    An account lifecycle event waiting to be delivered to the outbox
+    consumers, see aldryn_accounts.outbox.
+    """
+    event = models.CharField(max_length=64)
+    # events of the same user are delivered in order
+    user_pk = models.IntegerField(null=True, blank=True, db_index=True)
+    payload = models.TextField(blank=True, default='{}')
+    created_at = models.DateTimeField(default=timezone.now)
+    delivered_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # failed deliveries are retried with a growing delay
+    available_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        verbose_name = _('outbox event')
+        verbose_name_plural = _('outbox events')
+        ordering = ('pk',)
+
+    def __str__(self):
+        return '{0} #{1}'.format(self.event, self.pk)
+
+    @property
+    def data(self):
+        return json.loads(self.payload)
+
+
 # South rules
 rules = [
     (
@@ -322,3 +594,7 @@ try:
 except ImportError:
     # no south, Django version >1.6
     pass
+
+if django.VERSION < (1, 7):
+    # AccountsConfig.ready() takes care of this on newer versions
+    from . import outbox  # NOQA
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Transactional outbox for the account lifecycle signals.
+
+With ``ALDRYN_ACCOUNTS_USE_OUTBOX`` every lifecycle signal is written to
+the ``OutboxEvent`` table, in the transaction of the code that sends it.
+The ``deliver_outbox_events`` command hands the events in batches to the
+consumers listed in ``ALDRYN_ACCOUNTS_OUTBOX_CONSUMERS`` (dotted paths to
+callables that take a list of events). Delivery is at least once, so
+consumers should be idempotent (e.g. by event pk). Events of the same user
+are delivered in order: a failed event is retried with a growing delay
+and the user's later events wait until it is delivered, or until it ran
+out of ``ALDRYN_ACCOUNTS_OUTBOX_MAX_ATTEMPTS``.
+"""
+import datetime
+import json
+import logging
+from collections import OrderedDict
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import signals
+from .conf import settings
+from .instrumentation import timed_receiver
+from .models import OutboxEvent
+
+
+logger = logging.getLogger('aldryn_accounts')
+
+
+def record(event, user_pk=None, **payload):
+    return OutboxEvent.objects.create(
+        event=event, user_pk=user_pk,
+        payload=json.dumps(payload, cls=DjangoJSONEncoder))
+
+
+def user_payload(user, **kwargs):
+    return user.pk, {'user': user.pk}
+
+
+def sign_up_attempt_payload(**kwargs):
+    return None, {
+        'username': kwargs.get('username'),
+        'email': kwargs.get('email'),
+        'result': bool(kwargs.get('result')),
+    }
+
+
+def signup_code_used_payload(signup_code_result, **kwargs):
+    return signup_code_result.user_id, {
+        'signup_code_result': signup_code_result.pk,
+        'signup_code': signup_code_result.signup_code_id,
+        'user': signup_code_result.user_id,
+    }
+
+
+def email_confirmed_payload(email_address, **kwargs):
+    return email_address.user_id, {
+        'email_address': email_address.pk,
+        'email': email_address.email,
+        'user': email_address.user_id,
+    }
+
+
+def email_confirmation_sent_payload(confirmation, **kwargs):
+    return confirmation.user_id, {
+        'confirmation': confirmation.pk,
+        'email': confirmation.email,
+        'user': confirmation.user_id,
+    }
+
+
+# event name: (signal, function returning the user pk and payload)
+EVENTS = {
+    'user_signed_up': (signals.user_signed_up, user_payload),
+    'user_sign_up_attempt': (signals.user_sign_up_attempt, sign_up_attempt_payload),
+    'signup_code_used': (signals.signup_code_used, signup_code_used_payload),
+    'email_confirmed': (signals.email_confirmed, email_confirmed_payload),
+    'email_confirmation_sent': (signals.email_confirmation_sent, email_confirmation_sent_payload),
+    'password_changed': (signals.password_changed, user_payload),
+}
+
+
+def _make_receiver(event, get_payload):
+    @timed_receiver(name='outbox.{0}'.format(event))
+    def receiver(sender, **kwargs):
+        if settings.ALDRYN_ACCOUNTS_USE_OUTBOX:
+            user_pk, payload = get_payload(**kwargs)
+            record(event, user_pk, **payload)
+    return receiver
+
+
+for _event, (_signal, _get_payload) in EVENTS.items():
+    _signal.connect(_make_receiver(_event, _get_payload), weak=False,
+                    dispatch_uid='aldryn_accounts:outbox:{0}'.format(_event))
+
+
+def get_consumers():
+    return [import_string(path) for path in settings.ALDRYN_ACCOUNTS_OUTBOX_CONSUMERS]
+
+
+def _group_by_user(events):
+    groups = OrderedDict()
+    for event in events:
+        # events without a user need no ordering
+        key = event.user_pk if event.user_pk is not None else ('event', event.pk)
+        groups.setdefault(key, []).append(event)
+    return groups.values()
+
+
+def get_retry_delay(attempts):
+    return datetime.timedelta(seconds=min(2 ** attempts, 3600))
+
+
+def get_pending_events():
+    now = timezone.now()
+    pending = OutboxEvent.objects.filter(
+        delivered_at=None, attempts__lt=settings.ALDRYN_ACCOUNTS_OUTBOX_MAX_ATTEMPTS)
+    waiting_users = (pending.filter(available_at__gt=now)
+                     .exclude(user_pk=None).values('user_pk'))
+    return (pending.filter(available_at__lte=now)
+            .exclude(user_pk__in=waiting_users)
+            .order_by('pk'))
+
+
+def deliver(batch_size=100, consumers=None):
+    """
+    Delivers the oldest pending events and returns the number of delivered
+    and failed events.
+    """
+    if consumers is None:
+        consumers = get_consumers()
+    events = list(get_pending_events()[:batch_size])
+    delivered, failed = [], []
+    for group in _group_by_user(events):
+        try:
+            for consumer in consumers:
+                consumer(group)
+        except Exception as e:
+            logger.exception('Delivering outbox events %s failed', [event.pk for event in group])
+            # only the first event was due, the others wait for it
+            failed.append((group[0], '{0}: {1}'.format(e.__class__.__name__, e)))
+        else:
+            delivered.extend(event.pk for event in group)
+    now = timezone.now()
+    if delivered:
+        OutboxEvent.objects.filter(pk__in=delivered).update(delivered_at=now)
+    for event, error in failed:
+        OutboxEvent.objects.filter(pk=event.pk).update(
+            attempts=event.attempts + 1, last_error=error,
+            available_at=now + get_retry_delay(event.attempts))
+    return len(delivered), len(failed)
+
+
+def purge(days):
+    """
+    Deletes the events delivered more than ``days`` days ago.
+    """
+    events = OutboxEvent.objects.filter(
+        delivered_at__lt=timezone.now() - datetime.timedelta(days=days))
+    count = events.count()
+    events.delete()
+    return count
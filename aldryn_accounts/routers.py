@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Read replica routing for the account models.
+
+``ReplicaRouter`` sends reads of the accounts and auth models to one of the
+``ALDRYN_ACCOUNTS_DATABASE_REPLICAS``. Reads stick to the primary database
+while the current thread is pinned: during requests with unsafe methods,
+after a write to one of these models (every write asks the router for its
+database) and, through a signed cookie set by
+``ReplicaPinningMiddleware``, for ``ALDRYN_ACCOUNTS_REPLICA_PIN_SECONDS``
+after a write of the same visitor, so that freshly created rows (e.g. email
+confirmations) are always visible.
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from .conf import settings
+
+
+ROUTED_APP_LABELS = ('aldryn_accounts', 'auth')
+SALT = 'aldryn_accounts.routers'
+
+_state = threading.local()
+
+
+def is_pinned():
+    return getattr(_state, 'pinned', 0) > 0 or getattr(_state, 'written', False)
+
+
+def pin():
+    """
+    Pins the reads of the current thread (and, within a request, the
+    visitor's following requests) to the primary database.
+    """
+    _state.written = True
+
+
+def was_written():
+    return getattr(_state, 'written', False)
+
+
+def reset(pinned=False):
+    """
+    Starts over, e.g. for a new request, optionally pinned to the primary.
+    """
+    _state.pinned = 1 if pinned else 0
+    _state.written = False
+
+
+@contextmanager
+def use_primary():
+    """
+    Reads of the routed models within the block go to the primary database.
+    """
+    _state.pinned = getattr(_state, 'pinned', 0) + 1
+    try:
+        yield
+    finally:
+        _state.pinned -= 1
+
+
+def get_read_database():
+    """
+    The alias to read the account models from, e.g. for ``.using()``.
+    """
+    replicas = settings.ALDRYN_ACCOUNTS_DATABASE_REPLICAS
+    if not replicas or is_pinned():
+        return settings.ALDRYN_ACCOUNTS_PRIMARY_DATABASE
+    return random.choice(replicas)
+
+
+def _is_routed(model):
+    return model._meta.app_label in ROUTED_APP_LABELS
+
+
+class ReplicaRouter(object):
+
+    def db_for_read(self, model, **hints):
+        if not _is_routed(model):
+            return None
+        return get_read_database()
+
+    def db_for_write(self, model, **hints):
+        if not _is_routed(model):
+            return None
+        _state.written = True
+        return settings.ALDRYN_ACCOUNTS_PRIMARY_DATABASE
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = [settings.ALDRYN_ACCOUNTS_PRIMARY_DATABASE]
+        databases.extend(settings.ALDRYN_ACCOUNTS_DATABASE_REPLICAS)
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, *args, **hints):
+        if db in settings.ALDRYN_ACCOUNTS_DATABASE_REPLICAS:
+            return False
+        return None
+
+
+def get_pin_cookie(request):
+    return request.get_signed_cookie(
+        settings.ALDRYN_ACCOUNTS_REPLICA_PIN_COOKIE_NAME, default=None, salt=SALT,
+        max_age=settings.ALDRYN_ACCOUNTS_REPLICA_PIN_SECONDS)
+
+
+def set_pin_cookie(response):
+    response.set_signed_cookie(
+        settings.ALDRYN_ACCOUNTS_REPLICA_PIN_COOKIE_NAME, '1', salt=SALT,
+        max_age=settings.ALDRYN_ACCOUNTS_REPLICA_PIN_SECONDS,
+        domain=settings.SESSION_COOKIE_DOMAIN,
+        path=settings.SESSION_COOKIE_PATH,
+        secure=settings.SESSION_COOKIE_SECURE or None,
+        httponly=True,
+    )
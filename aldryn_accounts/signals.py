@@ -1,11 +1,15 @@
 # -*- coding: utf-8 -*-
 import django.dispatch
 from django.contrib.auth import user_logged_in
-from django.db.models import signals, ObjectDoesNotExist
+from django.db.models import signals
 from django.utils.encoding import force_text
 from django.utils import timezone
 from django.contrib.auth.models import User
 
+from .conf import settings
+from .instrumentation import timed_receiver
+from .locale_state import get_locale_state
+from .timezones import get_timezone
 from .utils import generate_username
 
 
@@ -18,30 +22,65 @@ email_confirmation_sent = django.dispatch.Signal(providing_args=["confirmation"]
 password_changed = django.dispatch.Signal(providing_args=["user"])
 
 
+@timed_receiver
 def set_user_timezone_on_login(sender, user, request, **kwargs):
-    try:
-        user_settings = user.settings
-    except (AttributeError, ObjectDoesNotExist):
-        return
-
-    try:
-        tz = user_settings.tz
-    except AttributeError:
-        return
+    # reads just the time zone: user.settings runs a transaction and creates
+    # missing settings
+    from .models import UserSettings
 
+    tz = UserSettings.objects.filter(user_id=user.pk).values_list('timezone', flat=True).first()
     if tz:
-        request.session['django_timezone'] = force_text(tz)
-        timezone.activate(tz)
+        name = force_text(tz)
+        get_locale_state(request).set('django_timezone', name)
+        tz = get_timezone(name)
+        if tz is not None:
+            timezone.activate(tz)
 
 user_logged_in.connect(set_user_timezone_on_login, dispatch_uid='aldryn_accounts:set_user_timezone_on_login')
 
 
-def set_username_if_not_exists(sender, **kwargs):
-    user = kwargs.get('instance')
-    if isinstance(user, User):
-        if not user.username:
-            user.username = generate_username()
-signals.pre_save.connect(set_username_if_not_exists, dispatch_uid='aldryn_accounts:generate_username')
+@timed_receiver
+def set_username_if_not_exists(sender, instance, **kwargs):
+    if not instance.username:
+        instance.username = generate_username()
+
+
+# the user fields user_display() is computed from
+DISPLAY_NAME_FIELDS = frozenset(['email', 'first_name', 'last_name', 'username'])
+
+
+@timed_receiver
+def update_display_name(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not settings.ALDRYN_ACCOUNTS_STORE_DISPLAY_NAME or raw:
+        return
+    if update_fields is not None and not DISPLAY_NAME_FIELDS.intersection(update_fields):
+        # e.g. last_login
+        return
+    from .models import UserSettings
+
+    UserSettings.objects.update_display_name(instance)
+
+
+def connect_user_receivers(model):
+    """
+    Connects the ``User`` save receivers to ``model`` if it is ``User`` or
+    a proxy or subclass of it (e.g. the admin's ``UserProxy``), the save
+    signals are sent with the class of the saved instance.
+    """
+    if issubclass(model, User):
+        signals.pre_save.connect(
+            set_username_if_not_exists, sender=model, dispatch_uid='aldryn_accounts:generate_username')
+        signals.post_save.connect(
+            update_display_name, sender=model, dispatch_uid='aldryn_accounts:update_display_name')
+
+
+def connect_user_receivers_on_class_prepared(sender, **kwargs):
+    connect_user_receivers(sender)
+
+connect_user_receivers(User)
+# models defined before this module are connected by AccountsConfig.ready()
+signals.class_prepared.connect(
+    connect_user_receivers_on_class_prepared, dispatch_uid='aldryn_accounts:connect_user_receivers')
 
 
 # TODO: figure this out. actually we'd need to redirect to a url with the language prefix.
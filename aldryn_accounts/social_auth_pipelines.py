@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 from django.contrib.auth.models import User
 from django.core.exceptions import MultipleObjectsReturned, ObjectDoesNotExist
-from django.core.files.base import ContentFile
 from django.core.urlresolvers import reverse
 from django.conf import settings
 from django.shortcuts import redirect
@@ -9,6 +8,7 @@ from django.shortcuts import redirect
 import requests
 from social_core.exceptions import AuthException
 
+from . import http_client, tasks
 from .models import EmailAddress
 from .signals import user_signed_up
 from .utils import generate_username
@@ -68,8 +68,12 @@ def require_email(strategy, backend, details, response, user=None, *args, **kwar
         'https://graph.facebook.com/{}/?fields=email&access_token={}'
         .format(fbuid, token)
     )
-    response = requests.get(url)
-    email = response.json().get('email')
+    try:
+        response = http_client.get(url)
+        response.raise_for_status()
+        email = response.json().get('email')
+    except (requests.RequestException, ValueError):
+        return
     if email:
         details['email'] = email
 
@@ -130,18 +134,13 @@ def set_profile_image(backend, user, response, is_new, *args, **kwargs):
                     image_url += '&sz=100'
 
         if image_url:
-            try:
-                image_response = requests.get(image_url)
-                image_response.raise_for_status()
-            except requests.HTTPError:
-                return
-
-            user_settings = user.settings
-            user_settings.profile_image.save(
+            # the download happens in the background, the login does not wait
+            tasks.enqueue(
+                tasks.fetch_profile_image,
+                user.pk,
+                image_url,
                 '{}_{}_profile_image.jpg'.format(user.username, backend.name),
-                ContentFile(image_response.content)
             )
-            user_settings.save()
 
 
 def link_to_existing_user_by_email_if_backend_is_trusted(backend, details, user=None, *args, **kwargs):
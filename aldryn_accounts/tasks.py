@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Background jobs. Jobs are plain functions with serializable arguments that
+are handed to the runner configured in ``ALDRYN_ACCOUNTS_TASK_RUNNER``
+(a dotted path to a callable with the signature ``runner(func, *args, **kwargs)``).
+"""
+import logging
+import threading
+
+from django.contrib.auth.models import User
+from django.contrib.sites.models import Site
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+from django.utils.six.moves import queue
+from django.utils.translation import override
+
+import requests
+
+from . import http_client, routers
+from .conf import settings
+from .exceptions import ResponseTooLarge
+from .emails import get_email_sender_class
+from .models import EmailConfirmation, SignupCode, UserSettings
+from .thumbnails import generate_thumbnails
+
+
+logger = logging.getLogger('aldryn_accounts')
+
+
+def run_sync(func, *args, **kwargs):
+    func(*args, **kwargs)
+
+
+class ThreadRunner(object):
+    """
+    Runs jobs in daemon worker threads of the current process. Jobs still
+    queued when the process exits are lost.
+    """
+    def __init__(self, workers=2):
+        self.workers = workers
+        self.queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def __call__(self, func, *args, **kwargs):
+        self._start()
+        self.queue.put((func, args, kwargs))
+
+    def _start(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._work, name='aldryn-accounts-worker-{0}'.format(i))
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            func, args, kwargs = self.queue.get()
+            try:
+                # jobs read the rows their request just wrote
+                with routers.use_primary():
+                    func(*args, **kwargs)
+            except Exception:
+                logger.exception('Background job %s failed', func.__name__)
+            finally:
+                close_old_connections()
+                self.queue.task_done()
+
+    def join(self):
+        self.queue.join()
+
+run_in_thread = ThreadRunner()
+
+
+def get_runner():
+    return import_string(settings.ALDRYN_ACCOUNTS_TASK_RUNNER)
+
+
+def enqueue(func, *args, **kwargs):
+    """
+    Hands ``func`` to the configured runner once the current transaction is
+    committed, so that the job sees the rows written by the request.
+    """
+    runner = get_runner()
+
+    def run():
+        runner(func, *args, **kwargs)
+
+    on_commit = getattr(transaction, 'on_commit', None)
+    if on_commit is None:  # Django < 1.9
+        run()
+    else:
+        on_commit(run)
+
+
+def fetch_profile_image(user_id, image_url, filename):
+    """
+    Downloads a profile image (e.g. from a social auth provider), stores it
+    and generates its thumbnails.
+    """
+    try:
+        image_content = http_client.download(image_url)
+    except (requests.RequestException, ResponseTooLarge) as e:
+        logger.info('Could not fetch profile image %s: %s', image_url, e)
+        return
+    user_settings = UserSettings.objects.get_or_create(user_id=user_id)[0]
+    user_settings.profile_image = ContentFile(image_content, name=filename)
+    user_settings.save()
+    generate_thumbnails(user_settings.profile_image)
+
+
+def generate_profile_image_thumbnails(user_settings_id):
+    try:
+        user_settings = UserSettings.objects.get(pk=user_settings_id)
+    except UserSettings.DoesNotExist:
+        return
+    generate_thumbnails(user_settings.profile_image)
+
+
+def _get_site(site_id):
+    if site_id is None:
+        return Site.objects.get_current()
+    return Site.objects.get(pk=site_id)
+
+
+def send_email_verification(confirmation_id, site_id=None, language=None):
+    try:
+        confirmation = EmailConfirmation.objects.select_related('user').get(pk=confirmation_id)
+    except EmailConfirmation.DoesNotExist:
+        # confirmed or cancelled in the meantime
+        return
+    with override(language):
+        confirmation.send(background=False, site=_get_site(site_id))
+
+
+def send_signup_code(signup_code_id, site_id=None, language=None):
+    try:
+        signup_code = SignupCode.objects.select_related('invited_by').get(pk=signup_code_id)
+    except SignupCode.DoesNotExist:
+        return
+    with override(language):
+        signup_code.send(background=False, site=_get_site(site_id))
+
+
+def send_password_changed(user_id, template, site_id=None, language=None):
+    try:
+        user = User.objects.get(pk=user_id)
+    except User.DoesNotExist:
+        return
+    with override(language):
+        get_email_sender_class().send_password_changed(
+            user=user, template=template, site=_get_site(site_id))
@@ -2,6 +2,8 @@
 from classytags.core import Tag, Options
 from classytags.arguments import Argument
 from django import template
+from ..fragments import get_fragment
+from ..thumbnails import get_thumbnail_url
 from ..utils import user_display
 
 
@@ -28,4 +30,50 @@ class PrettyUsername(Tag):
             return ''
         return result
 
-register.tag(PrettyUsername)
\ No newline at end of file
+register.tag(PrettyUsername)
+
+
+class ProfileImageUrl(Tag):
+    """
+    Url of a pre-generated profile image thumbnail, see
+    ``ALDRYN_ACCOUNTS_PROFILE_IMAGE_THUMBNAILS``.
+    """
+    name = 'profile_image_url'
+    options = Options(
+        Argument('image'),
+        Argument('alias', required=False, default='profile'),
+        'as',
+        Argument('varname', required=False, resolve=False),
+    )
+
+    def render_tag(self, context, image, alias, varname):
+        result = get_thumbnail_url(image, alias)
+        if varname:
+            context[varname] = result
+            return ''
+        return result
+
+register.tag(ProfileImageUrl)
+
+
+class FormFragment(Tag):
+    """
+    Renders a cached empty login or signup form (see
+    ``aldryn_accounts.fragments``), cheap enough for the header of every
+    page.
+    """
+    name = 'form_fragment'
+    options = Options(
+        Argument('fragment'),
+        'as',
+        Argument('varname', required=False, resolve=False),
+    )
+
+    def render_tag(self, context, fragment, varname):
+        result = get_fragment(fragment, context.get('request'))
+        if varname:
+            context[varname] = result
+            return ''
+        return result
+
+register.tag(FormFragment)
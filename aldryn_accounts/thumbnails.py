@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Profile image thumbnails are generated ahead of time (see
+``aldryn_accounts.tasks``), templates only look up existing thumbnails and
+enqueue the generation of missing ones.
+"""
+import hashlib
+
+from django.utils.encoding import force_bytes
+
+from .conf import settings
+
+
+def get_thumbnail_options(alias):
+    return settings.ALDRYN_ACCOUNTS_PROFILE_IMAGE_THUMBNAILS[alias]
+
+
+def generate_thumbnails(image):
+    """
+    Creates all configured thumbnails of ``image`` in one pass.
+    """
+    if not image:
+        return []
+    from easy_thumbnails.files import get_thumbnailer
+    thumbnailer = get_thumbnailer(image)
+    return [
+        thumbnailer.get_thumbnail(options)
+        for options in settings.ALDRYN_ACCOUNTS_PROFILE_IMAGE_THUMBNAILS.values()
+    ]
+
+
+def request_thumbnails(image):
+    """
+    Enqueues the generation of the thumbnails of a profile image that does
+    not have them yet (e.g. stored before thumbnails were generated ahead of
+    time or set in the admin), at most once per
+    ``ALDRYN_ACCOUNTS_PROFILE_IMAGE_THUMBNAIL_RETRY`` seconds.
+    """
+    from django.core.cache import caches
+    from .models import UserSettings
+
+    instance = getattr(image, 'instance', None)
+    if not isinstance(instance, UserSettings) or instance.pk is None:
+        return False
+    key = 'aldryn_accounts:thumbnails:{0}'.format(
+        hashlib.md5(force_bytes(image.name)).hexdigest())
+    cache = caches[settings.ALDRYN_ACCOUNTS_PROFILE_IMAGE_THUMBNAIL_CACHE]
+    if not cache.add(key, 1, settings.ALDRYN_ACCOUNTS_PROFILE_IMAGE_THUMBNAIL_RETRY):
+        return False
+    # tasks imports this module
+    from .tasks import enqueue, generate_profile_image_thumbnails
+    enqueue(generate_profile_image_thumbnails, instance.pk)
+    return True
+
+
+def get_thumbnail_url(image, alias):
+    """
+    Returns the url of an already generated thumbnail or, while it does not
+    exist yet, the url of the image itself. Missing thumbnails are generated
+    in the background, never while rendering.
+    """
+    if not image:
+        return ''
+    from easy_thumbnails.files import get_thumbnailer
+    thumbnail = get_thumbnailer(image).get_existing_thumbnail(
+        get_thumbnail_options(alias))
+    if thumbnail is None:
+        request_thumbnails(image)
+        return image.url
+    return thumbnail.url
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import pytz
+
+
+_timezone_names = None
+_timezones = {}
+# unknown names are remembered too, but only this many distinct names
+MAX_CACHED_TIMEZONES = 1000
+
+
+def get_timezone_names():
+    """
+    All time zone names known to pytz, computed once per process.
+    """
+    global _timezone_names
+    if _timezone_names is None:
+        _timezone_names = frozenset(pytz.all_timezones)
+    return _timezone_names
+
+
+def is_valid_timezone(name):
+    return name in get_timezone_names()
+
+
+def get_timezone(name):
+    """
+    The tzinfo for ``name`` or None if pytz does not know it. Both are
+    cached per process, so pytz resolves every name at most once.
+    """
+    try:
+        return _timezones[name]
+    except KeyError:
+        pass
+    try:
+        tz = pytz.timezone(name)
+    except (pytz.UnknownTimeZoneError, AttributeError, ValueError):
+        tz = None
+    if tz is not None or len(_timezones) < MAX_CACHED_TIMEZONES:
+        _timezones[name] = tz
+    return tz
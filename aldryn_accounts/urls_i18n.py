@@ -10,12 +10,12 @@ from . import views, utils
 
 
 accounts_urlpatterns = [
-    url(r'^signup/$', utils.get_signup_view().as_view(), name='accounts_signup'),
+    url(r'^signup/$', utils.lazy_view(utils.get_signup_view), name='accounts_signup'),
     url(r'^signup/email/resend-confirmation/$', views.SignupEmailResendConfirmationView.as_view(), name='accounts_signup_email_resend_confirmation'),
     url(r'^signup/email/confirmation-sent/$', views.SignupEmailConfirmationSentView.as_view(), name='accounts_signup_email_confirmation_sent'),
     url(r'^signup/email/sent/$', views.SignupEmailSentView.as_view(), name='accounts_signup_email_sent'),
 
-    url(r'^login/$', utils.get_login_view().as_view(), name='login'),
+    url(r'^login/$', utils.lazy_view(utils.get_login_view), name='login'),
     url(r'^logout/$', views.LogoutView.as_view(), name='logout'),
 
     url(r'^password-reset/$', views.password_reset, name='accounts_password_reset_recover'),  # new name should be password_reset
@@ -25,6 +25,9 @@ accounts_urlpatterns = [
     url(r'^password-reset/done/$', views.password_reset_complete, name='password_reset_complete'),
 
     url(r'^email/confirm/(?P<key>\w+)/$', views.ConfirmEmailView.as_view(), name='accounts_confirm_email'),
+
+    url(r'^timezone/$', views.BrowserTimezoneView.as_view(), name='accounts_browser_timezone'),
+    url(r'^email-lookup/$', views.EmailLookupView.as_view(), name='accounts_email_lookup'),
 ]
 
 
@@ -8,24 +8,30 @@ import importlib
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.utils.crypto import random
+from django.utils.encoding import force_text
 
-import pygeoip
-
+from . import instrumentation
+from .geocoding import reverse_geocode
+from .hashing import check_password
 
 logger = logging.getLogger('aldryn_accounts')
 
 
-def user_display(user, fallback_to_username=settings.ALDRYN_ACCOUNTS_USER_DISPLAY_FALLBACK_TO_USERNAME, fallback_to_pk=settings.ALDRYN_ACCOUNTS_USER_DISPLAY_FALLBACK_TO_PK):
+def user_display(user, fallback_to_username=None, fallback_to_pk=None):
     if user.is_anonymous():
         return u'Anonymous user'
     if user.email:
         return user.email
     elif user.first_name or user.last_name:
         return (u"%s %s" % (user.first_name, user.last_name)).strip()
-    elif fallback_to_username and user.username:
+    if fallback_to_username is None:
+        fallback_to_username = settings.ALDRYN_ACCOUNTS_USER_DISPLAY_FALLBACK_TO_USERNAME
+    if fallback_to_username and user.username:
         return user.username
-    elif fallback_to_pk and user.pk:
-        return unicode(user.pk)
+    if fallback_to_pk is None:
+        fallback_to_pk = settings.ALDRYN_ACCOUNTS_USER_DISPLAY_FALLBACK_TO_PK
+    if fallback_to_pk and user.pk:
+        return force_text(user.pk)
     return u''
 
 
@@ -42,11 +48,56 @@ def profile_image_upload_to(instance, filename):
     return os.path.join(profile_data_prefix, '%s%s' % (uuid.uuid4(), extension) )
 
 
-# TODO: make cache method configurable
-if settings.ALDRYN_ACCOUNTS_USE_GEOIP:
-    GEOIP_PATH = getattr(settings, 'GEOIP_PATH', '')
-    GEOIP_CITY = getattr(settings, 'GEOIP_CITY', 'GeoLiteCity.dat')
-    gi4 = pygeoip.GeoIP(os.path.join(GEOIP_PATH, GEOIP_CITY))
+def get_content_addressed_name(content, filename):
+    """
+    Storage name of a profile image derived from the sha256 of its content,
+    so that the same image is always stored once under the same name.
+    """
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    digest = digest.hexdigest()
+    extension = os.path.splitext(filename)[1].lower()
+    profile_data_prefix = settings.ALDRYN_ACCOUNTS_PROFILE_IMAGE_UPLOAD_TO
+    # the first two characters shard the files over 256 directories
+    return os.path.join(profile_data_prefix, digest[:2], digest + extension)
+
+
+def store_content_addressed(field_file):
+    """
+    Commits a new (uncommitted) file of ``field_file`` under its content
+    addressed name. Nothing is written if that file already exists.
+    """
+    if not field_file or field_file._committed:
+        return
+    content = field_file.file
+    name = get_content_addressed_name(content, field_file.name)
+    storage = field_file.storage
+    if not storage.exists(name):
+        name = storage.save(name, content)
+    field_file.name = name
+    field_file._committed = True
+
+
+_geoip_database = None
+
+
+def get_geoip_database():
+    """
+    Opens the GeoIP database on first use.
+    """
+    global _geoip_database
+    if _geoip_database is None:
+        # TODO: make cache method configurable
+        import pygeoip
+        geoip_path = getattr(settings, 'GEOIP_PATH', '')
+        geoip_city = getattr(settings, 'GEOIP_CITY', 'GeoLiteCity.dat')
+        _geoip_database = pygeoip.GeoIP(os.path.join(geoip_path, geoip_city))
+    return _geoip_database
 
 
 def geoip(ip):
@@ -55,14 +106,18 @@ def geoip(ip):
     if not settings.ALDRYN_ACCOUNTS_USE_GEOIP:
         return dict()
     try:
-        data = gi4.record_by_addr(ip)
+        data = get_geoip_database().record_by_addr(ip)
     except Exception:
         data = None
         # we use a catch all because there's a few exceptions that could occur here.
         logger.exception("Could not fetch geo data for ip %s" % (ip, ))
     if not data:  # empty dict
         return dict()
-    if data.get('city') and data.get('country'):
+    place = reverse_geocode(data.get('latitude'), data.get('longitude'))
+    if place:
+        # same names as for locations entered in the user settings
+        data['pretty_name'] = place
+    elif data.get('city') and data.get('country'):
         data['pretty_name'] = u"%s, %s" % (data.get('city'), data.get('country_name'))
     elif data.get('country'):
         data['pretty_name'] = u"%s" % data.get('country_name')
@@ -71,20 +126,30 @@ def geoip(ip):
 
 def get_most_qualified_user_for_email_and_password(email, password):
     from aldryn_accounts.models import EmailAddress, EmailConfirmation
-    # try verified email addresses
-    for user_email in EmailAddress.objects.filter(email__iexact=email):
+    lookups = (
+        # try verified email addresses
         # (EmailAddress.email is unique, but using the forloop vs a .get removes the need for a try/except.
-        if user_email.user.check_password(password):
-            return user_email.user
+        EmailAddress.objects.filter(email__iexact=email).select_related('user'),
         # try the email field on the user
-    for user in User.objects.filter(email__iexact=email):
-        if user.check_password(password):
-            return user
+        User.objects.filter(email__iexact=email),
         # try unconfirmed email addresses
-    for email_confirmation in EmailConfirmation.objects.filter(email__iexact=email):
-        if email_confirmation.user.check_password(password):
-            return email_confirmation.user
-    return None
+        EmailConfirmation.objects.filter(email__iexact=email).select_related('user'),
+    )
+    candidates = 0
+    try:
+        for queryset in lookups:
+            with instrumentation.timer('auth.lookup'):
+                objects = list(queryset)
+            for obj in objects:
+                user = obj if isinstance(obj, User) else obj.user
+                candidates += 1
+                with instrumentation.timer('auth.hash'):
+                    is_valid = check_password(user, password)
+                if is_valid:
+                    return user
+        return None
+    finally:
+        instrumentation.incr('auth.candidates', candidates)
 
 
 def get_most_qualified_user_for_email(email):
@@ -115,9 +180,38 @@ def import_from_path(path_to_class):
     return getattr(module, cls)
 
 
+def lazy_view(get_view_class, **initkwargs):
+    """
+    Returns a view function that resolves the class based view returned by
+    ``get_view_class`` on its first call instead of at import time.
+    """
+    resolved = []
+
+    def view(request, *args, **kwargs):
+        if not resolved:
+            resolved.append(get_view_class().as_view(**initkwargs))
+        return resolved[0](request, *args, **kwargs)
+    return view
+
+
+_imported_classes = {}
+
+
+def import_cached(path_to_class):
+    """
+    ``import_from_path`` for paths that are resolved on every request, e.g.
+    the configured views. Every path is imported once per process.
+    """
+    try:
+        return _imported_classes[path_to_class]
+    except KeyError:
+        cls = _imported_classes[path_to_class] = import_from_path(path_to_class)
+        return cls
+
+
 def get_signup_view():
-    return import_from_path(settings.ALDRYN_ACCOUNTS_SIGNUP_VIEW)
+    return import_cached(settings.ALDRYN_ACCOUNTS_SIGNUP_VIEW)
 
 
 def get_login_view():
-    return import_from_path(settings.ALDRYN_ACCOUNTS_LOGIN_VIEW)
+    return import_cached(settings.ALDRYN_ACCOUNTS_LOGIN_VIEW)
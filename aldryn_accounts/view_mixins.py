@@ -1,4 +1,48 @@
 # -*- coding: utf-8 -*-
+import hashlib
+import time
+
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.middleware.csrf import get_token
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.encoding import force_bytes
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from django.utils.translation import get_language
+
+from .conf import settings
+
+
+def _unquote_etag(etag):
+    # parse_etags returns the values without quotes before Django 1.11
+    if etag.startswith('W/'):
+        etag = etag[2:]
+    return etag.strip('"')
+
+
+def get_conditional_response(request, etag, last_modified):
+    """
+    Returns a 304 response if the If-None-Match or If-Modified-Since
+    headers of the GET or HEAD ``request`` match, otherwise None. The
+    ETags are compared without their quotes on every Django version.
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = [_unquote_etag(value) for value in parse_etags(if_none_match)]
+        if '*' in etags or _unquote_etag(etag) in etags:
+            return HttpResponseNotModified()
+        return None
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    if if_modified_since is not None and last_modified <= if_modified_since:
+        return HttpResponseNotModified()
+    return None
+
+
+# stands in for the CSRF token in cached pages, only uses characters that
+# are not escaped in html
+CSRF_TOKEN_PLACEHOLDER = 'aldryn-accounts-csrf-token-placeholder'
+CSRF_TOKEN_PLACEHOLDER_BYTES = CSRF_TOKEN_PLACEHOLDER.encode('ascii')
 
 
 class OnlyOwnedObjectsMixin(object):
@@ -8,3 +52,82 @@ class OnlyOwnedObjectsMixin(object):
 
     def get_queryset(self):
         return super(OnlyOwnedObjectsMixin, self).get_queryset().filter(user=self.request.user)
+
+
+class AnonymousPageCacheMixin(object):
+    """
+    Serves GET requests of anonymous visitors from a server side page cache
+    per language, if ``ALDRYN_ACCOUNTS_CACHE_ANONYMOUS_PAGES`` is set. The
+    pages are rendered with a placeholder instead of the CSRF token, which
+    is filled in for every response, and are revalidated by the browser
+    with ETag and Last-Modified.
+
+    Visitors with a session or pending messages and requests with other
+    query parameters than ``page_cache_query_parameters`` get the normal
+    view.
+    """
+    page_cache_query_parameters = ('next',)
+    page_cache_render = False
+
+    def can_cache_page(self, request):
+        if not settings.ALDRYN_ACCOUNTS_CACHE_ANONYMOUS_PAGES or request.method not in ('GET', 'HEAD'):
+            return False
+        # checking request.user would load the session
+        if settings.SESSION_COOKIE_NAME in request.COOKIES or CookieStorage.cookie_name in request.COOKIES:
+            return False
+        return all(key in self.page_cache_query_parameters for key in request.GET)
+
+    def get_page_cache_key(self, request):
+        url = force_bytes(request.build_absolute_uri())
+        return 'aldryn_accounts:page:{0}:{1}:{2}'.format(
+            self.__class__.__name__, get_language(), hashlib.md5(url).hexdigest())
+
+    def get_context_data(self, **kwargs):
+        ctx = super(AnonymousPageCacheMixin, self).get_context_data(**kwargs)
+        if self.page_cache_render:
+            ctx['csrf_token'] = CSRF_TOKEN_PLACEHOLDER
+        return ctx
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.can_cache_page(request):
+            return super(AnonymousPageCacheMixin, self).dispatch(request, *args, **kwargs)
+        cache = caches[settings.ALDRYN_ACCOUNTS_ANONYMOUS_PAGE_CACHE]
+        key = self.get_page_cache_key(request)
+        page = cache.get(key)
+        if page is None:
+            self.page_cache_render = True
+            response = super(AnonymousPageCacheMixin, self).dispatch(request, *args, **kwargs)
+            if response.status_code != 200 or not hasattr(response, 'render'):
+                return response
+            response.render()
+            if request.META.get('CSRF_COOKIE_USED'):
+                # something rendered the real token, e.g. a template that
+                # does not get the placeholder
+                return response
+            page = {
+                'content': response.content,
+                'content_type': response['Content-Type'],
+                'hash': hashlib.md5(response.content).hexdigest(),
+                'last_modified': int(time.time()),
+            }
+            cache.set(key, page, settings.ALDRYN_ACCOUNTS_ANONYMOUS_PAGE_CACHE_TIMEOUT)
+        return self.get_cached_page_response(request, page)
+
+    def get_cached_page_response(self, request, page):
+        # also marks the token as used, so that the CSRF cookie is set
+        token = get_token(request)
+        # identifies the page and the CSRF cookie of the visitor
+        etag = '"{0}"'.format(hashlib.md5(force_bytes('{0}:{1}'.format(
+            page['hash'], request.META.get('CSRF_COOKIE', token)))).hexdigest())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=page['last_modified'])
+        if response is None:
+            response = HttpResponse(
+                page['content'].replace(CSRF_TOKEN_PLACEHOLDER_BYTES, force_bytes(token)),
+                content_type=page['content_type'])
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(page['last_modified'])
+        # the responses contain the CSRF token of the visitor
+        patch_cache_control(response, private=True, max_age=0)
+        patch_vary_headers(response, ('Cookie',))
+        return response
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import datetime
+import json
 
 
 try:
@@ -22,10 +23,12 @@ from django.contrib.auth.models import User
 from django.core import urlresolvers
 from django.core.exceptions import PermissionDenied
 from django.core.urlresolvers import reverse
-from django.http import HttpResponseForbidden, Http404, HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, Http404, HttpResponseRedirect
 from django.shortcuts import redirect
+from django.utils import six
 from django.utils.decorators import method_decorator
-from django.utils.translation import ugettext_lazy as _
+from django.utils.translation import get_language, ugettext_lazy as _
+from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import FormView, TemplateView, ListView, DeleteView, UpdateView, View, DetailView
 from django.views.generic.base import TemplateResponseMixin
 from django.contrib.auth import views as auth_views
@@ -35,20 +38,23 @@ from aldryn_accounts.exceptions import EmailAlreadyVerified, VerificationKeyExpi
 from class_based_auth_views.utils import default_redirect
 from dj.chain import chain
 
-from . import utils
+from . import tasks, utils
 from .conf import settings
 from .context_processors import empty_login_and_signup_forms
 from .forms import (
     EmailAuthenticationForm, ChangePasswordForm, CreatePasswordForm,
     SignupForm, SignupEmailResendConfirmationForm, PasswordRecoveryResetForm,
     UserSettingsForm, ProfileEmailForm)
-from .models import EmailAddress, EmailConfirmation, SignupCode, UserSettings
+from .instrumentation import timer
+from .locale_state import get_locale_state
+from .models import EmailAddress, EmailConfirmation, SignupCode, UserSettings, confirmation_resent_recently
 from .signals import user_sign_up_attempt, user_signed_up, password_changed
-from .view_mixins import OnlyOwnedObjectsMixin
-from .emails import EmailSender
+from .timezones import is_valid_timezone
+from .view_mixins import AnonymousPageCacheMixin, OnlyOwnedObjectsMixin
+from .emails import get_email_sender_class
 
 
-class SignupView(FormView):
+class SignupView(AnonymousPageCacheMixin, FormView):
     template_name = "aldryn_accounts/signup.html"
     template_name_signup_closed = "aldryn_accounts/signup_closed.html"
     form_class = SignupForm
@@ -123,27 +129,32 @@ class SignupView(FormView):
     def form_valid(self, form):
         email_is_trusted = False
         email = form.cleaned_data.get('email')
-        self.created_user = self.create_user(form)
+        with timer('signup.create_user'):
+            self.created_user = self.create_user(form)
         if self.signup_code:
-            self.signup_code.use(self.created_user)
+            with timer('signup.use_signup_code'):
+                self.signup_code.use(self.created_user)
             if self.signup_code.email and self.created_user.email == self.signup_code.email:
                 email_is_trusted = True
-        if email_is_trusted:
-            email_address = EmailAddress.objects.add_email(self.created_user, self.created_user.email)
-        else:
-            # send a verification email
-            email_address_verification = EmailConfirmation.objects.request(self.created_user, email=email, send=True)
-            if not settings.ALDRYN_ACCOUNTS_ENABLE_NOTIFICATIONS:
-                if self.messages.get("email_confirmation_sent"):
-                    messages.add_message(
-                        self.request,
-                        self.messages["email_confirmation_sent"]["level"],
-                        self.messages["email_confirmation_sent"]["text"] % {
-                            "email": form.cleaned_data["email"]
-                        }
-                    )
-        self.after_signup(form)
-        self.login_user(show_message=False)
+        with timer('signup.email'):
+            if email_is_trusted:
+                email_address = EmailAddress.objects.add_email(self.created_user, self.created_user.email)
+            else:
+                # send a verification email
+                email_address_verification = EmailConfirmation.objects.request(self.created_user, email=email, send=True)
+                if not settings.ALDRYN_ACCOUNTS_ENABLE_NOTIFICATIONS:
+                    if self.messages.get("email_confirmation_sent"):
+                        messages.add_message(
+                            self.request,
+                            self.messages["email_confirmation_sent"]["level"],
+                            self.messages["email_confirmation_sent"]["text"] % {
+                                "email": form.cleaned_data["email"]
+                            }
+                        )
+        with timer('signup.after_signup'):
+            self.after_signup(form)
+        with timer('signup.login'):
+            self.login_user(show_message=False)
         return redirect(self.get_success_url())
 
     def get_success_url(self, fallback_url=None, **kwargs):
@@ -242,17 +253,22 @@ class SignupEmailResendConfirmationView(FormView):
         url += '?' + urlencode({'email': email})
         return url
 
+    def post(self, request, *args, **kwargs):
+        # repeated clicks (and bots) are answered from the cache, without
+        # validating the form against the database
+        email = request.POST.get('email', '')
+        if email and confirmation_resent_recently(email):
+            return redirect(self.get_success_url())
+        return super(SignupEmailResendConfirmationView, self).post(request, *args, **kwargs)
+
     def form_valid(self, form):
         email = form.cleaned_data['email']
 
-        email_confirmations = EmailConfirmation.objects.filter(email=email)
-        if not email_confirmations.exists():
+        # None if the confirmations were resent recently
+        if EmailConfirmation.objects.resend(email) == 0:
             messages.error(self.request, _('This E-Mail does not have any pending confirmations.'))
             return self.form_invalid(form)
 
-        for email_confirmation in email_confirmations:
-            email_confirmation.send()
-
         return redirect(self.get_success_url())
 
     def form_invalid(self, form):
@@ -280,10 +296,15 @@ class SignupEmailSentView(TemplateView):
     template_name = 'aldryn_accounts/signup_email_sent.html'
 
 
-class LoginView(class_based_auth_views.views.LoginView):
+class LoginView(AnonymousPageCacheMixin, class_based_auth_views.views.LoginView):
     template_name = 'aldryn_accounts/login.html'
     form_class = EmailAuthenticationForm
 
+    def set_test_cookie(self):
+        # a cached page must not start a session
+        if not self.page_cache_render:
+            super(LoginView, self).set_test_cookie()
+
     def get_context_data(self, **kwargs):
         ctx = super(LoginView, self).get_context_data(**kwargs)
         # add the empty login and signup forms to the context, so that
@@ -490,7 +511,13 @@ class ChangePasswordBaseView(FormView):
         return default_redirect(self.request, fallback_url, **kwargs)
 
     def send_email(self, user):
-        EmailSender.send_password_changed(
+        if settings.ALDRYN_ACCOUNTS_SEND_EMAILS_IN_BACKGROUND:
+            site = get_current_site(self.request)
+            tasks.enqueue(
+                tasks.send_password_changed, user.pk, self.email_template_name,
+                site_id=getattr(site, 'pk', None), language=get_language())
+            return
+        get_email_sender_class().send_password_changed(
             user=user,
             template=self.email_template_name,
             request=self.request,
@@ -582,7 +609,7 @@ class ProfileEmailConfirmationResendView(OnlyOwnedObjectsMixin, DetailView):
 
     def post(self, *args, **kwargs):
         email_confirmation = self.get_object()
-        email_confirmation.send()
+        email_confirmation.resend()
         message_type = 'email_confirmation_resent'
         if message_type in self.messages:
             messages.add_message(
@@ -669,8 +696,68 @@ class UserSettingsView(UpdateView):
     def get_form_kwargs(self):
         kwargs = super(UserSettingsView, self).get_form_kwargs()
         if not self.object.timezone:
-            self.object.timezone = self.request.session.get('django_timezone')
+            self.object.timezone = get_locale_state(self.request).get('django_timezone')
         return kwargs
 
     def get_success_url(self):
         return urlresolvers.reverse('aldryn_accounts:accounts_profile')
+
+
+class BrowserTimezoneView(View):
+    """
+    Stores the time zone reported by the browser
+    (see ``aldryn_accounts/inc/browser_timezone.html``).
+    """
+    http_method_names = ['post']
+
+    def post(self, request, *args, **kwargs):
+        tz = request.POST.get('timezone', '')
+        if not is_valid_timezone(tz):
+            return HttpResponseBadRequest()
+        get_locale_state(request).set('django_timezone', tz)
+        if request.user.is_authenticated():
+            user_settings = request.user.settings
+            if not user_settings.timezone:
+                user_settings.timezone = tz
+                user_settings.save(update_fields=['timezone'])
+        return HttpResponse(status=204)
+
+
+class EmailLookupView(View):
+    """
+    Staff only JSON lookup of the users of many email addresses (see
+    ``EmailAddressManager.lookup``) for other services. Takes the addresses
+    as ``email`` parameters or as a JSON body ``{"emails": [...]}``.
+    """
+    http_method_names = ['get', 'post']
+
+    # the lookup changes nothing, posting just allows more addresses than
+    # fit into an url
+    @method_decorator(csrf_exempt)
+    def dispatch(self, request, *args, **kwargs):
+        if not (request.user.is_authenticated() and request.user.is_staff):
+            return HttpResponseForbidden()
+        return super(EmailLookupView, self).dispatch(request, *args, **kwargs)
+
+    def get_emails(self):
+        request = self.request
+        if request.method == 'POST' and request.META.get('CONTENT_TYPE', '').startswith('application/json'):
+            data = json.loads(request.body.decode('utf-8'))
+            emails = data.get('emails') if isinstance(data, dict) else None
+            if not isinstance(emails, list) or not all(isinstance(email, six.string_types) for email in emails):
+                raise ValueError('emails has to be a list of strings')
+            return emails
+        return (request.POST if request.method == 'POST' else request.GET).getlist('email')
+
+    def get(self, request, *args, **kwargs):
+        try:
+            emails = self.get_emails()
+        except ValueError:
+            return HttpResponseBadRequest()
+        if len(emails) > settings.ALDRYN_ACCOUNTS_EMAIL_LOOKUP_MAX_EMAILS:
+            return HttpResponseBadRequest()
+        found = EmailAddress.objects.lookup(emails)
+        results = dict((email, found.get(email.strip().lower())) for email in emails)
+        return HttpResponse(json.dumps({'results': results}), content_type='application/json')
+
+    post = get
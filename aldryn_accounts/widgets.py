@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django import forms
+from django.forms.utils import flatatt
+from django.utils.encoding import force_text
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+
+class CachedSelect(forms.Select):
+    """
+    Select for long, static choices (e.g. time zones). The options are
+    rendered once per process and language and only the selected option is
+    replaced on every render.
+
+    ``cache_key`` has to identify the choices, widgets with the same key
+    share the rendered options.
+    """
+    _cache = {}
+
+    def __init__(self, attrs=None, choices=(), cache_key=None):
+        super(CachedSelect, self).__init__(attrs=attrs, choices=choices)
+        self.cache_key = cache_key
+
+    @classmethod
+    def clear_cache(cls):
+        cls._cache.clear()
+
+    def get_rendered_options(self):
+        """
+        Returns the html of all options and the position and label of every
+        option (start, end, label) by option value.
+        """
+        key = (self.cache_key, get_language())
+        rendered = self._cache.get(key)
+        if rendered is None:
+            parts, positions, offset = [], {}, 0
+            for option_value, option_label in self.choices:
+                if isinstance(option_label, (list, tuple)):
+                    # option groups are not supported
+                    return None
+                option = self.render_option([], option_value, option_label)
+                value = force_text('' if option_value is None else option_value)
+                positions.setdefault(value, (offset, offset + len(option), option_label))
+                parts.append(option)
+                offset += len(option) + 1
+            rendered = self._cache[key] = ('\n'.join(parts), positions)
+        return rendered
+
+    def render(self, name, value, attrs=None, choices=(), **kwargs):
+        rendered = None
+        if self.cache_key and not choices and hasattr(self, 'render_option'):
+            rendered = self.get_rendered_options()
+        if rendered is None:
+            if choices:
+                kwargs['choices'] = choices
+            return super(CachedSelect, self).render(name, value, attrs, **kwargs)
+        options, positions = rendered
+        value = force_text('' if value is None else value)
+        if value in positions:
+            start, end, label = positions[value]
+            options = ''.join([
+                options[:start],
+                self.render_option([value], value, label),
+                options[end:],
+            ])
+        final_attrs = dict(self.attrs, name=name)
+        if attrs:
+            final_attrs.update(attrs)
+        output = [format_html('<select{}>', flatatt(final_attrs))]
+        if options:
+            output.append(options)
+        output.append('</select>')
+        return mark_safe('\n'.join(output))
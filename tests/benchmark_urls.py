@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf.urls import include, url
+from django.contrib import admin
+
+from aldryn_accounts import urls_i18n
+
+
+# all accounts and profile views without apphooks, used by the benchmarks
+# and view tests
+urlpatterns = [
+    url(r'^accounts/', include(urls_i18n.accounts_urlpatterns + [
+        url(r'^profile/settings/', include(urls_i18n.profile_settings_urlpatterns)),
+        url(r'^profile/email/', include(urls_i18n.email_settings_urlpatterns)),
+        url(r'^profile/', include(urls_i18n.profile_index_urlpatterns)),
+    ], namespace='aldryn_accounts')),
+    url(r'^admin/', include(admin.site.urls)),
+    url(r'^', include('cms.urls')),
+]
@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+"""
+Query count and latency benchmarks for the aldryn_accounts views.
+
+Every flow runs against a dataset created by
+``aldryn_accounts.dataset.generate_dataset`` and fails if it needs more queries
+than its budget in ``QUERY_BUDGETS``. The dataset size can be raised with
+``ALDRYN_ACCOUNTS_BENCHMARK_USERS`` (e.g. 1000, 100000 or 1000000, best
+against a local Postgres configured through ``DATABASE_URL``).
+If ``ALDRYN_ACCOUNTS_BENCHMARK_RESULTS`` is set to a file path, query counts,
+wall times and allocations are written there as JSON.
+
+``EmailThroughputTestCase`` compares the throughput of concurrent requests
+that send an email, with and without ``ALDRYN_ACCOUNTS_SEND_EMAILS_IN_BACKGROUND``,
+against an email backend with SMTP like latency. It takes a few seconds and
+depends on the load of the machine, so it only runs if
+``ALDRYN_ACCOUNTS_BENCHMARK_THROUGHPUT`` is set.
+"""
+from __future__ import unicode_literals
+
+import json
+import os
+import threading
+import time
+import unittest
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import Client, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from cms.test_utils.testcases import CMSTestCase
+
+from aldryn_accounts import tasks
+from aldryn_accounts.dataset import generate_dataset
+from aldryn_accounts.models import (
+    EmailAddress, EmailConfirmation, UserSettings)
+
+from .base import CleanUpMixin, AcountsSetupMixin
+
+
+# maximum number of queries per flow (including the django CMS queries of a
+# request), independent of the dataset size
+QUERY_BUDGETS = {
+    'login': 24,
+    'login_failed': 18,
+    'signup': 35,
+    'email_confirmation': 29,
+    'email_confirmation_resend': 13,
+    'profile_email_list': 26,
+    'profile_email_make_primary': 23,
+    'password_reset': 7,
+    'settings_get': 24,
+    'settings_post': 19,
+    'page_render': 31,
+}
+
+BENCHMARK_USERS = int(os.environ.get('ALDRYN_ACCOUNTS_BENCHMARK_USERS', 1000))
+BENCHMARK_RESULTS = os.environ.get('ALDRYN_ACCOUNTS_BENCHMARK_RESULTS')
+BENCHMARK_THROUGHPUT = bool(os.environ.get('ALDRYN_ACCOUNTS_BENCHMARK_THROUGHPUT'))
+PASSWORD = 'benchmark'
+SMTP_LATENCY = 0.1  # seconds
+
+
+# session engine is hardcoded in djangocms-helper (atm v0.9.4), so override
+# per test case
+@override_settings(
+    ROOT_URLCONF='tests.benchmark_urls',
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+    EMAIL_CONFIRMATION_REDIRECT_URL='aldryn_accounts:accounts_email_list',
+    ALDRYN_ACCOUNTS_SIGNUP_REDIRECT_URL='aldryn_accounts:accounts_profile',
+)
+class ViewQueryBudgetTestCase(CleanUpMixin, AcountsSetupMixin, CMSTestCase):
+    apphook_objects = []
+    set_up_apphooks = False
+    results = []
+
+    @classmethod
+    def setUpTestData(cls):
+        super(ViewQueryBudgetTestCase, cls).setUpTestData()
+        generate_dataset(BENCHMARK_USERS, seed=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        if BENCHMARK_RESULTS:
+            with open(BENCHMARK_RESULTS, 'w') as results_file:
+                json.dump({
+                    'users': BENCHMARK_USERS,
+                    'database': connection.vendor,
+                    'results': cls.results,
+                }, results_file, indent=2, sort_keys=True)
+        super(ViewQueryBudgetTestCase, cls).tearDownClass()
+
+    def setUp(self):
+        super(ViewQueryBudgetTestCase, self).setUp()
+        self.user = User.objects.create_user(
+            'benchmark', 'benchmark@example.com', PASSWORD)
+        # like the users of the dataset
+        UserSettings.objects.create(user=self.user)
+        self.email_address = EmailAddress.objects.add_email(
+            self.user, self.user.email, verified_at=timezone.now())
+
+    def login(self):
+        self.client.login(username='benchmark', password=PASSWORD)
+
+    def measure(self, name, func):
+        if tracemalloc is not None:
+            tracemalloc.start()
+        start = time.time()
+        with CaptureQueriesContext(connection) as queries:
+            response = func()
+        wall_time = time.time() - start
+        allocated = None
+        if tracemalloc is not None:
+            allocated = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        self.results.append({
+            'flow': name,
+            'queries': len(queries),
+            'query_budget': QUERY_BUDGETS[name],
+            'wall_time': wall_time,
+            'peak_allocated_bytes': allocated,
+        })
+        self.assertLessEqual(
+            len(queries), QUERY_BUDGETS[name],
+            '{0} used {1} queries (budget {2}):\n{3}'.format(
+                name, len(queries), QUERY_BUDGETS[name],
+                '\n'.join(query['sql'] for query in queries)))
+        return response
+
+    def test_login(self):
+        url = reverse('aldryn_accounts:login')
+        response = self.measure('login', lambda: self.client.post(url, {
+            'username': 'benchmark@example.com', 'password': PASSWORD}))
+        self.assertEqual(response.status_code, 302)
+
+    def test_login_failed(self):
+        url = reverse('aldryn_accounts:login')
+        response = self.measure('login_failed', lambda: self.client.post(url, {
+            'username': 'benchmark@example.com', 'password': 'wrong'}))
+        self.assertEqual(response.status_code, 200)
+
+    def test_signup(self):
+        url = reverse('aldryn_accounts:accounts_signup')
+        response = self.measure('signup', lambda: self.client.post(url, {
+            'email': 'new-benchmark@example.com'}))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_email_confirmation(self):
+        confirmation = EmailConfirmation.objects.request(
+            self.user, 'second-benchmark@example.com', send=True)
+        url = reverse('aldryn_accounts:accounts_confirm_email',
+                      args=[confirmation.key])
+        response = self.measure(
+            'email_confirmation', lambda: self.client.post(url))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(EmailAddress.objects.filter(
+            email='second-benchmark@example.com').exists())
+
+    def test_email_confirmation_resend(self):
+        EmailConfirmation.objects.request(
+            self.user, 'second-benchmark@example.com', send=True)
+        url = reverse('aldryn_accounts:accounts_signup_email_resend_confirmation')
+        response = self.measure(
+            'email_confirmation_resend', lambda: self.client.post(url, {
+                'email': 'second-benchmark@example.com'}))
+        self.assertEqual(response.status_code, 302)
+
+    def test_profile_email_list(self):
+        EmailConfirmation.objects.request(
+            self.user, 'second-benchmark@example.com')
+        self.login()
+        url = reverse('aldryn_accounts:accounts_email_list')
+        response = self.measure(
+            'profile_email_list', lambda: self.client.get(url))
+        self.assertContains(response, 'second-benchmark@example.com')
+
+    def test_profile_email_make_primary(self):
+        email_address = EmailAddress.objects.add_email(
+            self.user, 'second-benchmark@example.com')
+        self.login()
+        url = reverse('aldryn_accounts:accounts_email_make_primary',
+                      kwargs={'pk': email_address.pk})
+        response = self.measure(
+            'profile_email_make_primary', lambda: self.client.post(url))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            EmailAddress.objects.get_primary(self.user), email_address)
+
+    def test_password_reset(self):
+        url = reverse('aldryn_accounts:accounts_password_reset_recover')
+        response = self.measure('password_reset', lambda: self.client.post(
+            url, {'email': 'benchmark@example.com'}))
+        self.assertEqual(response.status_code, 302)
+
+    def test_settings_get(self):
+        self.login()
+        url = reverse('aldryn_accounts:accounts_settings')
+        response = self.measure('settings_get', lambda: self.client.get(url))
+        self.assertEqual(response.status_code, 200)
+
+    def test_settings_post(self):
+        self.login()
+        url = reverse('aldryn_accounts:accounts_settings')
+        response = self.measure('settings_post', lambda: self.client.post(url, {
+            'first_name': 'Bench',
+            'last_name': 'Mark',
+            'timezone': 'Europe/Zurich',
+        }))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            UserSettings.objects.get(user=self.user).timezone.zone,
+            'Europe/Zurich')
+
+    def test_page_render(self):
+        self.login()
+        url = self.root_page.get_absolute_url()
+        response = self.measure('page_render', lambda: self.client.get(url))
+        self.assertEqual(response.status_code, 200)
+
+
+class DatabaseAccess(object):
+    """
+    Serializes the database access of the benchmark threads, the in-memory
+    sqlite database of the tests does not support concurrent writers. The
+    email backend gives it up while it waits for the SMTP server.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def __enter__(self):
+        self.lock.acquire()
+        self.local.held = True
+
+    def __exit__(self, *exc_info):
+        self.local.held = False
+        self.lock.release()
+
+    def wait(self, seconds):
+        if not getattr(self.local, 'held', False):
+            time.sleep(seconds)
+            return
+        self.__exit__()
+        try:
+            time.sleep(seconds)
+        finally:
+            self.__enter__()
+
+database_access = DatabaseAccess()
+background_runner = tasks.ThreadRunner()
+
+
+def run_locked(func, *args, **kwargs):
+    with database_access:
+        func(*args, **kwargs)
+
+
+def run_in_background(func, *args, **kwargs):
+    background_runner(run_locked, func, *args, **kwargs)
+
+
+recorded_jobs = []
+
+
+def record_job(func, *args, **kwargs):
+    recorded_jobs.append(func)
+
+
+class SlowEmailBackend(EmailBackend):
+
+    def send_messages(self, messages):
+        database_access.wait(SMTP_LATENCY)
+        return super(SlowEmailBackend, self).send_messages(messages)
+
+
+@override_settings(
+    ROOT_URLCONF='tests.benchmark_urls',
+    EMAIL_BACKEND='tests.test_benchmarks.SlowEmailBackend',
+    ALDRYN_ACCOUNTS_TASK_RUNNER='tests.test_benchmarks.run_in_background',
+    # every request has to send, whatever cache the settings use
+    ALDRYN_ACCOUNTS_CONFIRMATION_RESEND_WINDOW=0,
+)
+class EmailThroughputTestCase(TransactionTestCase):
+    concurrency = 4
+    requests_per_client = 5
+
+    def setUp(self):
+        user = User.objects.create_user('benchmark', 'benchmark@example.com', PASSWORD)
+        self.emails = []
+        for i in range(self.concurrency):
+            email = 'benchmark-{0}@example.com'.format(i)
+            EmailConfirmation.objects.request(user, email)
+            self.emails.append(email)
+        self.url = reverse('aldryn_accounts:accounts_signup_email_resend_confirmation')
+        mail.outbox = []
+
+    def run_clients(self):
+        """
+        Posts resend requests from concurrent clients and returns the
+        number of requests per second.
+        """
+        errors = []
+
+        def client(email):
+            c = Client()
+            for _ in range(self.requests_per_client):
+                try:
+                    with database_access:
+                        response = c.post(self.url, {'email': email})
+                except Exception as e:
+                    errors.append(e)
+                else:
+                    if response.status_code != 302:
+                        errors.append(response.status_code)
+
+        threads = [threading.Thread(target=client, args=(email,)) for email in self.emails]
+        start = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall_time = time.time() - start
+        self.assertEqual(errors, [])
+        return self.concurrency * self.requests_per_client / wall_time
+
+    def test_requests_do_not_send_background_emails(self):
+        del recorded_jobs[:]
+        with override_settings(ALDRYN_ACCOUNTS_SEND_EMAILS_IN_BACKGROUND=True,
+                               ALDRYN_ACCOUNTS_TASK_RUNNER='tests.test_benchmarks.record_job'):
+            response = Client().post(self.url, {'email': self.emails[0]})
+        self.assertEqual(response.status_code, 302)
+        # the email is left to the job, the request never reaches the backend
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(recorded_jobs, [tasks.send_email_verification])
+
+    @unittest.skipUnless(BENCHMARK_THROUGHPUT, 'set ALDRYN_ACCOUNTS_BENCHMARK_THROUGHPUT to run')
+    def test_background_emails_do_not_block_requests(self):
+        requests = self.concurrency * self.requests_per_client
+        with override_settings(ALDRYN_ACCOUNTS_SEND_EMAILS_IN_BACKGROUND=False):
+            sync_throughput = self.run_clients()
+        self.assertEqual(len(mail.outbox), requests)
+
+        with override_settings(ALDRYN_ACCOUNTS_SEND_EMAILS_IN_BACKGROUND=True):
+            background_throughput = self.run_clients()
+            background_runner.join()
+        self.assertEqual(len(mail.outbox), 2 * requests)
+        self.assertGreater(background_throughput, 2 * sync_throughput)
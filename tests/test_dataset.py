@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils.six import StringIO
+
+from aldryn_accounts import dataset
+from aldryn_accounts.dataset import generate_dataset
+from aldryn_accounts.models import (
+    EmailAddress, EmailConfirmation, SignupCode, SignupCodeResult,
+    UserSettings)
+
+
+def snapshot():
+    return {
+        'users': list(User.objects.order_by('pk').values_list(
+            'pk', 'username', 'email', 'first_name', 'last_name')),
+        'emails': list(EmailAddress.objects.order_by('email').values_list(
+            'user_id', 'email', 'is_primary')),
+        'confirmations': list(EmailConfirmation.objects.order_by('key').values_list(
+            'user_id', 'email', 'key', 'sent_at')),
+        'codes': list(SignupCode.objects.order_by('pk').values_list(
+            'code', 'max_uses', 'use_count')),
+        'settings': list(UserSettings.objects.order_by('user_id').values_list(
+            'user_id', 'timezone', 'location_name')),
+    }
+
+
+def delete_all():
+    for model in (SignupCodeResult, SignupCode, EmailConfirmation,
+                  EmailAddress, UserSettings, User):
+        model.objects.all().delete()
+
+
+class GenerateDatasetTestCase(TestCase):
+
+    def test_generates_related_rows(self):
+        created = generate_dataset(250, seed=1, batch_size=100, signup_codes=5,
+                                   signup_code_ratio=0.5)
+        self.assertEqual(created, 250)
+        self.assertEqual(User.objects.count(), 250)
+        self.assertEqual(UserSettings.objects.count(), 250)
+        # every user has exactly one primary email
+        self.assertEqual(
+            EmailAddress.objects.filter(is_primary=True).count(), 250)
+        self.assertTrue(EmailConfirmation.objects.exists())
+        results = SignupCodeResult.objects.count()
+        self.assertTrue(results)
+        self.assertEqual(
+            sum(SignupCode.objects.values_list('use_count', flat=True)),
+            results)
+
+    def test_password_is_hashed_once(self):
+        hashed = []
+        original = dataset.make_password
+
+        def make_password(password):
+            hashed.append(password)
+            return original(password)
+
+        dataset.make_password = make_password
+        self.addCleanup(setattr, dataset, 'make_password', original)
+        generate_dataset(30, batch_size=10)
+        self.assertEqual(len(hashed), 1)
+        self.assertEqual(len(set(User.objects.values_list('password', flat=True))), 1)
+
+    def test_same_seed_generates_same_data(self):
+        generate_dataset(120, seed=7, batch_size=50)
+        first = snapshot()
+        delete_all()
+        generate_dataset(120, seed=7, batch_size=50)
+        second = snapshot()
+        # sent_at depends on the time of generation
+        for key in ('users', 'emails', 'codes', 'settings'):
+            self.assertEqual(first[key], second[key])
+        self.assertEqual(
+            [row[:3] for row in first['confirmations']],
+            [row[:3] for row in second['confirmations']])
+
+    def test_management_command(self):
+        out = StringIO()
+        call_command('generate_accounts_dataset', users=30, batch_size=10,
+                     stdout=out)
+        self.assertEqual(User.objects.count(), 30)
+        self.assertIn('Generated 30 users', out.getvalue())
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import unittest
+
+from django.contrib.auth.models import User
+from django.core.urlresolvers import clear_url_caches
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from cms.utils.permissions import set_current_user
+
+from aldryn_accounts import models
+from aldryn_accounts.models import EmailAddress, EmailConfirmation
+from aldryn_accounts.utils import get_most_qualified_user_for_email
+
+
+class EmailLookupTestCase(TestCase):
+
+    def setUp(self):
+        self.verified = User.objects.create_user('verified', 'verified@example.com', 'secret')
+        EmailAddress.objects.create(user=self.verified, email='verified@example.com', is_primary=True)
+        EmailAddress.objects.create(user=self.verified, email='second@example.com')
+        self.unverified = User.objects.create_user('unverified', 'Unverified@example.com', 'secret')
+        self.pending = User.objects.create_user('pending', '', 'secret')
+        EmailConfirmation.objects.create(user=self.pending, email='pending@example.com', key='a')
+        # the verified address wins over the other users
+        EmailConfirmation.objects.create(user=self.pending, email='second@example.com', key='b')
+
+    def test_lookup(self):
+        emails = [
+            'verified@example.com', 'SECOND@example.com', 'Unverified@example.com',
+            'pending@example.com', 'unknown@example.com',
+        ]
+        # the user email is matched exactly and case-insensitively
+        with self.assertNumQueries(4):
+            found = EmailAddress.objects.lookup(emails)
+        self.assertEqual(found, {
+            'verified@example.com': {'user_id': self.verified.pk, 'status': 'verified', 'is_primary': True},
+            'second@example.com': {'user_id': self.verified.pk, 'status': 'verified', 'is_primary': False},
+            'unverified@example.com': {'user_id': self.unverified.pk, 'status': 'unverified', 'is_primary': True},
+            'pending@example.com': {'user_id': self.pending.pk, 'status': 'pending', 'is_primary': False},
+        })
+        for email, result in found.items():
+            self.assertEqual(get_most_qualified_user_for_email(email).pk, result['user_id'])
+
+    def test_lookup_ignores_case_of_stored_addresses(self):
+        mixed = User.objects.create_user('mixed', 'John@Example.com', 'secret')
+        # a verified address stored in another case still wins
+        EmailAddress.objects.create(user=self.verified, email='Third@Example.com')
+        User.objects.create_user('third', 'third@example.com', 'secret')
+        for email in ('john@example.com', 'JOHN@EXAMPLE.COM'):
+            found = EmailAddress.objects.lookup([email, 'third@example.com'])
+            self.assertEqual(found, {
+                'john@example.com': {'user_id': mixed.pk, 'status': 'unverified', 'is_primary': True},
+                'third@example.com': {'user_id': self.verified.pk, 'status': 'verified', 'is_primary': False},
+            })
+
+    def test_exact_user_matches_skip_case_insensitive_query(self):
+        with self.assertNumQueries(3):
+            found = EmailAddress.objects.lookup(['verified@example.com'])
+        self.assertEqual(list(found), ['verified@example.com'])
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'reads the SQLite query plan')
+    def test_case_insensitive_queries_use_indexes(self):
+        for model in (EmailAddress, EmailConfirmation):
+            queryset = models._filter_email_lower(model.objects.all(), ['john@example.com'])
+            sql, params = queryset.values_list('email').query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+            self.assertIn('{0}_email_lower'.format(model._meta.db_table), plan)
+
+    def test_batches(self):
+        self.addCleanup(setattr, models, 'EMAIL_LOOKUP_BATCH_SIZE', models.EMAIL_LOOKUP_BATCH_SIZE)
+        models.EMAIL_LOOKUP_BATCH_SIZE = 2
+        emails = ['{0}@example.com'.format(i) for i in range(5)] + ['pending@example.com']
+        with self.assertNumQueries(12):
+            found = EmailAddress.objects.lookup(emails)
+        self.assertEqual(list(found), ['pending@example.com'])
+
+
+# the session engine of djangocms-helper is not usable with the test client
+@override_settings(
+    ROOT_URLCONF='tests.benchmark_urls',
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+)
+class EmailLookupViewTestCase(TestCase):
+    url = '/accounts/email-lookup/'
+
+    def setUp(self):
+        clear_url_caches()
+        # the CurrentUserMiddleware of the cms keeps the last user in a
+        # thread local, users created later would become cms page users
+        self.addCleanup(set_current_user, None)
+        self.user = User.objects.create_user('staff', 'staff@example.com', 'secret')
+        self.user.is_staff = True
+        self.user.save()
+        EmailAddress.objects.create(user=self.user, email='staff@example.com', is_primary=True)
+
+    def test_staff_only(self):
+        self.assertEqual(self.client.get(self.url, {'email': 'staff@example.com'}).status_code, 403)
+        self.user.is_staff = False
+        self.user.save()
+        self.client.login(username='staff@example.com', password='secret')
+        self.assertEqual(self.client.get(self.url, {'email': 'staff@example.com'}).status_code, 403)
+
+    def test_lookup(self):
+        self.client.login(username='staff@example.com', password='secret')
+        expected = {'results': {
+            'Staff@example.com': {'user_id': self.user.pk, 'status': 'verified', 'is_primary': True},
+            'unknown@example.com': None,
+        }}
+        response = self.client.get(self.url, {'email': ['Staff@example.com', 'unknown@example.com']})
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(response.content.decode('utf-8')), expected)
+
+        client = self.client_class(enforce_csrf_checks=True)
+        client.login(username='staff@example.com', password='secret')
+        response = client.post(
+            self.url, json.dumps({'emails': ['Staff@example.com', 'unknown@example.com']}),
+            content_type='application/json')
+        self.assertEqual(json.loads(response.content.decode('utf-8')), expected)
+
+    @override_settings(ALDRYN_ACCOUNTS_EMAIL_LOOKUP_MAX_EMAILS=1)
+    def test_bad_requests(self):
+        self.client.login(username='staff@example.com', password='secret')
+        self.assertEqual(self.client.get(self.url, {'email': ['a@example.com', 'b@example.com']}).status_code, 400)
+        response = self.client.post(self.url, json.dumps({'emails': 'a@example.com'}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
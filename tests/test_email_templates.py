@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.contrib.auth.models import User
+from django.contrib.sites.models import Site
+from django.core import mail
+from django.template import Template
+from django.test import TestCase, override_settings
+from django.utils.translation import get_language, override
+
+from aldryn_accounts import email_templates
+from aldryn_accounts.email_templates import get_email_template, get_site_url_prefix
+from aldryn_accounts.emails import DefaultEmailSender, EmailSender, get_email_sender_class
+from aldryn_accounts.models import EmailConfirmation
+
+
+INVITE = 'aldryn_accounts/email/invite_user'
+
+
+class RecordingEmailSender(EmailSender):
+    sent = []
+
+    @classmethod
+    def send_email_verification(cls, **kwargs):
+        cls.sent.append(kwargs['verification'].email)
+
+
+class EmailTemplateTestCase(TestCase):
+
+    def setUp(self):
+        email_templates.clear_cache()
+        self.site = Site.objects.get_current()
+        self.lookups = []
+        original = email_templates._select_template
+
+        def select_template(names):
+            self.lookups.append(names[0])
+            return original(names)
+
+        email_templates._select_template = select_template
+        self.addCleanup(setattr, email_templates, '_select_template', original)
+
+    def get_context(self, signup_url='http://example.com/signup/'):
+        return {'current_site': self.site, 'signup_url': signup_url}
+
+    def test_templates_are_loaded_once_per_language(self):
+        for language in ('en', 'en', 'de'):
+            template = get_email_template(INVITE, language)
+            message = template.render(['user@example.com'], self.get_context(), self.site)
+            self.assertEqual(message.to, ['user@example.com'])
+            self.assertIn(self.site.domain, message.subject)
+            self.assertIn('http://example.com/signup/', message.body)
+            self.assertEqual(message.alternatives[0][1], 'text/html')
+        self.assertIs(get_email_template(INVITE, 'en'), get_email_template(INVITE, 'en'))
+        self.assertEqual(self.lookups, [
+            INVITE + '.subject.en.txt', INVITE + '.body.en.txt', INVITE + '.body.en.html',
+            INVITE + '.subject.de.txt', INVITE + '.body.de.txt', INVITE + '.body.de.html',
+        ])
+
+    @override_settings(ALDRYN_ACCOUNTS_CACHE_EMAIL_TEMPLATES=False)
+    def test_cache_can_be_disabled(self):
+        self.assertIsNot(get_email_template(INVITE, 'en'), get_email_template(INVITE, 'en'))
+
+    def test_render_many(self):
+        template = get_email_template(INVITE, 'de')
+        with override('en'):
+            messages = template.render_many(
+                (['user{0}@example.com'.format(i)], self.get_context('http://example.com/{0}/'.format(i)))
+                for i in range(3))
+            first = next(messages)
+            # the language of the email is only active while rendering
+            self.assertEqual(get_language(), 'en')
+            rest = list(messages)
+        self.assertIn('http://example.com/0/', first.body)
+        self.assertEqual([message.to for message in rest], [['user1@example.com'], ['user2@example.com']])
+
+    def test_send_mails(self):
+        mail.outbox = []
+        sent = DefaultEmailSender.send_mails(
+            [(['user{0}@example.com'.format(i)], self.get_context()) for i in range(3)], INVITE, 'invite')
+        self.assertEqual(sent, 3)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_site_url_prefix(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(get_site_url_prefix(self.site), 'http://{0}'.format(self.site.domain))
+            self.assertEqual(get_site_url_prefix(self.site, 'https'), 'https://{0}'.format(self.site.domain))
+        self.site.domain = 'changed.example.com'
+        self.site.save()
+        self.assertEqual(get_site_url_prefix(), 'http://changed.example.com')
+        self.assertEqual(
+            DefaultEmailSender.get_absolute_url('/path/', self.site), 'http://changed.example.com/path/')
+
+    def test_site_url_prefix_expires(self):
+        self.addCleanup(setattr, email_templates.time, 'time', email_templates.time.time)
+        now = email_templates.time.time()
+        email_templates.time.time = lambda: now
+        self.assertEqual(get_site_url_prefix(self.site), 'http://{0}'.format(self.site.domain))
+        # e.g. changed by another process
+        Site.objects.filter(pk=self.site.pk).update(domain='changed.example.com')
+        Site.objects.clear_cache()
+        self.assertEqual(get_site_url_prefix(), 'http://{0}'.format(self.site.domain))
+        email_templates.time.time = lambda: now + 301
+        self.assertEqual(get_site_url_prefix(), 'http://changed.example.com')
+
+    def test_raw_templates_are_rendered_with_a_context(self):
+        # what select_template returns before Django 1.8
+        template = Template('{{ site_name }}: {{ signup_url }}')
+        self.assertEqual(
+            email_templates._render_template(template, {'site_name': 'Example', 'signup_url': '/signup/'}),
+            'Example: /signup/')
+
+
+class EmailSenderTestCase(TestCase):
+
+    @override_settings(ALDRYN_ACCOUNTS_EMAIL_SENDER='tests.test_email_templates.RecordingEmailSender')
+    def test_configured_sender_is_used(self):
+        self.assertIs(get_email_sender_class(), RecordingEmailSender)
+        self.assertTrue(issubclass(RecordingEmailSender, DefaultEmailSender))
+        del RecordingEmailSender.sent[:]
+        user = User.objects.create_user('user', 'user@example.com', 'secret')
+        EmailConfirmation.objects.request(user, 'second@example.com', send=True)
+        self.assertEqual(RecordingEmailSender.sent, ['second@example.com'])
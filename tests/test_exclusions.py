@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from aldryn_accounts.exclusions import ExclusionRules, get_rules, is_excluded
+from aldryn_accounts.middleware import GeoIPMiddleware, TimezoneMiddleware
+
+
+class UntouchableSession(object):
+    def __getattr__(self, name):
+        raise AssertionError('session accessed')
+
+    def __getitem__(self, key):
+        raise AssertionError('session accessed')
+
+    get = __getitem__
+
+
+class ExclusionRulesTestCase(TestCase):
+    factory = RequestFactory()
+
+    def test_no_rules(self):
+        rules = ExclusionRules()
+        self.assertFalse(rules.enabled)
+        self.assertFalse(rules.match(self.factory.get('/health/')))
+
+    def test_prefixes(self):
+        rules = ExclusionRules(prefixes=['/health/', '/api/'])
+        self.assertTrue(rules.match(self.factory.get('/api/v1/users/')))
+        self.assertTrue(rules.match(self.factory.get('/health/')))
+        self.assertFalse(rules.match(self.factory.get('/accounts/api/')))
+
+    def test_regexes(self):
+        rules = ExclusionRules(regexes=[r'^/[a-z]{2}/api/', r'\.json$'])
+        self.assertTrue(rules.match(self.factory.get('/de/api/users/')))
+        self.assertTrue(rules.match(self.factory.get('/feed.json')))
+        self.assertFalse(rules.match(self.factory.get('/de/accounts/')))
+
+    def test_user_agents(self):
+        rules = ExclusionRules(user_agents=['bot', 'monitor', r'^MyChecker/'])
+        for user_agent in ('Mozilla/5.0 (compatible; Googlebot/2.1)',
+                           'Pingdom.com_bot_version_1.4', 'kube-probe/1.18',
+                           'MyChecker/2.0'):
+            self.assertTrue(rules.match(self.factory.get('/', HTTP_USER_AGENT=user_agent)), user_agent)
+        self.assertFalse(rules.match(self.factory.get(
+            '/', HTTP_USER_AGENT='Mozilla/5.0 (X11; Linux x86_64; rv:60.0) Firefox/60.0')))
+        self.assertFalse(rules.match(self.factory.get('/')))
+
+    def test_methods(self):
+        rules = ExclusionRules(methods=['head', 'OPTIONS'])
+        self.assertTrue(rules.match(self.factory.head('/')))
+        self.assertTrue(rules.match(self.factory.options('/')))
+        self.assertFalse(rules.match(self.factory.get('/')))
+
+    @override_settings(STATIC_URL='/static/', MEDIA_URL='https://cdn.example.com/media/',
+                       ALDRYN_ACCOUNTS_MIDDLEWARE_EXCLUDE_PATHS=['/health/'])
+    def test_rules_from_settings(self):
+        self.assertEqual(get_rules().prefixes, ('/health/', '/static/'))
+        with override_settings(ALDRYN_ACCOUNTS_MIDDLEWARE_EXCLUDE_STATIC=False):
+            self.assertEqual(get_rules().prefixes, ('/health/',))
+
+    @override_settings(ALDRYN_ACCOUNTS_MIDDLEWARE_EXCLUDE_PATHS=['/health/'])
+    def test_result_is_kept_on_the_request(self):
+        request = self.factory.get('/health/')
+        self.assertTrue(is_excluded(request))
+        request.path_info = '/'
+        self.assertTrue(is_excluded(request))
+
+
+@override_settings(ALDRYN_ACCOUNTS_USE_GEOIP=True,
+                   ALDRYN_ACCOUNTS_MIDDLEWARE_EXCLUDE_PATHS=['/health/'])
+class ExcludedMiddlewareTestCase(TestCase):
+
+    def tearDown(self):
+        timezone.deactivate()
+
+    def test_middlewares_skip_excluded_requests(self):
+        timezone.activate('Europe/Zurich')
+        request = RequestFactory().get('/health/')
+        request.session = UntouchableSession()
+        GeoIPMiddleware().process_request(request)
+        TimezoneMiddleware().process_request(request)
+        response = TimezoneMiddleware().process_response(request, 'response')
+        self.assertEqual(GeoIPMiddleware().process_response(request, response), 'response')
+        self.assertEqual(timezone.get_current_timezone_name(), 'UTC')
+
+    def test_middlewares_process_other_requests(self):
+        request = RequestFactory().get('/accounts/')
+        request.session = {'django_timezone': 'Europe/Zurich'}
+        TimezoneMiddleware().process_request(request)
+        self.assertEqual(timezone.get_current_timezone_name(), 'Europe/Zurich')
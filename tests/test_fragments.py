@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.core.urlresolvers import clear_url_caches
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils.translation import override
+
+from aldryn_accounts import fragments
+from aldryn_accounts.context_processors import empty_login_and_signup_forms
+from aldryn_accounts.utils import get_login_view
+from aldryn_accounts.view_mixins import CSRF_TOKEN_PLACEHOLDER
+
+
+@override_settings(ROOT_URLCONF='tests.benchmark_urls')
+class FormFragmentTestCase(TestCase):
+
+    def setUp(self):
+        clear_url_caches()
+        fragments.clear_cache()
+        self.renders = []
+        original = fragments.render_fragment
+
+        def render_fragment(name):
+            self.renders.append(name)
+            return original(name)
+
+        fragments.render_fragment = render_fragment
+        self.addCleanup(setattr, fragments, 'render_fragment', original)
+
+    def render(self, request, fragment='login'):
+        template = Template('{% load accounts_tags %}{% form_fragment fragment %}')
+        return template.render(Context({'request': request, 'fragment': fragment}))
+
+    def test_fragment_is_rendered_once_per_language(self):
+        for language in ('en', 'en', 'de', 'de'):
+            with override(language):
+                html = self.render(RequestFactory().get('/'))
+            self.assertIn('action="/accounts/login/?next=%2F"', html)
+        self.assertEqual(self.renders, ['login', 'login'])
+
+    def test_csrf_token_per_request(self):
+        request = RequestFactory().get('/')
+        request.META['CSRF_COOKIE'] = 'a' * 32
+        html = self.render(request)
+        self.assertIn("value='{0}'".format('a' * 32), html)
+        self.assertNotIn(CSRF_TOKEN_PLACEHOLDER, html)
+        self.assertTrue(request.META['CSRF_COOKIE_USED'])
+
+        request = RequestFactory().get('/')
+        request.META['CSRF_COOKIE'] = 'b' * 32
+        self.assertIn("value='{0}'".format('b' * 32), self.render(request))
+        self.assertEqual(self.renders, ['login'])
+
+    def test_redirect_target_per_request(self):
+        html = self.render(RequestFactory().get('/page/', {'a': '1'}))
+        action = html.split('action="', 1)[1].split('"', 1)[0]
+        self.assertEqual(sorted(action.split('?', 1)[1].split('&amp;')), ['a=1', 'next=%2Fpage%2F%3Fa%3D1'])
+        html = self.render(RequestFactory().get('/accounts/login/', {'next': '/other/'}))
+        self.assertIn('action="/accounts/login/?next=%2Fother%2F"', html)
+        self.assertEqual(self.renders, ['login'])
+
+    def test_signup_fragment(self):
+        html = self.render(RequestFactory().get('/'), 'signup')
+        self.assertIn('action="/accounts/signup/"', html)
+        self.assertIn('name="register"', html)
+
+    def test_empty_forms_are_built_on_use(self):
+        built = []
+        view = get_login_view()
+        original = view.form_class
+
+        def form_class(*args, **kwargs):
+            built.append(1)
+            return original(*args, **kwargs)
+
+        view.form_class = staticmethod(form_class)
+        self.addCleanup(setattr, view, 'form_class', original)
+        context = empty_login_and_signup_forms(RequestFactory().get('/'))
+        self.assertEqual(built, [])
+        self.assertIn('password', context['empty_login_form'].fields)
+        self.assertEqual(built, [1])
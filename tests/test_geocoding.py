@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils.six import StringIO
+
+from aldryn_accounts import utils
+from aldryn_accounts.forms import UserSettingsForm
+from aldryn_accounts.geo import haversine
+from aldryn_accounts.geocoding import ReverseGeocoder, build_index, read_places
+
+
+PLACES = [
+    ('Zürich, Switzerland', 47.3769, 8.5417),
+    ('Winterthur, Switzerland', 47.5001, 8.7502),
+    ('Basel, Switzerland', 47.5596, 7.5886),
+    ('Berlin, Germany', 52.5200, 13.4050),
+    ('Suva, Fiji', -18.1416, 178.4419),
+    ('Apia, Samoa', -13.8333, -171.7667),
+    ('Longyearbyen, Svalbard', 78.2232, 15.6267),
+]
+
+GEONAMES_ROW = '\t'.join([
+    '2657896', 'Zurich', 'Zurich', '', '47.36667', '8.55', 'P', 'PPLA', 'CH',
+    '', '25', '112', '261', '', '341730', '', '429', 'Europe/Zurich', '2019-09-05'])
+
+
+class GeocodingMixin(object):
+
+    def setUp(self):
+        super(GeocodingMixin, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.index = os.path.join(self.directory, 'places.idx')
+        build_index(PLACES, self.index)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(GeocodingMixin, self).tearDown()
+
+
+class ReverseGeocoderTestCase(GeocodingMixin, SimpleTestCase):
+
+    def test_haversine(self):
+        self.assertAlmostEqual(haversine(47.3769, 8.5417, 52.5200, 13.4050), 670, delta=5)
+
+    def test_nearest(self):
+        geocoder = ReverseGeocoder(self.index)
+        self.assertEqual(geocoder.count, len(PLACES))
+        name, distance = geocoder.nearest(47.38, 8.54)
+        self.assertEqual(name, 'Zürich, Switzerland')
+        self.assertLess(distance, 1)
+        self.assertEqual(geocoder.nearest(47.49, 8.73)[0], 'Winterthur, Switzerland')
+        self.assertEqual(geocoder.nearest(78, 20)[0], 'Longyearbyen, Svalbard')
+
+    def test_nearest_matches_brute_force(self):
+        geocoder = ReverseGeocoder(self.index)
+        for latitude, longitude in ((0, 0), (47.5, 8.0), (60, 10), (-40, 170),
+                                    (-16, -179.9), (-14, -175), (85, -60)):
+            expected = min(PLACES, key=lambda place: haversine(
+                latitude, longitude, place[1], place[2]))
+            name, distance = geocoder.nearest(latitude, longitude)
+            self.assertEqual(name, expected[0])
+            self.assertAlmostEqual(
+                distance, haversine(latitude, longitude, expected[1], expected[2]),
+                delta=0.01)
+
+    def test_nearest_across_antimeridian(self):
+        geocoder = ReverseGeocoder(self.index)
+        self.assertEqual(geocoder.nearest(-18, -179.9)[0], 'Suva, Fiji')
+        self.assertEqual(geocoder.nearest(-14, 179.9)[0], 'Suva, Fiji')
+        self.assertEqual(geocoder.nearest(-14, -173)[0], 'Apia, Samoa')
+
+    def test_max_distance(self):
+        geocoder = ReverseGeocoder(self.index)
+        self.assertIsNone(geocoder.nearest(0, 0, max_distance=50))
+        self.assertIsNotNone(geocoder.nearest(47.0, 8.5, max_distance=50))
+
+    def test_rejects_other_files(self):
+        path = os.path.join(self.directory, 'other')
+        with open(path, 'wb') as f:
+            f.write(b'0' * 100)
+        with self.assertRaises(ValueError):
+            ReverseGeocoder(path)
+
+    def test_read_places(self):
+        path = os.path.join(self.directory, 'places.txt')
+        with open(path, 'wb') as f:
+            f.write('Bern\t46.948\t7.4474\n'.encode('utf-8'))
+            f.write((GEONAMES_ROW + '\n').encode('utf-8'))
+        countries = os.path.join(self.directory, 'countryInfo.txt')
+        with open(countries, 'wb') as f:
+            f.write(b'#ISO\tISO3\tISO-Numeric\tfips\tCountry\n')
+            f.write(b'CH\tCHE\t756\tSZ\tSwitzerland\n')
+        self.assertEqual(list(read_places(path, countries)), [
+            ('Bern', 46.948, 7.4474),
+            ('Zurich, Switzerland', 47.36667, 8.55),
+        ])
+        self.assertEqual(list(read_places(path, min_population=500000)), [
+            ('Bern', 46.948, 7.4474),
+        ])
+
+    def test_management_command(self):
+        path = os.path.join(self.directory, 'places.txt')
+        with open(path, 'wb') as f:
+            f.write((GEONAMES_ROW + '\n').encode('utf-8'))
+        index = os.path.join(self.directory, 'command.idx')
+        out = StringIO()
+        call_command('build_places_index', path, index, stdout=out)
+        self.assertIn('Wrote 1 places', out.getvalue())
+        self.assertEqual(ReverseGeocoder(index).nearest(47.4, 8.5)[0], 'Zurich, CH')
+
+
+class ReverseGeocodingUsageTestCase(GeocodingMixin, TestCase):
+
+    def setUp(self):
+        super(ReverseGeocodingUsageTestCase, self).setUp()
+        self.settings_override = override_settings(ALDRYN_ACCOUNTS_PLACES_INDEX=self.index)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        super(ReverseGeocodingUsageTestCase, self).tearDown()
+
+    def get_form(self, **data):
+        user = User.objects.create_user('user', 'user@example.com')
+        form_data = {'first_name': 'First', 'last_name': 'Last'}
+        form_data.update(data)
+        return UserSettingsForm(data=form_data, instance=user.settings)
+
+    def test_form_fills_location_name(self):
+        form = self.get_form(location_latitude='47.38', location_longitude='8.54')
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.save().location_name, 'Zürich, Switzerland')
+
+    def test_form_keeps_entered_location_name(self):
+        form = self.get_form(location_name='Zurich Oerlikon',
+                             location_latitude='47.41', location_longitude='8.54')
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.save().location_name, 'Zurich Oerlikon')
+
+    def test_geoip_uses_place_names(self):
+        class FakeGeoIP(object):
+            def record_by_addr(self, ip):
+                return {'city': 'Zurich', 'country': 'CH', 'country_name': 'Switzerland',
+                        'latitude': 47.37, 'longitude': 8.55}
+
+        original = utils._geoip_database
+        utils._geoip_database = FakeGeoIP()
+        try:
+            with override_settings(ALDRYN_ACCOUNTS_USE_GEOIP=True):
+                self.assertEqual(utils.geoip('127.0.0.1')['pretty_name'], 'Zürich, Switzerland')
+                with override_settings(ALDRYN_ACCOUNTS_PLACES_INDEX=None):
+                    self.assertEqual(utils.geoip('127.0.0.1')['pretty_name'], 'Zurich, Switzerland')
+        finally:
+            utils._geoip_database = original
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import threading
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, override_settings
+from django.test.client import RequestFactory
+
+from aldryn_accounts.exceptions import PasswordHashingUnavailable
+from aldryn_accounts.hashing import (
+    PasswordHashingGate, check_password, get_hashing_gate)
+from aldryn_accounts.middleware import PasswordHashingGateMiddleware
+
+
+class PasswordHashingGateTestCase(SimpleTestCase):
+
+    def test_acquire_and_release(self):
+        gate = PasswordHashingGate(size=2, timeout=0.01)
+        with gate:
+            with gate:
+                self.assertEqual(gate.active, 2)
+        self.assertEqual(gate.active, 0)
+        self.assertEqual(gate.get_stats()['acquired'], 2)
+
+    def test_rejects_when_no_slot_is_free(self):
+        gate = PasswordHashingGate(size=1, timeout=0.01)
+        gate.acquire()
+        self.assertRaises(PasswordHashingUnavailable, gate.acquire)
+        gate.release()
+        self.assertEqual(gate.get_stats()['rejected'], 1)
+
+    def test_waiting_caller_gets_released_slot(self):
+        gate = PasswordHashingGate(size=1, timeout=5)
+        gate.acquire()
+        acquired = []
+
+        def wait_for_slot():
+            with gate:
+                acquired.append(True)
+
+        thread = threading.Thread(target=wait_for_slot)
+        thread.start()
+        gate.release()
+        thread.join()
+        self.assertEqual(acquired, [True])
+        self.assertTrue(gate.get_stats()['max_wait_time'] > 0)
+
+    @override_settings(ALDRYN_ACCOUNTS_PASSWORD_HASHING_CONCURRENCY=None)
+    def test_gate_disabled_by_default(self):
+        self.assertIsNone(get_hashing_gate())
+        user = User(username='test')
+        user.set_password('secret')
+        self.assertTrue(check_password(user, 'secret'))
+
+    @override_settings(ALDRYN_ACCOUNTS_PASSWORD_HASHING_CONCURRENCY=1,
+                       ALDRYN_ACCOUNTS_PASSWORD_HASHING_QUEUE_TIMEOUT=0.01)
+    def test_check_password_rejected_when_gate_is_full(self):
+        user = User(username='test')
+        user.set_password('secret')
+        gate = get_hashing_gate()
+        with gate:
+            self.assertRaises(
+                PasswordHashingUnavailable, check_password, user, 'secret')
+        self.assertTrue(check_password(user, 'secret'))
+
+    @override_settings(ALDRYN_ACCOUNTS_PASSWORD_HASHING_REJECT_STATUS=429)
+    def test_middleware_returns_configured_status(self):
+        request = RequestFactory().post('/login/')
+        middleware = PasswordHashingGateMiddleware()
+        response = middleware.process_exception(
+            request, PasswordHashingUnavailable())
+        self.assertEqual(response.status_code, 429)
+        self.assertIsNone(
+            middleware.process_exception(request, ValueError()))
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import io
+import threading
+import time
+
+from django.test import SimpleTestCase, override_settings
+from django.utils.six.moves import BaseHTTPServer, socketserver
+
+import requests
+from PIL import Image
+
+from aldryn_accounts import http_client
+from aldryn_accounts.exceptions import ResponseTooLarge
+
+
+def make_image(size=(300, 300), color='red'):
+    data = io.BytesIO()
+    Image.new('RGB', size, color).save(data, 'PNG')
+    return data.getvalue()
+
+IMAGE = make_image()
+
+
+class StubHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path.startswith('/json'):
+            self.respond(b'{"email": "social@example.com"}', 'application/json')
+        elif self.path.startswith('/image'):
+            self.respond(IMAGE, 'image/png')
+        elif self.path.startswith('/chunked'):
+            # no content length, forces the size check while streaming
+            self.send_response(200)
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for _ in range(10):
+                self.wfile.write(b'3e8\r\n' + b'0' * 1000 + b'\r\n')
+            self.wfile.write(b'0\r\n\r\n')
+        elif self.path.startswith('/trickle'):
+            # a byte at a time, always within the read timeout
+            self.send_response(200)
+            self.send_header('Content-Length', '100')
+            self.end_headers()
+            for _ in range(100):
+                self.wfile.write(b'0')
+                self.wfile.flush()
+                time.sleep(0.05)
+        elif self.path.startswith('/slow'):
+            time.sleep(1)
+            self.respond(b'late', 'text/plain')
+        else:
+            self.respond(b'not found', 'text/plain', status=404)
+
+    def respond(self, body, content_type, status=200):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients hanging up early (e.g. timeouts) are expected
+        pass
+
+
+class StubServerMixin(object):
+
+    @classmethod
+    def setUpClass(cls):
+        super(StubServerMixin, cls).setUpClass()
+        cls.server = StubServer(('127.0.0.1', 0), StubHandler)
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever)
+        cls.server_thread.daemon = True
+        cls.server_thread.start()
+        cls.base_url = 'http://127.0.0.1:{0}'.format(cls.server.server_port)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super(StubServerMixin, cls).tearDownClass()
+
+
+class HttpClientTestCase(StubServerMixin, SimpleTestCase):
+
+    def test_session_is_shared(self):
+        self.assertIs(http_client.get_session(), http_client.get_session())
+
+    def test_get_uses_default_timeouts(self):
+        response = http_client.get(self.base_url + '/json')
+        self.assertEqual(response.json(), {'email': 'social@example.com'})
+        self.assertEqual(http_client.get_timeout(), (3.05, 5))
+
+    def test_download(self):
+        content = http_client.download(self.base_url + '/image')
+        self.assertEqual(content, IMAGE)
+
+    def test_download_rejects_announced_size(self):
+        with self.assertRaises(ResponseTooLarge):
+            http_client.download(self.base_url + '/image', max_size=len(IMAGE) - 1)
+
+    def test_download_rejects_streamed_size(self):
+        with self.assertRaises(ResponseTooLarge):
+            http_client.download(self.base_url + '/chunked', max_size=5000)
+        content = http_client.download(self.base_url + '/chunked', max_size=10000)
+        self.assertEqual(len(content), 10000)
+
+    def test_download_raises_for_errors(self):
+        with self.assertRaises(requests.HTTPError):
+            http_client.download(self.base_url + '/missing')
+
+    @override_settings(ALDRYN_ACCOUNTS_HTTP_READ_TIMEOUT=0.2)
+    def test_read_timeout(self):
+        start = time.time()
+        with self.assertRaises(requests.Timeout):
+            http_client.get(self.base_url + '/slow')
+        self.assertLess(time.time() - start, 1)
+
+    @override_settings(ALDRYN_ACCOUNTS_HTTP_DOWNLOAD_TIMEOUT=0.5, ALDRYN_ACCOUNTS_HTTP_READ_TIMEOUT=1)
+    def test_download_timeout_ends_trickling_reads(self):
+        start = time.time()
+        with self.assertRaises(requests.Timeout):
+            http_client.download(self.base_url + '/trickle')
+        self.assertLess(time.time() - start, 2)
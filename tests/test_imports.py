@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+import aldryn_accounts
+
+
+# imports the modules loaded by every worker and management command in a
+# fresh interpreter and reports the time it took and the loaded modules.
+IMPORT_SCRIPT = '''
+import json
+import sys
+import time
+
+import django
+from django.conf import settings
+
+settings.configure(
+    INSTALLED_APPS=[
+        'django.contrib.auth',
+        'django.contrib.contenttypes',
+        'django.contrib.sites',
+        'aldryn_accounts',
+    ],
+    DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+    ALDRYN_ACCOUNTS_AUTOCONFIGURE=False,
+    ALDRYN_ACCOUNTS_USE_GEOIP=True,
+    GEOIP_PATH='/nonexistent',
+)
+start = time.time()
+if hasattr(django, 'setup'):
+    django.setup()
+import aldryn_accounts.models
+import aldryn_accounts.urls_i18n
+print(json.dumps({
+    'time': time.time() - start,
+    'modules': sorted(sys.modules),
+}))
+'''
+
+# heavy dependencies that must only be imported on first use
+LAZY_MODULES = ('emailit', 'premailer', 'pygeoip', 'social_django', 'easy_thumbnails')
+
+IMPORT_TIME_BUDGET = float(
+    os.environ.get('ALDRYN_ACCOUNTS_IMPORT_TIME_BUDGET', 5))
+
+
+class ImportTimeTestCase(unittest.TestCase):
+
+    def run_import(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(aldryn_accounts.__file__)))
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(
+            [root] + [path for path in sys.path if path])
+        env.pop('DJANGO_SETTINGS_MODULE', None)
+        output = subprocess.check_output(
+            [sys.executable, '-c', IMPORT_SCRIPT], cwd=root, env=env)
+        return json.loads(output.decode('utf-8').splitlines()[-1])
+
+    def test_import_is_lazy_and_fast(self):
+        result = self.run_import()
+        for module in LAZY_MODULES:
+            self.assertNotIn(module, result['modules'])
+        self.assertLess(result['time'], IMPORT_TIME_BUDGET)
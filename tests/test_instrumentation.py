@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import socket
+
+from django.contrib.auth.models import User
+from django.db.models import signals
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from aldryn_accounts import instrumentation
+from aldryn_accounts.auth_backends import EmailBackend
+from aldryn_accounts.models import EmailAddress
+
+
+class RecordingSink(instrumentation.NullSink):
+    enabled = True
+    events = []
+
+    def timing(self, name, milliseconds):
+        self.events.append(('timing', name, milliseconds))
+
+    def incr(self, name, count=1):
+        self.events.append(('incr', name, count))
+
+
+class SinkTestCase(SimpleTestCase):
+
+    def test_disabled_by_default(self):
+        self.assertIsInstance(
+            instrumentation.get_sink(), instrumentation.NullSink)
+        self.assertIs(instrumentation.timer('test'), instrumentation.NULL_TIMER)
+
+    def test_statsd_sink_sends_udp_packets(self):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        listener.bind(('127.0.0.1', 0))
+        listener.settimeout(5)
+        port = listener.getsockname()[1]
+        try:
+            with override_settings(
+                    ALDRYN_ACCOUNTS_INSTRUMENTATION_SINK='aldryn_accounts.instrumentation.StatsdSink',
+                    ALDRYN_ACCOUNTS_INSTRUMENTATION_STATSD_HOST='127.0.0.1',
+                    ALDRYN_ACCOUNTS_INSTRUMENTATION_STATSD_PORT=port):
+                with instrumentation.timer('test.timer'):
+                    pass
+                instrumentation.incr('test.counter', 3)
+            timing = listener.recv(1024).decode('utf-8')
+            counter = listener.recv(1024).decode('utf-8')
+        finally:
+            listener.close()
+        self.assertTrue(timing.startswith('aldryn_accounts.test.timer:'))
+        self.assertTrue(timing.endswith('|ms'))
+        self.assertEqual(counter, 'aldryn_accounts.test.counter:3|c')
+
+
+@override_settings(
+    ALDRYN_ACCOUNTS_INSTRUMENTATION_SINK='tests.test_instrumentation.RecordingSink')
+class EmailBackendInstrumentationTestCase(TestCase):
+
+    def setUp(self):
+        RecordingSink.events = []
+        user = User.objects.create_user('test', 'test@example.com', 'secret')
+        EmailAddress.objects.add_email(user, user.email)
+
+    def test_authenticate_reports_lookup_and_hash_times(self):
+        user = EmailBackend().authenticate('test@example.com', 'secret')
+        self.assertEqual(user.username, 'test')
+        names = [event[1] for event in RecordingSink.events]
+        self.assertEqual(names, [
+            'auth.lookup', 'auth.hash', 'auth.candidates', 'auth.authenticate'])
+        self.assertIn(('incr', 'auth.candidates', 1), RecordingSink.events)
+
+    def test_failed_authenticate_tries_all_candidates(self):
+        self.assertIsNone(EmailBackend().authenticate('test@example.com', 'wrong'))
+        names = [event[1] for event in RecordingSink.events]
+        self.assertEqual(names.count('auth.lookup'), 3)
+        # the email address and the email field of the same user
+        self.assertIn(('incr', 'auth.candidates', 2), RecordingSink.events)
+
+
+@override_settings(
+    ALDRYN_ACCOUNTS_INSTRUMENTATION_SINK='aldryn_accounts.instrumentation.AggregatingSink',
+    ALDRYN_ACCOUNTS_INSTRUMENTATION_RECEIVERS=True)
+class ReceiverInstrumentationTestCase(TestCase):
+
+    def test_receivers_are_scoped_to_users(self):
+        from aldryn_accounts.admin import UserProxy
+        from aldryn_accounts.signals import set_username_if_not_exists
+
+        self.assertTrue(signals.pre_save.has_listeners(User))
+        self.assertTrue(signals.pre_save.has_listeners(UserProxy))
+        receivers = signals.pre_save._live_receivers(EmailAddress)
+        self.assertNotIn(set_username_if_not_exists, receivers)
+
+        user = UserProxy.objects.create(email='proxy@example.com')
+        self.assertTrue(user.username)
+
+    def test_receiver_timings(self):
+        sink = instrumentation.get_sink()
+        for i in range(3):
+            User.objects.create(email='user{0}@example.com'.format(i))
+        EmailAddress.objects.create(user=User.objects.get(email='user0@example.com'), email='user0@example.com')
+        count, total = sink.timings['receiver.set_username_if_not_exists']
+        self.assertEqual(count, 3)
+        self.assertGreater(total, 0)
+
+    @override_settings(ALDRYN_ACCOUNTS_INSTRUMENTATION_RECEIVERS=False)
+    def test_receiver_timings_are_optional(self):
+        User.objects.create(email='user@example.com')
+        self.assertEqual(instrumentation.get_sink().timings, {})
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.core import signing
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.utils import timezone
+
+from aldryn_accounts import utils
+from aldryn_accounts.locale_state import SALT, get_locale_state
+from aldryn_accounts.middleware import GeoIPMiddleware, TimezoneMiddleware
+
+
+COOKIE_NAME = 'aldryn_accounts_locale'
+
+
+class FakeGeoIP(object):
+
+    def record_by_addr(self, ip):
+        return {'city': 'Zurich', 'country': 'CH', 'country_name': 'Switzerland',
+                'latitude': 47.37, 'longitude': 8.55, 'time_zone': 'Europe/Zurich'}
+
+
+class NoSession(object):
+
+    def __getattr__(self, name):
+        raise AssertionError('The session must not be used')
+
+    def __getitem__(self, key):
+        raise AssertionError('The session must not be used')
+
+
+@override_settings(ALDRYN_ACCOUNTS_LOCALE_STATE_STORAGE='cookie',
+                   ALDRYN_ACCOUNTS_USE_GEOIP=True)
+class CookieLocaleStateTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.original_geoip_database = utils._geoip_database
+        utils._geoip_database = FakeGeoIP()
+
+    def tearDown(self):
+        utils._geoip_database = self.original_geoip_database
+        timezone.deactivate()
+
+    def process(self, cookie=None):
+        request = RequestFactory().get('/')
+        request.session = NoSession()
+        if cookie:
+            request.COOKIES[COOKIE_NAME] = cookie
+        middlewares = [GeoIPMiddleware(), TimezoneMiddleware()]
+        for middleware in middlewares:
+            middleware.process_request(request)
+        response = HttpResponse()
+        for middleware in reversed(middlewares):
+            response = middleware.process_response(request, response)
+        return request, response
+
+    def test_state_is_kept_in_signed_cookie(self):
+        request, response = self.process()
+        self.assertEqual(timezone.get_current_timezone_name(), 'Europe/Zurich')
+        cookie = response.cookies[COOKIE_NAME]
+        self.assertTrue(cookie['httponly'])
+        self.assertEqual(signing.loads(cookie.value, salt=SALT), {
+            'tz': 'Europe/Zurich', 'loc': [47.37, 8.55], 'name': 'Zurich, Switzerland'})
+        self.assertEqual(get_locale_state(request).get('geoip')['city'], 'Zurich')
+
+        # unchanged state is not sent again
+        timezone.deactivate()
+        request, response = self.process(cookie.value)
+        self.assertEqual(timezone.get_current_timezone_name(), 'Europe/Zurich')
+        self.assertNotIn(COOKIE_NAME, response.cookies)
+
+    def test_keeps_existing_timezone(self):
+        cookie = signing.dumps({'tz': 'America/New_York'}, salt=SALT)
+        request, response = self.process(cookie)
+        self.assertEqual(timezone.get_current_timezone_name(), 'America/New_York')
+        self.assertEqual(
+            signing.loads(response.cookies[COOKIE_NAME].value, salt=SALT)['tz'],
+            'America/New_York')
+
+    def test_ignores_tampered_cookie(self):
+        cookie = signing.dumps({'tz': 'America/New_York'}, salt=SALT)
+        request, response = self.process(cookie[:-2] + 'xx')
+        self.assertEqual(timezone.get_current_timezone_name(), 'Europe/Zurich')
+
+    def test_invalid_timezone(self):
+        with override_settings(ALDRYN_ACCOUNTS_USE_GEOIP=False):
+            request, response = self.process(signing.dumps({'tz': 'Mars/Olympus'}, salt=SALT))
+        self.assertEqual(
+            signing.loads(response.cookies[COOKIE_NAME].value, salt=SALT)['tz'], 'UTC')
+
+
+class SessionLocaleStateTestCase(SimpleTestCase):
+
+    def test_uses_session_by_default(self):
+        request = RequestFactory().get('/')
+        request.session = {'django_timezone': 'Europe/Berlin'}
+        TimezoneMiddleware().process_request(request)
+        self.assertEqual(timezone.get_current_timezone_name(), 'Europe/Berlin')
+        timezone.deactivate()
+        response = TimezoneMiddleware().process_response(request, HttpResponse())
+        self.assertNotIn(COOKIE_NAME, response.cookies)
+        get_locale_state(request).set('django_timezone', 'UTC')
+        self.assertEqual(request.session['django_timezone'], 'UTC')
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import importlib
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from aldryn_accounts.dataset import generate_dataset
+from aldryn_accounts.geo import (
+    bounding_box, geohash_encode, geohash_prefixes, geohash_ranges, haversine)
+from aldryn_accounts.models import UserSettings
+
+
+PLACES = {
+    'zurich': (47.3769, 8.5417),
+    'winterthur': (47.5001, 8.7502),
+    'basel': (47.5596, 7.5886),
+    'berlin': (52.5200, 13.4050),
+    'suva': (-18.1416, 178.4419),
+    'apia': (-13.8333, -171.7667),
+}
+
+
+class GeohashTestCase(SimpleTestCase):
+
+    def test_encode(self):
+        self.assertEqual(geohash_encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(geohash_encode(42.6, -5.6, 5), 'ezs42')
+
+    def test_prefixes_cover_bounding_box(self):
+        box = bounding_box(47.3769, 8.5417, 25)
+        prefixes = geohash_prefixes(*box)
+        self.assertLessEqual(len(prefixes), 32)
+        for name, (latitude, longitude) in PLACES.items():
+            geohash = geohash_encode(latitude, longitude)
+            covered = any(geohash.startswith(prefix) for prefix in prefixes)
+            self.assertEqual(covered, name in ('zurich', 'winterthur'), name)
+
+    def test_ranges(self):
+        self.assertEqual(geohash_ranges(['u0', 'u1', 'u3', 'uz']),
+                         [('u0', 'u2'), ('u3', 'u4'), ('uz', 'v')])
+        self.assertEqual(geohash_ranges(['zz']), [('zz', None)])
+
+    def test_bounding_box_across_antimeridian(self):
+        south, west, north, east = bounding_box(-16, 179.5, 200)
+        self.assertGreater(west, east)
+        self.assertEqual(bounding_box(89.9, 0, 100)[1:4:2], (-180, 180))
+
+
+class UserSettingsLocationTestCase(TestCase):
+
+    def create_settings(self, name):
+        latitude, longitude = PLACES[name]
+        user = User.objects.create_user(name, '{0}@example.com'.format(name))
+        user_settings = user.settings
+        user_settings.location_latitude = latitude
+        user_settings.location_longitude = longitude
+        user_settings.save()
+        return user_settings
+
+    def test_geohash_maintained_on_save(self):
+        user_settings = self.create_settings('zurich')
+        self.assertEqual(user_settings.location_geohash, geohash_encode(*PLACES['zurich']))
+        user_settings.location_latitude, user_settings.location_longitude = PLACES['basel']
+        user_settings.save(update_fields=['location_latitude', 'location_longitude'])
+        self.assertEqual(UserSettings.objects.get(pk=user_settings.pk).location_geohash,
+                         geohash_encode(*PLACES['basel']))
+        user_settings.location_latitude = None
+        user_settings.save()
+        self.assertEqual(UserSettings.objects.get(pk=user_settings.pk).location_geohash, '')
+
+    def test_near(self):
+        for name in PLACES:
+            self.create_settings(name)
+        with self.assertNumQueries(2):
+            results = UserSettings.objects.near(47.3769, 8.5417, 30)
+            self.assertEqual([s.user.username for s in results], ['zurich', 'winterthur'])
+        self.assertAlmostEqual(results[1].distance, 20.7, delta=0.5)
+        self.assertEqual(len(UserSettings.objects.near(47.3769, 8.5417, 100)), 3)
+        results = UserSettings.objects.near(
+            47.3769, 8.5417, 100, queryset=UserSettings.objects.exclude(user__username='basel'))
+        self.assertEqual([s.user.username for s in results], ['zurich', 'winterthur'])
+
+    def test_near_across_antimeridian(self):
+        for name in PLACES:
+            self.create_settings(name)
+        results = UserSettings.objects.near(-16, 180, 1000)
+        self.assertEqual([s.user.username for s in results], ['suva', 'apia'])
+
+    def test_within_bbox(self):
+        for name in PLACES:
+            self.create_settings(name)
+        self.assertEqual(
+            set(UserSettings.objects.within_bbox(45, 5, 50, 10).values_list(
+                'user__username', flat=True)),
+            set(['zurich', 'winterthur', 'basel']))
+        self.assertEqual(
+            set(UserSettings.objects.within_bbox(-20, 175, -10, -170).values_list(
+                'user__username', flat=True)),
+            set(['suva', 'apia']))
+
+    def test_near_matches_full_scan(self):
+        generate_dataset(300, seed=3)
+        rows = UserSettings.objects.values_list('pk', 'location_latitude', 'location_longitude')
+        for latitude, longitude, radius in ((47.4, 8.5, 40), (40.7, -74.0, 60), (0, 0, 100)):
+            expected = set(
+                pk for pk, place_latitude, place_longitude in rows
+                if haversine(latitude, longitude, place_latitude, place_longitude) <= radius)
+            results = UserSettings.objects.near(latitude, longitude, radius)
+            self.assertEqual(set(s.pk for s in results), expected)
+
+    def test_migration_backfills_geohash(self):
+        user_settings = self.create_settings('berlin')
+        UserSettings.objects.update(location_geohash='')
+        migration = importlib.import_module(
+            'aldryn_accounts.migrations.0003_usersettings_location_geohash')
+
+        class SchemaEditor(object):
+            pass
+
+        schema_editor = SchemaEditor()
+        schema_editor.connection = connection
+        migration.backfill_location_geohash(apps, schema_editor)
+        self.assertEqual(UserSettings.objects.get(pk=user_settings.pk).location_geohash,
+                         geohash_encode(*PLACES['berlin']))
@@ -5,8 +5,11 @@ import datetime
 
 from django.conf import settings
 from django.core import mail
+from django.core.management import call_command
 from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
 from django.utils import timezone
+from django.utils.six import StringIO
 
 from aldryn_accounts.models import (
     SignupCode, SignupCodeResult, EmailAddress, EmailConfirmation,
@@ -15,6 +18,7 @@ from aldryn_accounts.models import (
 from aldryn_accounts.exceptions import (
     EmailAlreadyVerified, VerificationKeyExpired,
 )
+from aldryn_accounts.utils import user_display
 
 from .base import AllAccountsApphooksTestCase
 
@@ -445,3 +449,53 @@ class UserSettingsTestCase(AllAccountsApphooksTestCase):
         )
         new_settings.save()
         self.assertEqual(UserSettings.objects.count(), 1)
+
+
+class UserDisplayTestCase(TestCase):
+
+    def test_follows_field_and_setting_changes(self):
+        user = User(username='user', email='user@example.com')
+        self.assertEqual(user_display(user), 'user@example.com')
+        user.email = ''
+        user.first_name = 'First'
+        self.assertEqual(user_display(user), 'First')
+        self.assertEqual(user_display(user, fallback_to_username=True), 'First')
+        user.first_name = ''
+        self.assertEqual(user_display(user, fallback_to_username=True), 'user')
+        with self.settings(ALDRYN_ACCOUNTS_USER_DISPLAY_FALLBACK_TO_USERNAME=True):
+            self.assertEqual(user_display(user), 'user')
+        with self.settings(ALDRYN_ACCOUNTS_USER_DISPLAY_FALLBACK_TO_USERNAME=False):
+            self.assertEqual(user_display(user), '')
+
+
+@override_settings(ALDRYN_ACCOUNTS_STORE_DISPLAY_NAME=True)
+class DisplayNameTestCase(TestCase):
+
+    def get_display_name(self, user):
+        return UserSettings.objects.get(user=user).display_name
+
+    def test_kept_current_on_save(self):
+        user = User.objects.create_user('user', 'user@example.com', 'secret')
+        self.assertEqual(self.get_display_name(user), 'user@example.com')
+        user.email = ''
+        user.first_name = 'First'
+        user.save()
+        self.assertEqual(self.get_display_name(user), 'First')
+        self.assertEqual(UserSettings.objects.count(), 1)
+
+    def test_other_fields_are_ignored(self):
+        user = User.objects.create_user('user', 'user@example.com', 'secret')
+        with self.assertNumQueries(1):
+            user.save(update_fields=['last_login'])
+
+    def test_command_stores_existing_users(self):
+        with self.settings(ALDRYN_ACCOUNTS_STORE_DISPLAY_NAME=False):
+            first = User.objects.create_user('first', 'first@example.com', 'secret')
+            second = User.objects.create_user('second', 'second@example.com', 'secret')
+            UserSettings.objects.create(user=second, display_name='outdated')
+        call_command('update_display_names', stdout=StringIO())
+        self.assertEqual(self.get_display_name(first), 'first@example.com')
+        self.assertEqual(self.get_display_name(second), 'second@example.com')
+        self.assertEqual(
+            list(User.objects.order_by('-settings__display_name').values_list('username', flat=True)),
+            ['second', 'first'])
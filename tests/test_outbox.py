@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import datetime
+import logging
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.utils.six import StringIO
+
+from aldryn_accounts import outbox
+from aldryn_accounts.models import EmailAddress, OutboxEvent
+from aldryn_accounts.signals import email_confirmed, password_changed, user_signed_up
+
+
+delivered = []
+
+
+def consumer(events):
+    delivered.extend((event.event, event.user_pk) for event in events)
+
+
+class FailingConsumer(object):
+
+    def __init__(self, user_pk):
+        self.user_pk = user_pk
+
+    def __call__(self, events):
+        if events[0].user_pk == self.user_pk:
+            raise ValueError('unavailable')
+        consumer(events)
+
+
+@override_settings(ALDRYN_ACCOUNTS_USE_OUTBOX=True,
+                   ALDRYN_ACCOUNTS_OUTBOX_CONSUMERS=['tests.test_outbox.consumer'])
+class OutboxTestCase(TestCase):
+
+    def setUp(self):
+        del delivered[:]
+        # failed deliveries are logged
+        logging.disable(logging.ERROR)
+        self.alice = User.objects.create_user('alice', 'alice@example.com')
+        self.bob = User.objects.create_user('bob', 'bob@example.com')
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_signals_are_recorded(self):
+        user_signed_up.send(sender=None, user=self.alice, form=None)
+        email_address = EmailAddress.objects.add_email(self.alice, 'alice@example.com')
+        email_confirmed.send(sender=EmailAddress, email_address=email_address)
+        events = list(OutboxEvent.objects.all())
+        self.assertEqual([event.event for event in events], ['user_signed_up', 'email_confirmed'])
+        self.assertEqual(events[0].user_pk, self.alice.pk)
+        self.assertEqual(events[1].data, {
+            'email_address': email_address.pk,
+            'email': 'alice@example.com',
+            'user': self.alice.pk,
+        })
+
+    @override_settings(ALDRYN_ACCOUNTS_USE_OUTBOX=False)
+    def test_disabled(self):
+        user_signed_up.send(sender=None, user=self.alice, form=None)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_events_are_part_of_the_transaction(self):
+        try:
+            with transaction.atomic():
+                password_changed.send(sender=None, user=self.alice)
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_deliver_in_order(self):
+        outbox.record('first', self.alice.pk)
+        outbox.record('second', self.bob.pk)
+        outbox.record('third', self.alice.pk)
+        self.assertEqual(outbox.deliver(), (3, 0))
+        self.assertEqual(delivered, [
+            ('first', self.alice.pk), ('third', self.alice.pk), ('second', self.bob.pk)])
+        self.assertFalse(OutboxEvent.objects.filter(delivered_at=None).exists())
+        self.assertEqual(outbox.deliver(), (0, 0))
+
+    def test_failure_holds_back_later_events_of_the_user(self):
+        first = outbox.record('first', self.alice.pk)
+        outbox.record('second', self.bob.pk)
+        outbox.record('third', self.alice.pk)
+        self.assertEqual(outbox.deliver(consumers=[FailingConsumer(self.alice.pk)]), (1, 1))
+        self.assertEqual(delivered, [('second', self.bob.pk)])
+        first = OutboxEvent.objects.get(pk=first.pk)
+        self.assertEqual(first.attempts, 1)
+        self.assertEqual(first.last_error, 'ValueError: unavailable')
+
+        # waiting for the retry delay, the later event waits too
+        outbox.record('fourth', self.alice.pk)
+        self.assertEqual(outbox.deliver(), (0, 0))
+
+        OutboxEvent.objects.filter(pk=first.pk).update(available_at=timezone.now())
+        self.assertEqual(outbox.deliver(), (3, 0))
+        self.assertEqual(delivered[1:], [
+            ('first', self.alice.pk), ('third', self.alice.pk), ('fourth', self.alice.pk)])
+
+    @override_settings(ALDRYN_ACCOUNTS_OUTBOX_MAX_ATTEMPTS=1)
+    def test_events_out_of_attempts_are_skipped(self):
+        outbox.record('first', self.alice.pk)
+        outbox.record('second', self.alice.pk)
+        outbox.deliver(consumers=[FailingConsumer(self.alice.pk)])
+        self.assertEqual(outbox.deliver(), (1, 0))
+        self.assertEqual(delivered, [('second', self.alice.pk)])
+
+    def test_command(self):
+        for i in range(5):
+            outbox.record('event', self.alice.pk)
+        OutboxEvent.objects.filter(pk=outbox.record('old', self.bob.pk).pk).update(
+            delivered_at=timezone.now() - datetime.timedelta(days=10))
+        out = StringIO()
+        call_command('deliver_outbox_events', batch_size=2, purge_days=7, stdout=out)
+        self.assertEqual(out.getvalue(), 'Purged 1 delivered events.\nDelivered 5 events, 0 failed deliveries.\n')
+        self.assertEqual(len(delivered), 5)
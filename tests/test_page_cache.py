@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.urlresolvers import clear_url_caches
+from django.test import TestCase, override_settings
+from django.utils.http import http_date
+
+from aldryn_accounts.view_mixins import AnonymousPageCacheMixin, CSRF_TOKEN_PLACEHOLDER
+
+
+@override_settings(
+    ROOT_URLCONF='tests.benchmark_urls',
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    ALDRYN_ACCOUNTS_CACHE_ANONYMOUS_PAGES=True,
+)
+class AnonymousPageCacheTestCase(TestCase):
+    login_url = '/accounts/login/'
+    signup_url = '/accounts/signup/'
+
+    def setUp(self):
+        clear_url_caches()
+        caches['default'].clear()
+        self.renders = 0
+        original = AnonymousPageCacheMixin.get_context_data
+
+        def get_context_data(view, **kwargs):
+            self.renders += 1
+            return original(view, **kwargs)
+
+        AnonymousPageCacheMixin.get_context_data = get_context_data
+        self.addCleanup(setattr, AnonymousPageCacheMixin, 'get_context_data', original)
+
+    def test_pages_are_rendered_once(self):
+        for url in (self.login_url, self.signup_url):
+            first = self.client.get(url)
+            second = self.client.get(url)
+            self.assertEqual(first.status_code, 200)
+            self.assertEqual(first.content, second.content)
+            self.assertIn('Cookie', second['Vary'])
+            self.assertIn('private', second['Cache-Control'])
+        self.assertEqual(self.renders, 2)
+
+    def test_csrf_token_per_visitor(self):
+        response = self.client.get(self.login_url)
+        token = response.cookies['csrftoken'].value
+        self.assertContains(response, "value='{0}'".format(token))
+        self.assertNotContains(response, CSRF_TOKEN_PLACEHOLDER)
+
+        self.client.cookies['csrftoken'] = 'a' * 32
+        self.assertContains(self.client.get(self.login_url), "value='{0}'".format('a' * 32))
+        self.assertEqual(self.renders, 1)
+
+    def test_login_with_cached_page(self):
+        User.objects.create_user('user', 'user@example.com', 'secret')
+        self.client = self.client_class(enforce_csrf_checks=True)
+        self.client.get(self.login_url)
+        response = self.client.post(self.login_url, {
+            'username': 'user@example.com', 'password': 'secret',
+            'csrfmiddlewaretoken': self.client.cookies['csrftoken'].value})
+        self.assertEqual(response.status_code, 302)
+
+    def test_conditional_requests(self):
+        response = self.client.get(self.login_url)
+        self.assertEqual(self.client.get(
+            self.login_url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(
+            self.login_url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        self.client.cookies['csrftoken'] = 'b' * 32
+        # the cached copy of the browser has another token
+        self.assertEqual(self.client.get(
+            self.login_url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+        self.assertEqual(self.client.get(
+            self.login_url, HTTP_IF_MODIFIED_SINCE=http_date(0)).status_code, 200)
+
+    def test_conditional_requests_with_etag_lists(self):
+        etag = self.client.get(self.login_url)['ETag']
+        for if_none_match in ('"other", {0}'.format(etag), 'W/{0}'.format(etag), '*'):
+            self.assertEqual(self.client.get(
+                self.login_url, HTTP_IF_NONE_MATCH=if_none_match).status_code, 304)
+        self.assertEqual(self.client.get(self.login_url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_no_session_is_started(self):
+        response = self.client.get(self.login_url)
+        self.assertNotIn('sessionid', response.cookies)
+
+    def test_redirect_parameter_is_part_of_the_key(self):
+        self.assertContains(self.client.get(self.login_url + '?next=/one/'), 'next=%2Fone%2F')
+        self.assertContains(self.client.get(self.login_url + '?next=/two/'), 'next=%2Ftwo%2F')
+        self.assertEqual(self.renders, 2)
+
+    def test_not_cached(self):
+        self.client.get(self.signup_url + '?code=abc')
+        self.client.get(self.signup_url + '?code=abc')
+        self.assertEqual(self.renders, 2)
+
+        with override_settings(ALDRYN_ACCOUNTS_CACHE_ANONYMOUS_PAGES=False):
+            self.client.get(self.login_url)
+            self.client.get(self.login_url)
+        self.assertEqual(self.renders, 4)
+
+        User.objects.create_user('user', 'user@example.com', 'secret')
+        self.client.login(username='user', password='secret')
+        self.client.get(self.login_url)
+        self.assertEqual(self.renders, 5)
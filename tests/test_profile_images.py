@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils.six import StringIO
+
+from aldryn_accounts.models import UserSettings
+
+from .test_http_client import IMAGE, make_image
+
+
+class ProfileImageMixin(object):
+
+    def create_settings(self, username, content=IMAGE):
+        user = User.objects.create_user(username, '{0}@example.com'.format(username))
+        user_settings = user.settings
+        user_settings.profile_image = ContentFile(content, name='avatar.PNG')
+        user_settings.save()
+        return user_settings
+
+
+class ContentAddressedTestCase(ProfileImageMixin, TestCase):
+
+    def test_uuid_names_by_default(self):
+        first = self.create_settings('first')
+        second = self.create_settings('second')
+        self.assertNotEqual(first.profile_image.name, second.profile_image.name)
+
+    @override_settings(ALDRYN_ACCOUNTS_PROFILE_IMAGE_CONTENT_ADDRESSED=True)
+    def test_same_content_is_stored_once(self):
+        digest = hashlib.sha256(IMAGE).hexdigest()
+        first = self.create_settings('first')
+        second = self.create_settings('second')
+        self.assertEqual(
+            first.profile_image.name,
+            'profile-data/{0}/{1}.png'.format(digest[:2], digest))
+        self.assertEqual(first.profile_image.name, second.profile_image.name)
+        self.assertEqual(
+            UserSettings.objects.get(pk=second.pk).profile_image.read(), IMAGE)
+
+    @override_settings(ALDRYN_ACCOUNTS_PROFILE_IMAGE_CONTENT_ADDRESSED=True)
+    def test_different_content_different_names(self):
+        first = self.create_settings('first')
+        second = self.create_settings('second', make_image(color='blue'))
+        self.assertNotEqual(first.profile_image.name, second.profile_image.name)
+
+
+class DedupeCommandTestCase(ProfileImageMixin, TestCase):
+
+    def test_dedupes_existing_images(self):
+        first = self.create_settings('first')
+        second = self.create_settings('second')
+        other = self.create_settings('other', make_image(color='blue'))
+        old_names = [s.profile_image.name for s in (first, second, other)]
+        storage = first.profile_image.storage
+
+        out = StringIO()
+        call_command('dedupe_profile_images', delete=True, thumbnails=False, stdout=out)
+
+        names = dict(UserSettings.objects.values_list('pk', 'profile_image'))
+        self.assertEqual(names[first.pk], names[second.pk])
+        self.assertNotEqual(names[first.pk], names[other.pk])
+        digest = hashlib.sha256(IMAGE).hexdigest()
+        self.assertTrue(names[first.pk].endswith('{0}.png'.format(digest)))
+        self.assertTrue(storage.exists(names[first.pk]))
+        for name in old_names:
+            self.assertFalse(storage.exists(name))
+        self.assertIn('3 images map to 2 distinct files', out.getvalue())
+
+    def test_dry_run_changes_nothing(self):
+        first = self.create_settings('first')
+        call_command('dedupe_profile_images', dry_run=True, stdout=StringIO())
+        self.assertEqual(
+            UserSettings.objects.get(pk=first.pk).profile_image.name,
+            first.profile_image.name)
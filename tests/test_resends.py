@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import caches
+from django.core.urlresolvers import clear_url_caches
+from django.test import TestCase, override_settings
+
+from cms.utils.permissions import set_current_user
+
+from aldryn_accounts import models
+from aldryn_accounts.models import EmailConfirmation
+
+
+@override_settings(
+    ROOT_URLCONF='tests.benchmark_urls',
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class ConfirmationResendTestCase(TestCase):
+    resend_url = '/accounts/signup/email/resend-confirmation/'
+
+    def setUp(self):
+        clear_url_caches()
+        caches['default'].clear()
+        self.addCleanup(set_current_user, None)
+        self.user = User.objects.create_user('user', 'user@example.com', 'secret')
+        self.confirmation = EmailConfirmation.objects.request(self.user, 'second@example.com')
+        mail.outbox = []
+
+    def test_resends_are_coalesced(self):
+        self.assertEqual(EmailConfirmation.objects.resend('second@example.com'), 1)
+        with self.assertNumQueries(0):
+            self.assertIsNone(EmailConfirmation.objects.resend('Second@example.com'))
+            self.assertFalse(self.confirmation.resend())
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_failed_send_can_be_retried(self):
+        def fail(**kwargs):
+            raise IOError('smtp down')
+        self.confirmation.send = fail
+        self.assertRaises(IOError, self.confirmation.resend)
+        self.assertFalse(models.confirmation_resent_recently('second@example.com'))
+        del self.confirmation.send
+        self.assertTrue(self.confirmation.resend())
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_failed_manager_send_can_be_retried(self):
+        self.addCleanup(setattr, EmailConfirmation, 'send', EmailConfirmation.send)
+
+        def fail(self, **kwargs):
+            raise IOError('smtp down')
+        EmailConfirmation.send = fail
+        self.assertRaises(IOError, EmailConfirmation.objects.resend, 'second@example.com')
+        self.assertFalse(models.confirmation_resent_recently('second@example.com'))
+
+    def test_addresses_without_confirmations_are_not_claimed(self):
+        for i in range(2):
+            self.assertEqual(EmailConfirmation.objects.resend('unknown@example.com'), 0)
+        self.assertFalse(models.confirmation_resent_recently('unknown@example.com'))
+
+    @override_settings(ALDRYN_ACCOUNTS_CONFIRMATION_RESEND_WINDOW=0)
+    def test_window_can_be_disabled(self):
+        EmailConfirmation.objects.resend('second@example.com')
+        self.assertTrue(self.confirmation.resend())
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_resend_view(self):
+        for i in range(3):
+            response = self.client.post(self.resend_url, {'email': 'second@example.com'})
+            self.assertEqual(response.status_code, 302)
+            self.assertIn('/accounts/signup/email/confirmation-sent/', response['Location'])
+        self.assertEqual(len(mail.outbox), 1)
+        # just the url revision check of the cms middleware
+        with self.assertNumQueries(1):
+            self.client.post(self.resend_url, {'email': 'second@example.com'})
+
+    def test_resend_view_without_confirmations(self):
+        # the same answer for every post, nothing is coalesced
+        for i in range(2):
+            response = self.client.post(self.resend_url, {'email': 'unknown@example.com'})
+            self.assertEqual(response.status_code, 302)
+            self.assertIn('/accounts/signup/', response['Location'])
+            self.assertNotIn('confirmation-sent', response['Location'])
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_profile_resend_view(self):
+        self.client.login(username='user', password='secret')
+        url = '/accounts/profile/email/confirmation/{0}/re-send/'.format(self.confirmation.pk)
+        for i in range(2):
+            self.assertEqual(self.client.post(url).status_code, 302)
+        self.assertEqual(len(mail.outbox), 1)
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import time
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from aldryn_accounts import routers
+from aldryn_accounts.middleware import ReplicaPinningMiddleware
+from aldryn_accounts.models import EmailConfirmation
+
+
+@override_settings(ALDRYN_ACCOUNTS_DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTestCase(TestCase):
+    router = routers.ReplicaRouter()
+
+    def setUp(self):
+        routers.reset()
+
+    def tearDown(self):
+        routers.reset()
+
+    def test_reads_go_to_replicas(self):
+        self.assertEqual(self.router.db_for_read(EmailConfirmation), 'replica')
+        self.assertEqual(self.router.db_for_read(User), 'replica')
+        self.assertEqual(self.router.db_for_write(EmailConfirmation), 'default')
+        self.assertIsNone(self.router.db_for_read(Session))
+
+    @override_settings(ALDRYN_ACCOUNTS_DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        self.assertEqual(self.router.db_for_read(EmailConfirmation), 'default')
+
+    def test_use_primary(self):
+        with routers.use_primary():
+            with routers.use_primary():
+                self.assertEqual(self.router.db_for_read(User), 'default')
+            self.assertEqual(self.router.db_for_read(User), 'default')
+        self.assertEqual(self.router.db_for_read(User), 'replica')
+
+    def test_writes_pin_reads(self):
+        self.assertEqual(self.router.db_for_write(EmailConfirmation), 'default')
+        self.assertTrue(routers.was_written())
+        self.assertEqual(self.router.db_for_read(EmailConfirmation), 'default')
+
+    def test_migrations_skip_replicas(self):
+        self.assertFalse(self.router.allow_migrate('replica', 'aldryn_accounts'))
+        self.assertIsNone(self.router.allow_migrate('default', 'aldryn_accounts'))
+
+
+@override_settings(ALDRYN_ACCOUNTS_DATABASE_REPLICAS=['replica'])
+class ReplicaPinningMiddlewareTestCase(TestCase):
+    factory = RequestFactory()
+    router = routers.ReplicaRouter()
+
+    def tearDown(self):
+        routers.reset()
+
+    def process(self, request, write=False):
+        middleware = ReplicaPinningMiddleware()
+        middleware.process_request(request)
+        database = self.router.db_for_read(User)
+        if write:
+            self.router.db_for_write(User)
+        response = middleware.process_response(request, HttpResponse())
+        self.assertEqual(self.router.db_for_read(User), 'replica')
+        return database, response
+
+    def test_safe_requests_read_from_replicas(self):
+        database, response = self.process(self.factory.get('/'))
+        self.assertEqual(database, 'replica')
+        self.assertNotIn('aldryn_accounts_primary', response.cookies)
+
+    def test_unsafe_requests_read_from_primary(self):
+        database, response = self.process(self.factory.post('/'))
+        self.assertEqual(database, 'default')
+
+    def test_reads_stick_to_primary_after_write(self):
+        response = self.process(self.factory.post('/'), write=True)[1]
+        cookie = response.cookies['aldryn_accounts_primary']
+        self.assertEqual(cookie['max-age'], 15)
+
+        request = self.factory.get('/')
+        request.COOKIES['aldryn_accounts_primary'] = cookie.value
+        self.assertEqual(self.process(request)[0], 'default')
+
+        with override_settings(ALDRYN_ACCOUNTS_REPLICA_PIN_SECONDS=0):
+            time.sleep(1)
+            self.assertEqual(self.process(request)[0], 'replica')
+
+    def test_tampered_cookie_is_ignored(self):
+        request = self.factory.get('/')
+        request.COOKIES['aldryn_accounts_primary'] = '1'
+        self.assertEqual(self.process(request)[0], 'replica')
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import caches
+from django.db import transaction
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.utils import translation
+
+from easy_thumbnails.files import get_thumbnailer
+
+from aldryn_accounts import tasks
+from aldryn_accounts.models import EmailConfirmation
+from aldryn_accounts.social_auth_pipelines import set_profile_image
+from aldryn_accounts.thumbnails import get_thumbnail_options, get_thumbnail_url
+
+from .test_http_client import StubServerMixin
+
+
+calls = []
+
+
+def record(*args, **kwargs):
+    calls.append((args, kwargs))
+
+
+class FakeBackend(object):
+
+    def __init__(self, name):
+        self.name = name
+
+
+class ThreadRunnerTestCase(SimpleTestCase):
+
+    def test_runs_jobs_in_worker_threads(self):
+        del calls[:]
+        runner = tasks.ThreadRunner(workers=1)
+        runner(record, 1, key='value')
+        runner(record, 2)
+        runner.join()
+        self.assertEqual(calls, [((1,), {'key': 'value'}), ((2,), {})])
+
+    def test_failing_job_does_not_stop_worker(self):
+        del calls[:]
+        runner = tasks.ThreadRunner(workers=1)
+        runner(int, 'not a number')
+        runner(record, 3)
+        runner.join()
+        self.assertEqual(calls, [((3,), {})])
+
+
+@override_settings(ALDRYN_ACCOUNTS_TASK_RUNNER='aldryn_accounts.tasks.run_sync')
+class EnqueueTestCase(TransactionTestCase):
+
+    def test_runs_after_commit(self):
+        del calls[:]
+        with transaction.atomic():
+            tasks.enqueue(record, 'job')
+            self.assertEqual(calls, [])
+        self.assertEqual(calls, [(('job',), {})])
+
+    def test_dropped_on_rollback(self):
+        del calls[:]
+        try:
+            with transaction.atomic():
+                tasks.enqueue(record, 'job')
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertEqual(calls, [])
+
+
+@override_settings(ALDRYN_ACCOUNTS_TASK_RUNNER='aldryn_accounts.tasks.run_sync')
+class ProfileImageTestCase(StubServerMixin, TransactionTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('social', 'social@example.com')
+
+    def get_profile_image(self):
+        return User.objects.get(pk=self.user.pk).settings.profile_image
+
+    def test_set_profile_image_fetches_image_and_thumbnails(self):
+        set_profile_image(
+            FakeBackend('twitter'), self.user,
+            {'profile_image_url': self.base_url + '/image'}, is_new=True)
+        image = self.get_profile_image()
+        self.assertTrue(image)
+        thumbnail = get_thumbnailer(image).get_existing_thumbnail(
+            get_thumbnail_options('profile'))
+        self.assertIsNotNone(thumbnail)
+        self.assertEqual(get_thumbnail_url(image, 'profile'), thumbnail.url)
+
+    @override_settings(ALDRYN_ACCOUNTS_HTTP_MAX_DOWNLOAD_SIZE=100)
+    def test_set_profile_image_skips_large_images(self):
+        set_profile_image(
+            FakeBackend('twitter'), self.user,
+            {'profile_image_url': self.base_url + '/image'}, is_new=True)
+        self.assertFalse(self.get_profile_image())
+
+    def test_set_profile_image_skips_failed_downloads(self):
+        set_profile_image(
+            FakeBackend('twitter'), self.user,
+            {'profile_image_url': self.base_url + '/missing'}, is_new=True)
+        self.assertFalse(self.get_profile_image())
+
+    def test_set_profile_image_does_not_wait_for_download(self):
+        del calls[:]
+        with override_settings(ALDRYN_ACCOUNTS_TASK_RUNNER='tests.test_tasks.record'):
+            set_profile_image(
+                FakeBackend('twitter'), self.user,
+                {'profile_image_url': self.base_url + '/image'}, is_new=True)
+        self.assertEqual(len(calls), 1)
+        self.assertFalse(self.get_profile_image())
+
+    def test_url_without_thumbnail_falls_back_to_image(self):
+        tasks.fetch_profile_image(self.user.pk, self.base_url + '/image', 'image.png')
+        image = self.get_profile_image()
+        with override_settings(ALDRYN_ACCOUNTS_PROFILE_IMAGE_THUMBNAILS={
+                'small': {'size': (20, 20), 'crop': True}}):
+            self.assertEqual(get_thumbnail_url(image, 'small'), image.url)
+        self.assertEqual(get_thumbnail_url('', 'profile'), '')
+
+    @override_settings(
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        ALDRYN_ACCOUNTS_PROFILE_IMAGE_THUMBNAILS={'small': {'size': (20, 20), 'crop': True}})
+    def test_missing_thumbnail_is_generated_in_background(self):
+        caches['default'].clear()
+        with override_settings(ALDRYN_ACCOUNTS_PROFILE_IMAGE_THUMBNAILS={}):
+            tasks.fetch_profile_image(self.user.pk, self.base_url + '/image', 'image.png')
+        image = self.get_profile_image()
+        del calls[:]
+        with override_settings(ALDRYN_ACCOUNTS_TASK_RUNNER='tests.test_tasks.record'):
+            for i in range(2):
+                self.assertEqual(get_thumbnail_url(image, 'small'), image.url)
+        self.assertEqual(calls, [((tasks.generate_profile_image_thumbnails, image.instance.pk), {})])
+        tasks.generate_profile_image_thumbnails(image.instance.pk)
+        self.assertNotEqual(get_thumbnail_url(image, 'small'), image.url)
+
+
+@override_settings(ROOT_URLCONF='tests.benchmark_urls',
+                   ALDRYN_ACCOUNTS_TASK_RUNNER='aldryn_accounts.tasks.run_sync',
+                   ALDRYN_ACCOUNTS_SEND_EMAILS_IN_BACKGROUND=True)
+class BackgroundEmailTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('user', 'user@example.com')
+        mail.outbox = []
+
+    def test_confirmation_is_sent_after_commit(self):
+        with transaction.atomic():
+            confirmation = EmailConfirmation.objects.request(
+                self.user, 'second@example.com', send=True)
+            self.assertEqual(mail.outbox, [])
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['second@example.com'])
+        self.assertIsNotNone(EmailConfirmation.objects.get(pk=confirmation.pk).sent_at)
+
+    def test_job_gets_ids_and_language(self):
+        del calls[:]
+        confirmation = EmailConfirmation.objects.request(self.user, 'second@example.com')
+        with override_settings(ALDRYN_ACCOUNTS_TASK_RUNNER='tests.test_tasks.record'):
+            with translation.override('de'):
+                confirmation.send()
+        self.assertEqual(calls, [(
+            (tasks.send_email_verification, confirmation.pk),
+            {'site_id': None, 'language': 'de'})])
+        self.assertEqual(mail.outbox, [])
+
+    def test_deleted_confirmation_is_skipped(self):
+        confirmation = EmailConfirmation.objects.request(self.user, 'second@example.com')
+        pk = confirmation.pk
+        confirmation.delete()
+        tasks.send_email_verification(pk)
+        self.assertEqual(mail.outbox, [])
+
+    def test_password_changed_job(self):
+        tasks.send_password_changed(self.user.pk, 'aldryn_accounts/email/change_password')
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['user@example.com'])
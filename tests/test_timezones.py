@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.contrib.auth.models import User
+from django.core.urlresolvers import clear_url_caches
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+import pytz
+
+from aldryn_accounts import timezones, utils
+from aldryn_accounts.locale_state import get_locale_state
+from aldryn_accounts.middleware import GeoIPMiddleware, TimezoneMiddleware
+from aldryn_accounts.signals import set_user_timezone_on_login
+from aldryn_accounts.timezones import is_valid_timezone
+
+
+@override_settings(ROOT_URLCONF='tests.benchmark_urls',
+                   SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+class BrowserTimezoneTestCase(TestCase):
+    url = '/accounts/timezone/'
+
+    def setUp(self):
+        clear_url_caches()
+
+    def test_is_valid_timezone(self):
+        self.assertTrue(is_valid_timezone('Europe/Zurich'))
+        self.assertTrue(is_valid_timezone('UTC'))
+        self.assertFalse(is_valid_timezone('Mars/Olympus'))
+        self.assertFalse(is_valid_timezone(''))
+
+    def test_stores_timezone_for_anonymous_visitors(self):
+        response = self.client.post(self.url, {'timezone': 'America/New_York'})
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.session['django_timezone'], 'America/New_York')
+
+    def test_rejects_unknown_timezones(self):
+        response = self.client.post(self.url, {'timezone': 'Mars/Olympus'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
+    @override_settings(ALDRYN_ACCOUNTS_LOCALE_STATE_STORAGE='cookie')
+    def test_stores_timezone_in_cookie(self):
+        response = self.client.post(self.url, {'timezone': 'America/New_York'})
+        self.assertEqual(response.status_code, 204)
+        self.assertIn('aldryn_accounts_locale', response.cookies)
+
+    def test_sets_user_timezone_if_missing(self):
+        user = User.objects.create_user('user', 'user@example.com', 'password')
+        self.client.login(username='user', password='password')
+        self.client.post(self.url, {'timezone': 'America/New_York'})
+        self.assertEqual(User.objects.get(pk=user.pk).settings.timezone,
+                         pytz.timezone('America/New_York'))
+        self.client.post(self.url, {'timezone': 'Europe/Zurich'})
+        self.assertEqual(User.objects.get(pk=user.pk).settings.timezone,
+                         pytz.timezone('America/New_York'))
+        self.assertEqual(self.client.session['django_timezone'], 'Europe/Zurich')
+
+    def test_template_include(self):
+        request = RequestFactory().get('/')
+        html = Template(
+            '{% include "aldryn_accounts/inc/browser_timezone.html" %}'
+        ).render(Context({'csrf_token': 'token', 'request': request}))
+        self.assertIn("request.open('POST', '/accounts/timezone/')", html)
+        self.assertIn("'X-CSRFToken', 'token'", html)
+
+
+class GeoIPTimezoneTestCase(TestCase):
+
+    class FakeGeoIP(object):
+        def record_by_addr(self, ip):
+            return {'country': 'CH', 'country_name': 'Switzerland', 'time_zone': 'Europe/Zurich'}
+
+    def process(self):
+        request = RequestFactory().get('/')
+        request.session = {}
+        original = utils._geoip_database
+        utils._geoip_database = self.FakeGeoIP()
+        try:
+            GeoIPMiddleware().process_request(request)
+        finally:
+            utils._geoip_database = original
+        return get_locale_state(request).get('django_timezone')
+
+    @override_settings(ALDRYN_ACCOUNTS_USE_GEOIP=True)
+    def test_geoip_sets_timezone(self):
+        self.assertEqual(self.process(), 'Europe/Zurich')
+
+    @override_settings(ALDRYN_ACCOUNTS_USE_GEOIP=True, ALDRYN_ACCOUNTS_USE_GEOIP_TIMEZONE=False)
+    def test_geoip_timezone_can_be_disabled(self):
+        self.assertIsNone(self.process())
+
+
+class CountingSession(dict):
+    modified = False
+
+    def __setitem__(self, key, value):
+        self.modified = True
+        super(CountingSession, self).__setitem__(key, value)
+
+
+class TimezoneCacheTestCase(TestCase):
+
+    def setUp(self):
+        timezones._timezones.clear()
+
+    def tearDown(self):
+        timezone.deactivate()
+
+    def process(self, session):
+        request = RequestFactory().get('/')
+        request.session = session
+        TimezoneMiddleware().process_request(request)
+        return request
+
+    def test_resolves_each_name_once(self):
+        calls = []
+        original = pytz.timezone
+
+        def resolve(name):
+            calls.append(name)
+            return original(name)
+
+        pytz.timezone = resolve
+        try:
+            for _ in range(3):
+                self.assertEqual(timezones.get_timezone('Europe/Zurich').zone, 'Europe/Zurich')
+                self.assertIsNone(timezones.get_timezone('Mars/Olympus'))
+        finally:
+            pytz.timezone = original
+        self.assertEqual(calls, ['Europe/Zurich', 'Mars/Olympus'])
+
+    def test_middleware_does_not_write_unchanged_session(self):
+        session = CountingSession(django_timezone='Europe/Zurich')
+        self.process(session)
+        self.assertEqual(timezone.get_current_timezone_name(), 'Europe/Zurich')
+        self.assertFalse(session.modified)
+
+    def test_middleware_replaces_unknown_timezone(self):
+        session = CountingSession(django_timezone='Mars/Olympus')
+        self.process(session)
+        self.assertEqual(session['django_timezone'], 'UTC')
+        self.assertEqual(timezone.get_current_timezone_name(), 'UTC')
+
+    def test_middleware_resets_timezone_of_previous_request(self):
+        self.process(CountingSession(django_timezone='Europe/Zurich'))
+        self.process(CountingSession())
+        self.assertEqual(timezone.get_current_timezone_name(), 'UTC')
+
+    def test_geoip_location_does_not_modify_session(self):
+        request = RequestFactory().get('/')
+        request.session = CountingSession(
+            geoip={}, django_location=[None, None], django_location_name=None)
+        GeoIPMiddleware().process_request(request)
+        self.assertFalse(request.session.modified)
+
+    def test_login_activates_user_timezone(self):
+        user = User.objects.create_user('user', 'user@example.com')
+        user_settings = user.settings
+        user_settings.timezone = pytz.timezone('Asia/Tokyo')
+        user_settings.save()
+        request = RequestFactory().get('/')
+        request.session = CountingSession()
+        set_user_timezone_on_login(sender=User, user=user, request=request)
+        self.assertEqual(request.session['django_timezone'], 'Asia/Tokyo')
+        self.assertEqual(timezone.get_current_timezone_name(), 'Asia/Tokyo')
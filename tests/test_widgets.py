@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django import forms
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import translation
+
+import pytz
+
+from aldryn_accounts.forms import UserSettingsForm
+from aldryn_accounts.widgets import CachedSelect
+
+
+CHOICES = [('', '---------')] + [(tz, tz) for tz in pytz.common_timezones]
+
+
+class CachedSelectTestCase(TestCase):
+
+    def setUp(self):
+        CachedSelect.clear_cache()
+
+    def render_both(self, value, attrs=None):
+        cached = CachedSelect(choices=CHOICES, cache_key='test')
+        plain = forms.Select(choices=CHOICES)
+        return (cached.render('timezone', value, attrs),
+                plain.render('timezone', value, attrs))
+
+    def test_renders_like_select(self):
+        for value in ('', None, 'Europe/Zurich', pytz.timezone('UTC'),
+                      'Unknown/Zone', CHOICES[-1][0]):
+            cached, plain = self.render_both(value, {'id': 'id_timezone'})
+            self.assertEqual(cached, plain)
+
+    def test_options_are_rendered_once_per_language(self):
+        self.render_both('Europe/Zurich')
+        self.render_both('UTC')
+        self.assertEqual(len(CachedSelect._cache), 1)
+        with translation.override('de'):
+            self.render_both('UTC')
+        self.assertEqual(len(CachedSelect._cache), 2)
+
+    def test_selected_marker_does_not_leak(self):
+        cached, _ = self.render_both('Europe/Zurich')
+        self.assertEqual(cached.count('selected="selected"'), 1)
+        cached, _ = self.render_both('UTC')
+        self.assertEqual(cached.count('selected="selected"'), 1)
+        self.assertIn('<option value="UTC" selected="selected">', cached)
+
+    def test_user_settings_form_uses_cached_select(self):
+        user = User.objects.create_user('user', 'user@example.com')
+        user_settings = user.settings
+        user_settings.timezone = pytz.timezone('Europe/Zurich')
+        form = UserSettingsForm(instance=user_settings)
+        self.assertIsInstance(form.fields['timezone'].widget, CachedSelect)
+        self.assertIn('<option value="Europe/Zurich" selected="selected">',
+                      str(form['timezone']))